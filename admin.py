@@ -0,0 +1,64 @@
+import functools
+import hmac
+import ipaddress
+import os
+from urllib.parse import urlencode
+
+from flask import abort, request
+from markupsafe import escape
+
+
+# Operator endpoints (/metrics, /admin/*) expose callback inputs and process
+# internals. With a token set they need "Authorization: Bearer <token>" or
+# ?token=<token>; without one they answer only to requests from this host.
+# Behind a reverse proxy every request comes from the proxy, so forwarded
+# requests count as remote; set a token there.
+ADMIN_TOKEN = os.environ.get("UV_ADMIN_TOKEN", "")
+
+
+def _local_request():
+    if request.headers.get("X-Forwarded-For") or request.headers.get("Forwarded"):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def allowed():
+    if not ADMIN_TOKEN:
+        return _local_request()
+    header = request.headers.get("Authorization", "")
+    token = header[len("Bearer "):] if header.startswith("Bearer ") else request.args.get("token", "")
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def admin_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not allowed():
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def query_suffix():
+    # Keeps a ?token= given in the URL on links between admin pages.
+    token = request.args.get("token")
+    return f"?{urlencode({'token': token})}" if token else ""
+
+
+_STYLE = """
+body { font-family: Arial, sans-serif; margin: 20px; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #dee2e6; padding: 4px 8px; text-align: left; vertical-align: top; }
+.row { display: flex; width: 100%; }
+.frame { overflow: hidden; }
+.label { font-size: 11px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;
+         border: 1px solid #fff; padding: 1px 2px; }
+"""
+
+
+def admin_page(title, body):
+    return f"<!doctype html><html><head><title>{escape(title)}</title><style>{_STYLE}</style></head>" \
+           f"<body><h2>{escape(title)}</h2>{body}</body></html>"
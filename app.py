@@ -2,15 +2,31 @@ import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
-from uv_visualization import layout as uv_layout, register_callbacks
-from dynamic_calculations import layout as dynamic_layout
-from forecasting import layout as forecasting_layout 
-from derived_factors import layout as derived_factors_layout  
+from functools import lru_cache
+import os
+from uv_visualization import make_layout as uv_layout, register_callbacks
+from dynamic_calculations import make_layout as dynamic_layout
+from forecasting import make_layout as forecasting_layout
+from derived_factors import make_layout as derived_factors_layout
+import data_store
+import ingest
+import memory_report
+import metrics
+import profiling
+import response_encoding
+import warmup
 
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
 app.title = "UV Index Dashboard"
+server = app.server
 
 register_callbacks(app)
+response_encoding.install(app)
+metrics.install(app)
+profiling.install(app)
+memory_report.install(app)
+warmup.install(app)
+ingest.install(app)
 
 
 app.layout = html.Div([
@@ -25,16 +41,25 @@ app.layout = html.Div([
     )
 ])
 
+PAGES = {
+    "/uv-visualization": uv_layout,
+    "/dynamic-calculations": dynamic_layout,
+    "/forecasting": forecasting_layout,
+    "/derived-factors": derived_factors_layout,
+}
+
+
+# Page layouts hold the manifest's states and date bounds, so they are
+# rebuilt once per dataset version.
+@lru_cache(maxsize=16)
+def page_layout(pathname, version):
+    return PAGES[pathname]()
+
+
 @app.callback(Output("page-content", "children"), Input("url", "pathname"))
 def display_page(pathname):
-    if pathname == "/uv-visualization":
-        return uv_layout
-    elif pathname == "/dynamic-calculations":
-        return dynamic_layout
-    elif pathname == "/forecasting":
-        return forecasting_layout
-    elif pathname == "/derived-factors":
-        return derived_factors_layout 
+    if pathname in PAGES:
+        return page_layout(pathname, data_store.dataset_version())
     else:
         # Home Page layout
         return html.Div(
@@ -161,4 +186,8 @@ def display_page(pathname):
         )
 
 if __name__ == "__main__":
+    # The debug reloader runs this file again in a child process that does the
+    # serving (WERKZEUG_RUN_MAIN set); the watching parent has nothing to warm.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warmup.start()
     app.run_server(debug=True)
@@ -0,0 +1,57 @@
+// Client-side playback for the UV map: the server ships one Float32 matrix
+// (dates x states) per parameter and year, and these callbacks recolour the
+// map locally so scrubbing and playing make no server requests.
+let decodedScrubValues = {encoded: null, values: null};
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    uv_map: {
+        decode: function (scrubData) {
+            if (decodedScrubValues.encoded !== scrubData.values) {
+                const binary = atob(scrubData.values);
+                const bytes = new Uint8Array(binary.length);
+                for (let i = 0; i < binary.length; i++) {
+                    bytes[i] = binary.charCodeAt(i);
+                }
+                decodedScrubValues = {encoded: scrubData.values, values: new Float32Array(bytes.buffer)};
+            }
+            return decodedScrubValues.values;
+        },
+
+        scrub_map: function (index, scrubData, figure) {
+            if (!scrubData || !figure || !figure.data || !figure.data.length) {
+                return window.dash_clientside.no_update;
+            }
+            const values = window.dash_clientside.uv_map.decode(scrubData);
+            const states = scrubData.shape[1];
+            const row = Math.min(Math.max(index || 0, 0), scrubData.shape[0] - 1);
+            const z = Array.from(values.subarray(row * states, (row + 1) * states), function (v) {
+                return Number.isNaN(v) ? null : v;
+            });
+
+            const trace = Object.assign({}, figure.data[0], {
+                z: z,
+                customdata: null,
+                hovertemplate: "NAME=%{location}<br>" + scrubData.label + "=%{z:.2f}<extra></extra>",
+            });
+            const layout = Object.assign({}, figure.layout, {
+                title: {text: scrubData.label + " on " + scrubData.dates[row]},
+                coloraxis: Object.assign({}, figure.layout.coloraxis, {
+                    cmin: scrubData.range[0],
+                    cmax: scrubData.range[1],
+                }),
+            });
+            return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1)), layout: layout});
+        },
+
+        toggle_play: function (nClicks, disabled) {
+            return nClicks ? !disabled : disabled;
+        },
+
+        advance: function (nIntervals, index, scrubData) {
+            if (!scrubData) {
+                return window.dash_clientside.no_update;
+            }
+            return ((index || 0) + 1) % scrubData.shape[0];
+        },
+    },
+});
@@ -0,0 +1,142 @@
+import pandas as pd
+
+import data_store
+
+
+# Every case calls a callback function directly, with inputs the page would
+# send; "forecast" cases share the Prophet fit through fit_forecast.
+FORECAST_DAYS = 30
+REGRESSION_FACTORS = ["Clear Sky UVI", "Cloud Transmission", "Total Column Ozone"]
+SELECTION_FACTORS = ["Clear Sky UVI", "Cloud Transmission", "Solar Zenith Angle", "Aerosol Transmission",
+                     "Total Column Ozone"]
+
+
+def _inputs():
+    manifest = data_store.manifest()
+    state = manifest["states"][0]
+    latest = manifest["date_max"]
+    ahead = (latest + pd.Timedelta(days=5)).strftime("%Y-%m-%d")
+    return state, latest, ahead
+
+
+def _update_map(display_mode):
+    def run():
+        import uv_visualization
+
+        _, latest, _ = _inputs()
+        return uv_visualization.update_map(
+            "Clear Sky UVI", latest.year, latest.month, latest.day, latest.timestamp(), display_mode
+        )
+    return run
+
+
+def _update_state_charts(resolution):
+    def run():
+        import uv_visualization
+
+        state, _, _ = _inputs()
+        return uv_visualization.update_state_charts(
+            {"points": [{"location": state}]}, "Clear Sky UVI", resolution, "value"
+        )
+    return run
+
+
+def load_scrub_frames():
+    import uv_visualization
+
+    _, latest, _ = _inputs()
+    return uv_visualization.load_scrub_frames(["on"], "Clear Sky UVI", latest.year, "value")
+
+
+def perform_regression():
+    import dynamic_calculations
+
+    state, latest, _ = _inputs()
+    return dynamic_calculations.perform_regression(
+        state, "regression", REGRESSION_FACTORS, latest.strftime("%Y-%m-%d")
+    )
+
+
+def calculate_derived_factors():
+    import derived_factors
+    from factor_registry import DERIVED_FACTORS
+
+    state, latest, _ = _inputs()
+    start = (latest - pd.DateOffset(years=1)).strftime("%Y-%m-%d")
+    return derived_factors.calculate_derived_factors(
+        1, state, start, latest.strftime("%Y-%m-%d"), list(DERIVED_FACTORS), "auto"
+    )
+
+
+def forecast_uv_index():
+    import forecasting
+
+    state, _, ahead = _inputs()
+    return forecasting.forecast_uv_index(state, [], FORECAST_DAYS, ahead)
+
+
+def analyze_future_factors():
+    import forecasting
+
+    state, _, _ = _inputs()
+    return forecasting.analyze_future_factors(state, FORECAST_DAYS)
+
+
+def plot_seasonal_trends():
+    import forecasting
+
+    state, _, _ = _inputs()
+    return forecasting.plot_seasonal_trends(state, FORECAST_DAYS)
+
+
+def plot_distribution():
+    import forecasting
+
+    state, _, _ = _inputs()
+    return forecasting.plot_distribution(state, FORECAST_DAYS)
+
+
+def calculate_skin_risk():
+    import forecasting
+
+    state, _, ahead = _inputs()
+    return forecasting.calculate_skin_risk(ahead, state, FORECAST_DAYS)
+
+
+def calculate_med():
+    import forecasting
+
+    state, _, ahead = _inputs()
+    return forecasting.calculate_med(state, 200, ahead, FORECAST_DAYS)
+
+
+def generate_ten_day_forecast():
+    import forecasting
+
+    state, _, ahead = _inputs()
+    return forecasting.generate_ten_day_forecast(state, FORECAST_DAYS, ahead)
+
+
+def forward_selection():
+    from files.feature_selection import forward_selection
+
+    return forward_selection(data_store.get_data(), "Cloudy Sky UVI", SELECTION_FACTORS)
+
+
+CASES = {
+    "update_map": _update_map("value"),
+    "update_map anomaly": _update_map("anomaly"),
+    "update_state_charts": _update_state_charts("auto"),
+    "update_state_charts day": _update_state_charts("day"),
+    "load_scrub_frames": load_scrub_frames,
+    "perform_regression": perform_regression,
+    "calculate_derived_factors": calculate_derived_factors,
+    "forecast_uv_index": forecast_uv_index,
+    "analyze_future_factors": analyze_future_factors,
+    "plot_seasonal_trends": plot_seasonal_trends,
+    "plot_distribution": plot_distribution,
+    "calculate_skin_risk": calculate_skin_risk,
+    "calculate_med": calculate_med,
+    "generate_ten_day_forecast": generate_ten_day_forecast,
+    "forward_selection": forward_selection,
+}
@@ -0,0 +1,66 @@
+import argparse
+import json
+import sys
+
+
+def _index(report):
+    return {(result["case"], result["scale"]): result for result in report["results"]}
+
+
+def compare(baseline, current, time_threshold, memory_threshold, payload_threshold, min_seconds):
+    # A metric regresses when it grows by more than its threshold; timings
+    # below min_seconds are too noisy to judge.
+    rows = []
+    old, new = _index(baseline), _index(current)
+    for key in sorted(new, key=lambda key: (key[1], key[0])):
+        if key not in old:
+            continue
+        checks = (
+            ("seconds", time_threshold, lambda before, after: after >= min_seconds or before >= min_seconds),
+            ("peak_bytes", memory_threshold, lambda before, after: True),
+            ("payload_bytes", payload_threshold, lambda before, after: True),
+        )
+        for metric, threshold, significant in checks:
+            before, after = old[key].get(metric), new[key].get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before else (float("inf") if after else 0.0)
+            regressed = change > threshold and significant(before, after)
+            rows.append({"case": key[0], "scale": key[1], "metric": metric, "before": before, "after": after,
+                         "change": change, "regressed": regressed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results files and flag regressions.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--time-threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%).")
+    parser.add_argument("--memory-threshold", type=float, default=0.20, help="Allowed peak memory growth.")
+    parser.add_argument("--payload-threshold", type=float, default=0.05, help="Allowed payload growth.")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="Ignore slowdowns of faster cases.")
+    parser.add_argument("--all", action="store_true", help="Show every metric, not just the changed ones.")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.time_threshold, args.memory_threshold, args.payload_threshold,
+                   args.min_seconds)
+
+    print(f"{baseline.get('commit')} ({baseline.get('created')}) -> {current.get('commit')} ({current.get('created')})")
+    if baseline.get("dataset", "scaled") != current.get("dataset", "scaled"):
+        print(f"Warning: comparing {baseline.get('dataset', 'scaled')} data with {current.get('dataset', 'scaled')} data")
+    for row in rows:
+        if args.all or row["regressed"] or abs(row["change"]) > 0.05:
+            flag = "REGRESSION" if row["regressed"] else ""
+            print(f"{row['case']:<28} {row['scale']:>4}x {row['metric']:<14} {row['before']:>14.4g} "
+                  f"{row['after']:>14.4g} {row['change']:>+8.1%} {flag}")
+    regressions = [row for row in rows if row["regressed"]]
+    print(f"{len(regressions)} regression(s) in {len(rows)} comparisons")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import gzip
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+CALLBACK_PATH = "/_dash-update-component"
+PAGE_OUTPUT = "page-content.children"
+PAGES = {
+    "map": "/uv-visualization",
+    "state": "/uv-visualization",
+    "regression": "/dynamic-calculations",
+    "forecast": "/forecasting",
+}
+DEFAULT_MIX = "map=3,state=3,regression=2,forecast=2"
+FORECAST_DAYS = [30, 60, 90, 180, 365]
+
+
+class Client:
+    # One keep-alive connection per virtual user, reopened if the server drops it.
+
+    def __init__(self, base_url, timeout=120):
+        url = urlparse(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+        # Bytes on the wire for the last response, before decompression.
+        self.received = 0
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"} if payload else {}
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            start = time.perf_counter()
+            try:
+                self.connection.request(method, self.prefix + path, payload, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+                continue
+            seconds = time.perf_counter() - start
+            self.received = len(data)
+            if response.getheader("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            return response.status, data, seconds
+
+    def get_json(self, path):
+        status, data, _ = self.request("GET", path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        return json.loads(data)
+
+
+def _outputs(output):
+    # "..a.figure...b.data.." for several outputs, "a.figure@hash" for one.
+    specs = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [dict(zip(("id", "property"), spec.rsplit(".", 1))) for spec in specs]
+
+
+def _components(node, found):
+    # Props of every component with an id in a serialized layout.
+    if isinstance(node, list):
+        for child in node:
+            _components(child, found)
+    elif isinstance(node, dict):
+        props = node.get("props")
+        if isinstance(props, dict):
+            if isinstance(props.get("id"), str):
+                found[props["id"]] = props
+            for value in props.values():
+                _components(value, found)
+    return found
+
+
+class Dashboard:
+    # The app as the browser sees it: its server-side callbacks and the
+    # components of every page, read from the running server.
+
+    def __init__(self, base_url):
+        client = Client(base_url)
+        self.callbacks = [
+            dependency for dependency in client.get_json("/_dash-dependencies")
+            if not dependency.get("clientside_function")
+        ]
+        self.page_callback = next(
+            dependency for dependency in self.callbacks if dependency["output"].split("@")[0] == PAGE_OUTPUT
+        )
+        self.layouts = {}
+        self.components = {}
+        for path in set(PAGES.values()):
+            _, data, _ = client.request("POST", CALLBACK_PATH, self.page_request(path))
+            layout = json.loads(data)["response"]["page-content"]["children"]
+            self.layouts[path] = layout
+            self.components[path] = _components(layout, {})
+        forecast_page = self.components[PAGES["forecast"]]
+        self.states = [option["value"] for option in forecast_page["state-dropdown"]["options"]]
+
+    def page_request(self, path):
+        return self.request(self.page_callback, {"url.pathname": path}, ["url.pathname"])
+
+    def request(self, dependency, values, changed):
+        def items(specs):
+            return [{"id": spec["id"], "property": spec["property"],
+                     "value": values.get(f"{spec['id']}.{spec['property']}")} for spec in specs]
+
+        outputs = _outputs(dependency["output"])
+        return {
+            "output": dependency["output"],
+            "outputs": outputs if dependency["output"].startswith("..") else outputs[0],
+            "inputs": items(dependency["inputs"]),
+            "state": items(dependency["state"]),
+            "changedPropIds": changed,
+        }
+
+    def page_callbacks(self, path):
+        ids = set(self.components[path])
+        return [
+            dependency for dependency in self.callbacks
+            if dependency is not self.page_callback
+            and all(spec["id"] in ids for spec in dependency["inputs"])
+        ]
+
+    def triggered(self, path, prop):
+        return [dependency for dependency in self.page_callbacks(path)
+                if any(f"{spec['id']}.{spec['property']}" == prop for spec in dependency["inputs"])]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.bytes = defaultdict(int)
+        self.errors = defaultdict(int)
+        # Requests that got no response: errors, but with no latency to report.
+        self.failures = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, name, status, size, seconds):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.bytes[name] += size
+            # 204 is PreventUpdate: the callback ran and chose not to update.
+            if status not in (200, 204):
+                self.errors[name] += 1
+
+    def add_failure(self, name):
+        with self._lock:
+            self.failures[name] += 1
+            self.errors[name] += 1
+
+    def summary(self, elapsed):
+        rows = []
+        names = set(self.latencies) | set(self.failures)
+        for name in sorted(names, key=lambda name: -(len(self.latencies[name]) + self.failures[name])):
+            latencies = np.array(self.latencies[name]) * 1000
+            requests = len(latencies) + self.failures[name]
+            if len(latencies):
+                p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+                slowest, mean_kb = latencies.max(), self.bytes[name] / len(latencies) / 1024
+            else:
+                p50 = p90 = p95 = p99 = slowest = mean_kb = float("nan")
+            rows.append({
+                "callback": name, "requests": requests, "errors": self.errors[name],
+                "throughput": requests / elapsed, "p50_ms": p50, "p90_ms": p90, "p95_ms": p95,
+                "p99_ms": p99, "max_ms": slowest, "mean_kb": mean_kb,
+            })
+        return rows
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, dashboard, base_url, stats, mix, steps, think, stop, seed):
+        super().__init__(daemon=True)
+        self.dashboard = dashboard
+        self.client = Client(base_url)
+        self.stats = stats
+        self.mix = mix
+        self.steps = steps
+        self.think = think
+        self.stop = stop
+        self.random = random.Random(seed)
+        self.values = {}
+        self.path = None
+
+    def call(self, dependency, changed):
+        if self.stop.is_set():
+            return
+        name = dependency["output"].split("@")[0].strip(".").split("...")[0]
+        try:
+            status, data, seconds = self.client.request(
+                "POST", CALLBACK_PATH, self.dashboard.request(dependency, self.values, changed)
+            )
+        except (http.client.HTTPException, OSError):
+            self.stats.add_failure(name)
+            return
+        self.stats.add(name, status, self.client.received, seconds)
+        if status == 200:
+            # Outputs feed later requests, as the browser's store would.
+            for component, props in json.loads(data).get("response", {}).items():
+                for prop, value in props.items():
+                    self.values[f"{component}.{prop}"] = value
+
+    def change(self, prop, value):
+        # The browser fires every callback with the changed prop as an input.
+        self.values[prop] = value
+        for dependency in self.dashboard.triggered(self.path, prop):
+            self.call(dependency, [prop])
+
+    def visit(self, path):
+        # Loading a page: its layout, then the initial call of each callback.
+        self.path = path
+        self.values = {"url.pathname": path}
+        self.call(self.dashboard.page_callback, ["url.pathname"])
+        for component, props in self.dashboard.components[path].items():
+            for prop, value in props.items():
+                self.values[f"{component}.{prop}"] = value
+        for dependency in self.dashboard.page_callbacks(path):
+            if not dependency.get("prevent_initial_call"):
+                self.call(dependency, [])
+
+    def pause(self):
+        if self.think > 0:
+            self.stop.wait(self.random.expovariate(1 / self.think))
+
+    def run(self):
+        names, weights = zip(*self.mix.items())
+        while not self.stop.is_set():
+            scenario = self.random.choices(names, weights)[0]
+            self.visit(PAGES[scenario])
+            for _ in range(self.steps):
+                if self.stop.is_set():
+                    break
+                self.pause()
+                getattr(self, f"step_{scenario}")()
+
+    def step_map(self):
+        # Dragging the date slider, now and then another measure or a
+        # switch of the in-browser scrubbing on and off.
+        slider = self.dashboard.components[self.path]["date-slider"]
+        roll = self.random.random()
+        if roll < 0.1:
+            options = self.dashboard.components[self.path]["parameter-dropdown"]["options"]
+            self.change("parameter-dropdown.value", self.random.choice(options)["value"])
+        elif roll < 0.2:
+            scrubbing = self.values.get("map-scrub-mode.value") or []
+            self.change("map-scrub-mode.value", [] if "on" in scrubbing else ["on"])
+        else:
+            step = slider.get("step") or 86400
+            position = self.random.randrange(int(slider["min"]), int(slider["max"]) + 1, int(step))
+            self.change("date-slider.value", position)
+
+    def step_state(self):
+        if self.random.random() < 0.2:
+            options = self.dashboard.components[self.path]["resolution-dropdown"]["options"]
+            self.change("resolution-dropdown.value", self.random.choice(options)["value"])
+        else:
+            state = self.random.choice(self.dashboard.states)
+            self.change("uv-map.clickData", {"points": [{"location": state}]})
+
+    def step_regression(self):
+        if self.values.get("analysis-type-dropdown.value") != "regression":
+            self.change("analysis-type-dropdown.value", "regression")
+        if self.random.random() < 0.3:
+            self.change("state-dropdown.value", self.random.choice(self.dashboard.states))
+        else:
+            options = [option["value"] for option in self.dashboard.components[self.path]["factors-dropdown"]["options"]
+                       if option["value"] != "Cloudy Sky UVI"]
+            factors = self.random.sample(options, self.random.randint(1, len(options)))
+            self.change("factors-dropdown.value", factors)
+
+    def step_forecast(self):
+        if self.random.random() < 0.5:
+            self.change("state-dropdown.value", self.random.choice(self.dashboard.states))
+        else:
+            self.change("forecast-days-input.value", self.random.choice(FORECAST_DAYS))
+
+
+def run_level(dashboard, base_url, users, duration, mix, steps, think, seed):
+    stats = Stats()
+    stop = threading.Event()
+    threads = [
+        VirtualUser(dashboard, base_url, stats, mix, steps, think, stop, seed + index) for index in range(users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    rows = stats.summary(elapsed)
+    total = sum(row["requests"] for row in rows)
+    every = np.concatenate([np.array(stats.latencies[row["callback"]]) for row in rows] + [np.zeros(0)]) * 1000
+    if not len(every):
+        every = np.full(1, np.nan)
+    return {
+        "users": users,
+        "seconds": elapsed,
+        "requests": total,
+        "errors": sum(row["errors"] for row in rows),
+        "throughput": total / elapsed,
+        "p50_ms": float(np.percentile(every, 50)),
+        "p95_ms": float(np.percentile(every, 95)),
+        "p99_ms": float(np.percentile(every, 99)),
+        "callbacks": rows,
+    }
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in PAGES:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(PAGES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay simulated users against a running dashboard.")
+    parser.add_argument("--url", default="http://127.0.0.1:8050")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Concurrent users; several values run one after another.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds per concurrency level.")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX),
+                        help=f"Scenario weights (default {DEFAULT_MIX}).")
+    parser.add_argument("--steps", type=int, default=10, help="Interactions per page visit.")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean pause between interactions, in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON.")
+    args = parser.parse_args()
+
+    dashboard = Dashboard(args.url)
+    levels = []
+    for users in args.users:
+        level = run_level(dashboard, args.url, users, args.duration, args.mix, args.steps, args.think, args.seed)
+        levels.append(level)
+        print(f"\n{users} users: {level['requests']} requests in {level['seconds']:.0f} s, "
+              f"{level['throughput']:.1f} req/s, p50 {level['p50_ms']:.0f} ms, p95 {level['p95_ms']:.0f} ms, "
+              f"p99 {level['p99_ms']:.0f} ms, {level['errors']} errors")
+        print(f"  {'callback':<32} {'reqs':>6} {'err':>4} {'req/s':>7} {'p50':>7} {'p90':>7} {'p95':>7} "
+              f"{'p99':>7} {'max':>7} {'KB':>7}")
+        for row in level["callbacks"]:
+            print(f"  {row['callback']:<32} {row['requests']:>6} {row['errors']:>4} {row['throughput']:>7.2f} "
+                  f"{row['p50_ms']:>7.0f} {row['p90_ms']:>7.0f} {row['p95_ms']:>7.0f} {row['p99_ms']:>7.0f} "
+                  f"{row['max_ms']:>7.0f} {row['mean_kb']:>7.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "mix": args.mix, "think": args.think, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCALES = (1, 10, 100)
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# Scaled datasets and their columnar caches; rebuilt only when the source changes.
+DATA_DIR = os.environ.get("UV_BENCH_DATA", os.path.join(ROOT, data_store.cache_dir, "benchmarks"))
+MEASURES = data_store.MEASURES
+PERCENT_MEASURES = ["Cloud Transmission", "Aerosol Transmission"]
+
+
+def scaled_dataset(scale, source=data_store.uv_data_path, directory=DATA_DIR):
+    # The source repeated scale times, each copy moved back by the source's
+    # span of years and jittered by 2%, so every state gets scale times the history.
+    path = os.path.join(directory, f"scale-{scale}.csv")
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    base = pd.read_csv(source)
+    dates = pd.to_datetime(base["Date"], format="%Y%m%d")
+    span = int(dates.dt.year.max() - dates.dt.year.min() + 1)
+    rng = np.random.default_rng(scale)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    for copy in range(scale):
+        chunk = base.copy()
+        shifted = pd.to_datetime(
+            {"year": dates.dt.year - copy * span, "month": dates.dt.month, "day": dates.dt.day}, errors="coerce"
+        )
+        chunk = chunk[shifted.notna().to_numpy()]
+        shifted = shifted.dropna()
+        chunk["Date"] = shifted.dt.strftime("%Y%m%d").to_numpy()
+        chunk["Year"] = shifted.dt.year.to_numpy()
+        if copy:
+            chunk[MEASURES] = (chunk[MEASURES] * rng.normal(1.0, 0.02, (len(chunk), len(MEASURES)))).clip(lower=0)
+            chunk[PERCENT_MEASURES] = chunk[PERCENT_MEASURES].clip(upper=100)
+        chunk.to_csv(tmp_path, mode="w" if copy == 0 else "a", header=copy == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def generated_dataset(scale, years=3, directory=DATA_DIR):
+    # Fully synthetic: the 50 states over scale times as many years.
+    import synthetic_data
+
+    path = os.path.join(directory, f"generated-{scale}.csv")
+    if not os.path.exists(path):
+        end = pd.Timestamp("2023-12-31")
+        synthetic_data.generate(path, end - pd.DateOffset(years=years * scale) + pd.Timedelta(days=1), end)
+    return path
+
+
+def reset_caches():
+    # Every timed call starts cold: nothing memoized, only the data loaded.
+    from figure_cache import figure_cache
+
+    figure_cache.clear()
+    forecasting = sys.modules.get("forecasting")
+    if forecasting is not None:
+        forecasting.fitted_forecasts.clear()
+
+
+def payload_size(result):
+    from response_encoding import to_json
+
+    try:
+        return len(to_json(result).encode())
+    except TypeError:
+        return None
+
+
+def measure(name, func, repeat):
+    times = []
+    for _ in range(repeat):
+        reset_caches()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    func()
+    cached = time.perf_counter() - start
+
+    # Separate run: tracing allocations slows the call down.
+    reset_caches()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "seconds": statistics.median(times),
+        "seconds_min": min(times),
+        "seconds_all": times,
+        "cached_seconds": cached,
+        "peak_bytes": peak,
+        "payload_bytes": payload_size(result),
+    }
+
+
+def run_worker(scale, case_names, repeat, output):
+    # Runs inside a fresh process pointed at the scaled dataset.
+    import climatology
+    from benchmarks.cases import CASES
+
+    start = time.perf_counter()
+    tracemalloc.start()
+    data_store.preload()
+    climatology.get_climatology()
+    load_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results = [{"case": "load data", "seconds": time.perf_counter() - start, "peak_bytes": load_peak}]
+
+    # Imported up front, so the first case of each page does not pay for it.
+    import derived_factors  # noqa: F401
+    import dynamic_calculations  # noqa: F401
+    import forecasting  # noqa: F401
+    import uv_visualization  # noqa: F401
+    import prophet  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+
+    for name in case_names:
+        print(f"  scale {scale}x: {name}", file=sys.stderr, flush=True)
+        results.append(measure(name, CASES[name], repeat))
+    for result in results:
+        result.update(scale=scale, rows=data_store.row_count(), backend=data_store.backend())
+    with open(output, "w") as f:
+        json.dump(results, f)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, case_names, repeat, output, generated=False):
+    results = []
+    for scale in scales:
+        print(f"Preparing the {scale}x dataset", file=sys.stderr, flush=True)
+        env = dict(
+            os.environ,
+            UV_DATA_PATH=generated_dataset(scale) if generated else scaled_dataset(scale),
+            UV_CACHE_DIR=os.path.join(DATA_DIR, f"cache-{'generated-' if generated else ''}{scale}"),
+            UV_SHARED_CACHE="off",
+            UV_WARMUP="off",
+            UV_HOT_KEY_LOG="off",
+            UV_PROFILE_DIR="off",
+            UV_MEMORY_LOG="off",
+            PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        )
+        env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            worker_output = f.name
+        try:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--worker", "--scales", str(scale), "--repeat", str(repeat),
+                 "--output", worker_output, "--cases", *case_names],
+                cwd=ROOT, env=env, check=True,
+            )
+            with open(worker_output) as f:
+                results += json.load(f)
+        finally:
+            os.remove(worker_output)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "dataset": "generated" if generated else "scaled",
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    from benchmarks.cases import CASES
+
+    parser = argparse.ArgumentParser(description="Time every callback against scaled copies of the dataset.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES), metavar="CASE",
+                        help=f"Cases to run (default: all of {', '.join(CASES)}).")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold runs per case; the median is reported.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<time>-<commit>.json).")
+    parser.add_argument("--generated", action="store_true",
+                        help="Use synthetic_data.py output instead of scaled copies of the real dataset.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.scales[0], args.cases, args.repeat, args.output)
+        return
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{_git_commit() or 'unknown'}.json"
+    )
+    report = run(args.scales, args.cases, args.repeat, output, args.generated)
+    print(f"{'case':<28} {'scale':>5} {'rows':>9} {'seconds':>9} {'cached':>9} {'peak MB':>9} {'payload KB':>11}")
+    for result in report["results"]:
+        payload = result.get("payload_bytes")
+        print(
+            f"{result['case']:<28} {result['scale']:>4}x {result['rows']:>9} {result['seconds']:>9.3f} "
+            f"{result.get('cached_seconds', float('nan')):>9.3f} {result['peak_bytes'] / 2 ** 20:>9.1f} "
+            f"{payload / 1024 if payload is not None else float('nan'):>11.1f}"
+        )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
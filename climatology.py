@@ -0,0 +1,114 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+
+CLIMATOLOGY_MEASURES = ["Clear Sky UVI", "Cloudy Sky UVI", "Total Column Ozone"]
+PERCENTILES = {"p10": 10, "p50": 50, "p90": 90}
+# Days either side of a calendar day pooled into its normal, so a handful of
+# years still gives stable percentiles.
+WINDOW_DAYS = 7
+DAYS_IN_YEAR = 366
+
+DISPLAY_MODE_OPTIONS = [
+    {"label": "Values", "value": "value"},
+    {"label": "Anomaly vs. normal", "value": "anomaly"},
+]
+
+_climatology = None
+
+
+def leap_day_of_year(dates):
+    # Day of year on a 366-day calendar so that e.g. 1 March is always day 61.
+    dates = pd.DatetimeIndex(dates)
+    day = dates.dayofyear.to_numpy()
+    shift = (~dates.is_leap_year) & (dates.month > 2)
+    return day + shift.astype(int)
+
+
+def climatology_frame(data):
+    states = pd.Index(np.sort(data['NAME'].unique()))
+    state_pos = states.get_indexer(data['NAME'])
+    years = np.sort(data['Year'].unique())
+    year_pos = np.searchsorted(years, data['Date'].dt.year.to_numpy())
+    day_pos = leap_day_of_year(data['Date']) - 1
+
+    result = {
+        "NAME": np.repeat(states.to_numpy(), DAYS_IN_YEAR),
+        "DayOfYear": np.tile(np.arange(1, DAYS_IN_YEAR + 1), len(states)),
+    }
+    for measure in CLIMATOLOGY_MEASURES:
+        grid = np.full((len(states), len(years), DAYS_IN_YEAR), np.nan)
+        grid[state_pos, year_pos, day_pos] = data[measure].to_numpy(dtype=np.float64)
+
+        # Pool a circular window of calendar days: (state, day, year * window).
+        window = np.concatenate(
+            [np.roll(grid, shift, axis=2) for shift in range(-WINDOW_DAYS, WINDOW_DAYS + 1)], axis=1
+        ).transpose(0, 2, 1)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            result[f"{measure} normal"] = np.nanmean(window, axis=2).ravel()
+            bands = np.nanpercentile(window, list(PERCENTILES.values()), axis=2)
+        for name, band in zip(PERCENTILES, bands):
+            result[f"{measure} {name}"] = band.ravel()
+
+    return pd.DataFrame(result)
+
+
+def build_climatology(data=None, version=None):
+    # Without data the normals are computed a state at a time; each state's
+    # rows depend only on its own history.
+    if data is None:
+        frames = data_store.state_frames(['NAME', 'Date', 'Year'] + CLIMATOLOGY_MEASURES)
+        climatology = pd.concat([climatology_frame(frame) for frame in frames], ignore_index=True)
+    else:
+        climatology = climatology_frame(data)
+    data_store.write_frame(climatology, data_store.cache_path("climatology", version))
+    return climatology
+
+
+def get_climatology():
+    global _climatology
+    if _climatology is None:
+        path = data_store.cache_path("climatology")
+        if os.path.exists(path):
+            _climatology = data_store.read_frame(path)
+        else:
+            _climatology = build_climatology(data_store.get_data() if data_store.backend() == "memory" else None)
+    return _climatology
+
+
+@data_store.on_swap
+def reset_climatology(states):
+    # Reloaded from the new version's file on next use.
+    global _climatology
+    _climatology = None
+
+
+def normals_for(states, dates, measure):
+    climatology = get_climatology()
+    known_states = pd.Index(climatology['NAME'].to_numpy()[::DAYS_IN_YEAR])
+    state_pos = known_states.get_indexer(states)
+    rows = state_pos * DAYS_IN_YEAR + leap_day_of_year(dates) - 1
+    found = state_pos >= 0
+
+    columns = [f"{measure} normal"] + [f"{measure} {name}" for name in PERCENTILES]
+    normals = {}
+    for column, name in zip(columns, ["normal"] + list(PERCENTILES)):
+        values = np.full(len(rows), np.nan)
+        values[found] = climatology[column].to_numpy()[rows[found]]
+        normals[name] = values
+    return pd.DataFrame(normals)
+
+
+def with_anomalies(frame, measure):
+    normals = normals_for(frame['NAME'], frame['Date'], measure)
+    normals.index = frame.index
+    result = pd.concat([frame[['NAME', 'Date', measure]], normals], axis=1)
+    result['anomaly'] = result[measure] - result['normal']
+    return result
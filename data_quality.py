@@ -0,0 +1,166 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+import query_engine
+
+
+# Plausible values per measure as (low, high, margin). A value outside the
+# range by no more than the margin is rounding or sensor noise and is clipped
+# to the range; further out it is garbage and its row is dropped, as is a row
+# with a missing or non-numeric measure. What remains is complete and in range,
+# so pages read it without cleaning it again.
+RANGES = {
+    "Clear Sky UVI": (0.0, 25.0, 0.1),
+    "Cloudy Sky UVI": (0.0, 25.0, 0.1),
+    "Cloud Transmission": (0.0, 100.0, 1.0),
+    "Aerosol Transmission": (0.0, 100.0, 1.0),
+    "Total Column Ozone": (100.0, 600.0, 0.0),
+    # Noon zenith passes 90 degrees in the Arctic winter.
+    "Solar Zenith Angle": (0.0, 180.0, 0.0),
+}
+DROP_REASONS = ["bad date", "no name", "missing value", "out of range"]
+
+
+def empty_report():
+    return {
+        "rows": 0,
+        "kept": 0,
+        "dropped": {reason: 0 for reason in DROP_REASONS},
+        "year repaired": 0,
+        "columns": {
+            column: {"missing": 0, "out of range": 0, "repaired": 0, "flagged": 0, "min": None, "max": None}
+            for column in RANGES
+        },
+    }
+
+
+def merge(report, other):
+    # Adds other's counts into report, for data cleaned a chunk at a time.
+    report["rows"] += other["rows"]
+    report["kept"] += other["kept"]
+    report["year repaired"] += other["year repaired"]
+    for reason, count in other["dropped"].items():
+        report["dropped"][reason] = report["dropped"].get(reason, 0) + count
+    for column, stats in other["columns"].items():
+        target = report["columns"][column]
+        for key in ("missing", "out of range", "repaired", "flagged"):
+            target[key] += stats[key]
+        if stats["min"] is not None:
+            target["min"] = stats["min"] if target["min"] is None else min(target["min"], stats["min"])
+            target["max"] = stats["max"] if target["max"] is None else max(target["max"], stats["max"])
+    return report
+
+
+def parse_dates(values):
+    # The source's YYYYMMDD dates, as numbers or text; anything else is NaT.
+    # One blank cell makes pandas read the column as float, so numbers are
+    # split arithmetically, and only the blank (or fractional) ones are lost.
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        whole = np.isfinite(numbers) & (numbers == np.floor(numbers)) & (np.abs(numbers) < 1e9)
+        dates = np.full(len(numbers), np.datetime64("NaT"), dtype="datetime64[ns]")
+        if whole.any():
+            days = numbers[whole].astype(np.int64)
+            parts = pd.DataFrame({"year": days // 10000, "month": days // 100 % 100, "day": days % 100})
+            dates[whole] = pd.to_datetime(parts, errors="coerce").to_numpy()
+        return pd.Series(dates, index=values.index)
+    return pd.to_datetime(values.astype(str), format="%Y%m%d", errors="coerce")
+
+
+def clean(frame):
+    # One vectorized pass over a frame with the todaysdata.csv columns: rows
+    # without a valid date or name, or with a missing or implausible measure,
+    # are dropped; near misses are clipped; a Year that disagrees with the
+    # Date is repaired. Returns the clean rows, with Date parsed, and a report
+    # of what was done to each column.
+    report = empty_report()
+    report["rows"] = len(frame)
+    dates = parse_dates(frame["Date"]).to_numpy()
+    names = frame["NAME"].astype("string").str.strip()
+    bad_date = np.isnat(dates)
+    no_name = (names.isna() | (names == "")).fillna(True).to_numpy(dtype=bool)
+    report["dropped"]["bad date"] = int(bad_date.sum())
+    report["dropped"]["no name"] = int((no_name & ~bad_date).sum())
+    keep = ~(bad_date | no_name)
+
+    values = {}
+    missing_any = np.zeros(len(frame), dtype=bool)
+    out_any = np.zeros(len(frame), dtype=bool)
+    for column, (low, high, margin) in RANGES.items():
+        column_values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64)
+        missing = ~np.isfinite(column_values)
+        with np.errstate(invalid="ignore"):
+            outside = (column_values < low) | (column_values > high)
+            out = outside & ((column_values < low - margin) | (column_values > high + margin))
+        stats = report["columns"][column]
+        stats["missing"] = int((missing & keep).sum())
+        stats["out of range"] = int((out & keep).sum())
+        stats["repaired"] = int((outside & ~out & keep).sum())
+        missing_any |= missing
+        out_any |= out
+        values[column] = np.clip(column_values, low, high)
+
+    report["dropped"]["missing value"] = int((missing_any & keep).sum())
+    report["dropped"]["out of range"] = int((out_any & ~missing_any & keep).sum())
+    keep &= ~(missing_any | out_any)
+
+    # Clouds only take UV away, and UV Attenuation (1 - cloudy / clear) is a
+    # fraction only if they do.
+    clear, cloudy = values["Clear Sky UVI"], values["Cloudy Sky UVI"]
+    brighter = cloudy > clear
+    report["columns"]["Cloudy Sky UVI"]["repaired"] += int((brighter & keep).sum())
+    values["Cloudy Sky UVI"] = np.where(brighter, clear, cloudy)
+    # Kept, but a clear sky with no UV has no attenuation to speak of.
+    report["columns"]["Clear Sky UVI"]["flagged"] = int(((clear == 0) & keep).sum())
+
+    result = frame[keep].copy()
+    result["Date"] = dates[keep]
+    result["NAME"] = names[keep].astype(str).to_numpy()
+    years = result["Date"].dt.year.to_numpy().astype(np.int64)
+    report["year repaired"] = int((pd.to_numeric(result["Year"], errors="coerce").to_numpy() != years).sum())
+    result["Year"] = years
+    for column, column_values in values.items():
+        result[column] = column_values[keep]
+        stats = report["columns"][column]
+        if len(result):
+            stats["min"], stats["max"] = float(result[column].min()), float(result[column].max())
+    report["kept"] = len(result)
+    return result, report
+
+
+def summary(report):
+    lines = [f"{report['kept']} of {report['rows']} rows kept; {report['year repaired']} years repaired"]
+    lines += [f"  dropped, {reason}: {count}" for reason, count in report["dropped"].items() if count]
+    lines.append(f"{'column':<22} {'missing':>8} {'range':>8} {'repaired':>9} {'flagged':>8} {'min':>8} {'max':>8}")
+    for column, stats in report["columns"].items():
+        low, high = (f"{value:8.2f}" if value is not None else f"{'-':>8}" for value in (stats["min"], stats["max"]))
+        lines.append(f"{column:<22} {stats['missing']:>8} {stats['out of range']:>8} {stats['repaired']:>9} "
+                     f"{stats['flagged']:>8} {low} {high}")
+    return "\n".join(lines)
+
+
+def main():
+    import data_store
+
+    parser = argparse.ArgumentParser(description="Report what cleaning drops and repairs in UV data.")
+    parser.add_argument("file", nargs="?", help="A CSV to check (default: the report for the served dataset).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args()
+
+    if args.file:
+        report = empty_report()
+        for chunk in pd.read_csv(args.file, chunksize=query_engine.CSV_CHUNK_ROWS):
+            missing = [column for column in ["Date", "NAME", "Year", *RANGES] if column not in chunk.columns]
+            if missing:
+                parser.error(f"{args.file}: missing columns {', '.join(missing)}")
+            merge(report, clean(chunk)[1])
+    else:
+        report = data_store.quality()
+    print(json.dumps(report, indent=2) if args.json else summary(report))
+
+
+if __name__ == "__main__":
+    main()
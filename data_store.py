@@ -0,0 +1,537 @@
+import contextlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_quality
+import query_engine
+from factor_registry import DERIVED_FACTORS, evaluate_factors
+from time_aggregation import aggregate, next_period_start, period_keys, rollup
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = "parquet"
+except ImportError:
+    CACHE_FORMAT = "pkl"
+
+
+uv_data_path = os.environ.get("UV_DATA_PATH", 'todaysdata.csv')
+cache_dir = os.environ.get("UV_CACHE_DIR", "cache")
+# "memory" filters a frame loaded whole into each process; "arrow" reads only
+# the matching row groups and columns of the Parquet cache on every query, so
+# the data can be larger than memory. "auto" picks arrow once the Parquet
+# cache (compressed, several times smaller than the frame) exceeds
+# UV_IN_MEMORY_MAX_BYTES.
+QUERY_BACKEND = os.environ.get("UV_QUERY_BACKEND", "auto")
+IN_MEMORY_MAX_BYTES = int(os.environ.get("UV_IN_MEMORY_MAX_BYTES", 256 * 2 ** 20))
+# The Parquet copy of the data, and each pyramid grain, is a directory per
+# state and year, so a query for one state, or one day, opens only those
+# directories' files, and ingesting a day rewrites only its year's aggregates.
+PARTITION_COLUMNS = ['NAME', 'Year']
+# Versions published by ingest.py, from the source file's version onwards.
+LINEAGE_PATH = os.path.join(cache_dir, "lineage.json")
+
+MEASURES = [
+    "Clear Sky UVI",
+    "Cloudy Sky UVI",
+    "Cloud Transmission",
+    "Aerosol Transmission",
+    "Total Column Ozone",
+    "Solar Zenith Angle",
+]
+DERIVED_MEASURES = [label for factor in DERIVED_FACTORS.values() for label in factor["outputs"]]
+PYRAMID_MEASURES = MEASURES + DERIVED_MEASURES
+PYRAMID_GRAINS = ["day", "week", "month", "year"]
+STATISTICS = ["mean", "min", "max", "count"]
+
+_data = None
+_manifest = None
+_pyramid = {}
+_backend = None
+_lineage = None
+_lineage_mtime = None
+_swap_lock = threading.Lock()
+_swap_listeners = []
+
+
+def source_version(path=uv_data_path):
+    stat = os.stat(path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def _lineage_stat():
+    try:
+        return os.stat(LINEAGE_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_lineage():
+    # Each entry after the first records what one ingested batch changed:
+    # its states and date range. Replacing the source file starts over.
+    source = source_version()
+    try:
+        with open(LINEAGE_PATH) as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        raw = None
+    if raw is None or raw.get("source") != source:
+        return [{"version": source}]
+    return raw["versions"]
+
+
+def lineage():
+    global _lineage, _lineage_mtime
+    if _lineage is None:
+        _lineage_mtime = _lineage_stat()
+        _lineage = read_lineage()
+    return _lineage
+
+
+def dataset_version():
+    return lineage()[-1]["version"]
+
+
+def scope_version(state=None, start=None, end=None):
+    # The latest version that changed rows of this state and date range.
+    # Results keyed on it stay valid across batches that touch other data.
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    for entry in reversed(lineage()):
+        if "states" not in entry:
+            return entry["version"]
+        if state is not None and state not in entry["states"]:
+            continue
+        if start is not None and pd.Timestamp(entry["end"]) < start:
+            continue
+        if end is not None and pd.Timestamp(entry["start"]) > end:
+            continue
+        return entry["version"]
+    return dataset_version()
+
+
+def release():
+    # Drops the frames loaded into this process; they are reloaded on next use.
+    global _data, _pyramid
+    _data, _pyramid = None, {}
+
+
+def state_scope(state, *args):
+    # For memoized functions whose first argument is the state they read.
+    return {"state": state}
+
+
+def on_swap(listener):
+    # listener(states) runs after a new version goes live, with the states it
+    # changed, or None when everything may have.
+    _swap_listeners.append(listener)
+    return listener
+
+
+def refresh():
+    # Picks up a version published by ingest.py. A stat per call, so it can run
+    # on every request; the thread that sees the change loads the new version
+    # while the others keep serving the current one.
+    global _lineage, _lineage_mtime, _data, _manifest, _pyramid
+    mtime = _lineage_stat()
+    if _lineage is not None and mtime == _lineage_mtime:
+        return False
+    if not _swap_lock.acquire(blocking=False):
+        return False
+    try:
+        current = lineage()
+        new = read_lineage()
+        if new[-1]["version"] == current[-1]["version"]:
+            _lineage_mtime = mtime
+            return False
+        versions = [entry["version"] for entry in new]
+        if current[-1]["version"] in versions:
+            added = new[versions.index(current[-1]["version"]) + 1:]
+            states = sorted({state for entry in added for state in entry.get("states", [])})
+        else:
+            states = None
+
+        version = new[-1]["version"]
+        data = load_data(version) if _data is not None else None
+        pyramid = {grain: read_pyramid(grain, version) for grain in _pyramid}
+        _lineage, _lineage_mtime, _data, _manifest, _pyramid = new, mtime, data, None, pyramid
+    finally:
+        _swap_lock.release()
+    for listener in _swap_listeners:
+        listener(states)
+    return True
+
+
+def cache_path(name, version=None):
+    return os.path.join(cache_dir, version or dataset_version(), f"{name}.{CACHE_FORMAT}")
+
+
+def read_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def write_frame(frame, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if path.endswith(".parquet"):
+        frame.to_parquet(tmp_path, index=False, row_group_size=query_engine.ROW_GROUP_ROWS)
+    else:
+        frame.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def prepare_data(data, categorical=True):
+    data['Year'] = data['Year'].astype(int)
+    data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
+    data['Month'] = data['Date'].dt.month
+    data['Day'] = data['Date'].dt.day
+    # Float throughout, so chunks converted separately share one schema.
+    data[MEASURES] = data[MEASURES].astype(np.float64)
+    data = data.sort_values(['NAME', 'Date'], kind='stable', ignore_index=True)
+    return compact(data) if categorical else data
+
+
+def compact(data):
+    # A string column holds one Python object per row, and merely reading those
+    # touches their refcounts, which unshares copy-on-write pages after a fork.
+    # As a categorical it is a small code array plus one copy of each name.
+    if data['NAME'].dtype != 'category':
+        data['NAME'] = data['NAME'].astype('category')
+    elif not data['NAME'].cat.categories.is_monotonic_increasing:
+        # Categories read from several files come in file order; sorting by
+        # NAME should still be alphabetical.
+        data['NAME'] = data['NAME'].cat.reorder_categories(data['NAME'].cat.categories.sort_values())
+    return data
+
+
+def is_sorted(data):
+    # By NAME, then Date; a cheap check instead of sorting again.
+    if len(data) < 2:
+        return True
+    days = data['Date'].to_numpy().astype("datetime64[D]").astype(np.int64)
+    keys = data['NAME'].cat.codes.to_numpy().astype(np.int64) * (days.max() - days.min() + 1) + (days - days.min())
+    return bool((np.diff(keys) >= 0).all())
+
+
+def data_path(version=None):
+    if CACHE_FORMAT == "parquet":
+        return os.path.join(cache_dir, version or dataset_version(), "data")
+    return cache_path("data", version)
+
+
+def ensure_data(version=None):
+    # With pyarrow the CSV is converted a chunk at a time into the partitioned
+    # layout, so conversion never holds the whole file. Ingested versions are
+    # written complete by ingest.py.
+    # Each chunk is cleaned on the way, and what cleaning did is recorded in
+    # the version's quality.json.
+    path = data_path(version)
+    if CACHE_FORMAT == "parquet" and not os.path.exists(path):
+        report = data_quality.empty_report()
+
+        def prepare(chunk):
+            chunk, chunk_report = data_quality.clean(chunk)
+            data_quality.merge(report, chunk_report)
+            return prepare_data(chunk, categorical=False)
+
+        query_engine.convert_csv(uv_data_path, path, prepare, PARTITION_COLUMNS)
+        write_quality(report, version)
+    return path
+
+
+def load_data(version=None):
+    path = ensure_data(version)
+    if os.path.exists(path):
+        data = compact(query_engine.scan(path) if CACHE_FORMAT == "parquet" else read_frame(path))
+        if not is_sorted(data):
+            data = data.sort_values(['NAME', 'Date'], kind='stable', ignore_index=True)
+        return data
+    data, report = data_quality.clean(pd.read_csv(uv_data_path))
+    data = prepare_data(data)
+    write_frame(data, path)
+    write_quality(report, version)
+    return data
+
+
+def get_data():
+    global _data
+    if _data is None:
+        _data = load_data()
+    return _data
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        if QUERY_BACKEND == "arrow" and not query_engine.available():
+            raise RuntimeError("UV_QUERY_BACKEND=arrow needs pyarrow")
+        if QUERY_BACKEND == "memory" or not query_engine.available():
+            _backend = "memory"
+        elif QUERY_BACKEND == "arrow":
+            _backend = "arrow"
+        else:
+            _backend = "arrow" if query_engine.disk_size(ensure_data()) > IN_MEMORY_MAX_BYTES else "memory"
+    return _backend
+
+
+def _filters(state=None, date=None, start=None, end=None, year=None, month=None):
+    # Dates also bound the Year, so the reader can prune year partitions.
+    filters = {}
+    if state is not None:
+        filters['NAME'] = state
+    if date is not None:
+        filters['Date'] = pd.Timestamp(date)
+        filters['Year'] = filters['Date'].year
+    elif start is not None or end is not None:
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        filters['Date'] = (start, end)
+        filters['Year'] = (start.year if start is not None else None, end.year if end is not None else None)
+    if year is not None:
+        filters['Year'] = int(year)
+    if month is not None:
+        filters['Month'] = int(month)
+    return filters
+
+
+def select(columns=None, **criteria):
+    # The filter step of every page: rows for a state, a day, a date range, a
+    # year or a month, in (NAME, Date) order, with only the columns asked for.
+    filters = _filters(**criteria)
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+    if backend() == "arrow":
+        return query_engine.scan(ensure_data(), columns, filters, order=['NAME', 'Date'])
+    data = get_data()
+    rows = query_engine.mask(data, filters) if filters else slice(None)
+    return data.loc[rows, columns if columns is not None else slice(None)].reset_index(drop=True)
+
+
+def state_frames(columns=None):
+    # The data a state at a time, for builders that must not hold all of it.
+    for state in manifest()["states"]:
+        yield select(columns, state=state)
+
+
+def has_state(state):
+    return state in manifest()["states"]
+
+
+def has_date(date):
+    if backend() == "arrow":
+        return query_engine.count_rows(ensure_data(), _filters(date=date)) > 0
+    return bool((get_data()['Date'].to_numpy() == np.datetime64(pd.Timestamp(date))).any())
+
+
+def row_count():
+    if backend() == "arrow":
+        return query_engine.count_rows(ensure_data())
+    return len(get_data())
+
+
+def build_manifest(data=None, version=None):
+    if data is None:
+        path = ensure_data()
+        date_min, date_max = query_engine.bounds(path, 'Date')
+        manifest = {
+            "states": [str(state) for state in query_engine.distinct(path, 'NAME')],
+            "years": [int(year) for year in query_engine.distinct(path, 'Year')],
+            "date_min": pd.Timestamp(date_min).isoformat(),
+            "date_max": pd.Timestamp(date_max).isoformat(),
+        }
+    else:
+        manifest = {
+            "states": [str(state) for state in data['NAME'].unique()],
+            "years": sorted(int(year) for year in data['Year'].unique()),
+            "date_min": data['Date'].min().isoformat(),
+            "date_max": data['Date'].max().isoformat(),
+        }
+    return write_manifest(manifest, version)
+
+
+def _write_json(name, value, version=None):
+    path = os.path.join(cache_dir, version or dataset_version(), name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+    return value
+
+
+def write_manifest(manifest, version=None):
+    return _write_json("manifest.json", manifest, version)
+
+
+def write_quality(report, version=None):
+    return _write_json("quality.json", report, version)
+
+
+def quality(version=None):
+    # Rows and values the cleaning pass dropped, repaired or flagged in
+    # building this version (see data_quality.py).
+    path = os.path.join(cache_dir, version or dataset_version(), "quality.json")
+    if not os.path.exists(path):
+        load_data(version) if CACHE_FORMAT == "pkl" else ensure_data(version)
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest():
+    # The few facts page layouts need (state list, years, date bounds), kept
+    # in a small file so layouts can be built without loading the data.
+    global _manifest
+    if _manifest is None:
+        path = os.path.join(cache_dir, dataset_version(), "manifest.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                raw = json.load(f)
+        else:
+            raw = build_manifest(get_data() if backend() == "memory" else None)
+        _manifest = dict(raw, date_min=pd.Timestamp(raw["date_min"]), date_max=pd.Timestamp(raw["date_max"]))
+    return _manifest
+
+
+def pyramid_frames(data):
+    day_rows = pd.concat(
+        [data[['NAME', 'Date'] + MEASURES], evaluate_factors(data, list(DERIVED_FACTORS))], axis=1
+    )
+    pyramid = {"day": aggregate(day_rows, PYRAMID_MEASURES, "day", by="NAME")}
+    for grain in PYRAMID_GRAINS[1:]:
+        pyramid[grain] = rollup(pyramid["day"], PYRAMID_MEASURES, grain, by="NAME")
+    for frame in pyramid.values():
+        # The year a period starts in, which is the partition it is stored in.
+        frame['Year'] = frame['Date'].dt.year.astype(np.int64)
+    return pyramid
+
+
+def pyramid_path(grain, version=None):
+    if CACHE_FORMAT == "parquet":
+        return os.path.join(cache_dir, version or dataset_version(), f"pyramid_{grain}")
+    return cache_path(f"pyramid_{grain}", version)
+
+
+def build_pyramid(data=None, version=None):
+    if data is not None:
+        pyramid = pyramid_frames(data)
+        for grain, frame in pyramid.items():
+            if CACHE_FORMAT == "parquet":
+                with query_engine.FrameWriter(pyramid_path(grain, version), PARTITION_COLUMNS) as writer:
+                    writer.write(frame)
+            else:
+                write_frame(frame, pyramid_path(grain, version))
+        return pyramid
+
+    # Out of core: every period lies within one state, so the pyramid is built
+    # a state at a time and appended to each grain's partitions.
+    with contextlib.ExitStack() as stack:
+        writers = {
+            grain: stack.enter_context(query_engine.FrameWriter(pyramid_path(grain, version), PARTITION_COLUMNS))
+            for grain in PYRAMID_GRAINS
+        }
+        for state_data in state_frames(['NAME', 'Date'] + MEASURES):
+            for grain, frame in pyramid_frames(state_data).items():
+                writers[grain].write(frame)
+    return None
+
+
+def ensure_pyramid(grain):
+    path = pyramid_path(grain)
+    if not os.path.exists(path):
+        build_pyramid(get_data() if backend() == "memory" else None)
+    return path
+
+
+def read_pyramid(grain, version=None):
+    path = pyramid_path(grain, version) if version else ensure_pyramid(grain)
+    if CACHE_FORMAT == "parquet":
+        frame = query_engine.scan(path, order=['NAME', 'Date'])
+    else:
+        frame = read_frame(path)
+    return frame.set_index("NAME")
+
+
+def get_pyramid(grain):
+    if grain not in _pyramid:
+        _pyramid[grain] = read_pyramid(grain)
+    return _pyramid[grain]
+
+
+def pyramid_lookup(grain, state, columns):
+    stats_columns = [f"{column} {stat}" for column in columns for stat in STATISTICS]
+    if backend() == "arrow":
+        return query_engine.scan(ensure_pyramid(grain), ["Date"] + stats_columns, {"NAME": state}, order=["Date"])
+    pyramid = get_pyramid(grain)
+    start, stop = pyramid.index.slice_locs(state, state)
+    return pyramid.iloc[start:stop][["Date"] + stats_columns].reset_index(drop=True)
+
+
+def preload():
+    # What the callbacks read: the frames themselves in memory mode, only the
+    # cache files they scan in arrow mode.
+    if backend() == "memory":
+        get_data()
+        for grain in PYRAMID_GRAINS:
+            get_pyramid(grain)
+    else:
+        ensure_data()
+        for grain in PYRAMID_GRAINS:
+            ensure_pyramid(grain)
+
+
+def aggregate_range(state, columns, grain, start_date, end_date):
+    # Whole periods come straight from the pyramid; the partial periods at either
+    # end of the range are rolled up from the day level.
+    start = np.datetime64(pd.Timestamp(start_date).date(), "D")
+    end = np.datetime64(pd.Timestamp(end_date).date(), "D")
+    head_key = period_keys([start], grain)[0]
+    head_end = start if head_key == start else next_period_start(head_key, grain)
+    tail_start = period_keys([end + np.timedelta64(1, "D")], grain)[0]
+
+    days = pyramid_lookup("day", state, columns)
+    day_dates = days["Date"].to_numpy()
+
+    if tail_start <= head_end:
+        return rollup(days[(day_dates >= start) & (day_dates <= end)], columns, grain)
+
+    periods = pyramid_lookup(grain, state, columns)
+    period_dates = periods["Date"].to_numpy()
+    parts = [
+        rollup(days[(day_dates >= start) & (day_dates < head_end)], columns, grain),
+        periods[(period_dates >= head_end) & (period_dates < tail_start)],
+        rollup(days[(day_dates >= tail_start) & (day_dates <= end)], columns, grain),
+    ]
+    return pd.concat([part for part in parts if not part.empty], ignore_index=True)
+
+
+def monthly_profile(state, column):
+    months = pyramid_lookup("month", state, [column])
+    month_numbers = months["Date"].dt.month.to_numpy()
+    counts = months[f"{column} count"].to_numpy()
+    weighted = np.where(counts > 0, months[f"{column} mean"].to_numpy() * counts, 0.0)
+
+    totals = np.bincount(month_numbers, weights=counts, minlength=13)[1:]
+    sums = np.bincount(month_numbers, weights=weighted, minlength=13)[1:]
+    present = totals > 0
+    return pd.DataFrame({"Month": np.arange(1, 13)[present], column: sums[present] / totals[present]})
+
+
+if __name__ == "__main__":
+    import climatology
+
+    version = dataset_version()
+    data = get_data() if backend() == "memory" else None
+    build_manifest(data, version)
+    build_pyramid(data, version)
+    climatology.build_climatology(data, version)
+    print(f"Dataset version {version}: {row_count()} rows cached in {os.path.join(cache_dir, version)} "
+          f"({backend()} backend)")
+    for grain in PYRAMID_GRAINS:
+        path = pyramid_path(grain, version)
+        rows = len(read_frame(path)) if CACHE_FORMAT == "pkl" else query_engine.count_rows(path)
+        print(f"  {grain:>5}: {rows} rows x {len(PYRAMID_MEASURES)} measures")
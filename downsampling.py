@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Points per trace sent to the browser; zooming in re-requests the visible window.
+POINT_BUDGET = int(os.environ.get("UV_LINE_POINT_BUDGET", 1500))
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keep the first and last point and, from each
+    # bucket in between, the point forming the largest triangle with the point kept
+    # from the previous bucket and the mean of the next bucket.
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_indices(x, y, threshold=POINT_BUDGET):
+    indices = lttb_indices(x, y, threshold)
+    if len(indices) == len(y):
+        return indices
+    # LTTB favours extremes but does not guarantee them; UV maxima must survive.
+    values = np.asarray(y, dtype=np.float64)
+    if np.isfinite(values).any():
+        indices = np.union1d(indices, [np.nanargmax(values), np.nanargmin(values)])
+    return indices
+
+
+def downsample_frame(frame, x_column, y_column, threshold=POINT_BUDGET):
+    if len(frame) <= threshold:
+        return frame
+    return frame.iloc[downsample_indices(frame[x_column].to_numpy(), frame[y_column].to_numpy(), threshold)]
+
+
+def visible_range(relayout_data):
+    # Returns (start, end) for a zoomed x axis, None when autoranged, and
+    # False when the relayout event did not touch the x axis at all.
+    if not relayout_data:
+        return False
+    if relayout_data.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        bounds = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        bounds = relayout_data["xaxis.range"]
+    else:
+        return False
+    return pd.to_datetime(bounds[0]), pd.to_datetime(bounds[1])
+
+
+def window_frame(frame, x_column, window):
+    if not window:
+        return frame
+    start, end = window
+    dates = frame[x_column]
+    return frame[(dates >= start) & (dates <= end)]
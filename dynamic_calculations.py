@@ -1,101 +1,90 @@
 from dash import dcc, html, Input, Output, callback
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
 import pandas as pd
 import plotly.express as px
-import json
-
-
-uv_data_path = 'todaysdata.csv'
-geojson_path = 'us-states.json'
-
-data = pd.read_csv(uv_data_path)
-with open(geojson_path) as f:
-    geojson = json.load(f)
-
-
-data['Year'] = data['Year'].astype(int)
-data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
-data['Month'] = data['Date'].dt.month
-data['Day'] = data['Date'].dt.day
-
-
-layout = html.Div([
-    html.H1("Machine Learning Analysis - Regression Model", style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Select Your State:"),
-        dcc.Dropdown(
-            id='state-dropdown',
-            options=[{'label': state, 'value': state} for state in data['NAME'].unique()],
-            value=data['NAME'].unique()[0],
-            clearable=False,
-            style={"width": "400px", "margin": "10px auto"}
-        )
-    ], style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Select Analysis Type:"),
-        dcc.Dropdown(
-            id='analysis-type-dropdown',
-            options=[
-                {'label': 'Predict Cloudy Sky UVI', 'value': 'regression'},
-            ],
-            value='regression',
-            clearable=False,
-            style={"width": "400px", "margin": "10px auto"}
-        )
-    ], style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Select Factors:"),
-        dcc.Dropdown(
-            id='factors-dropdown',
-            options=[
-                {'label': 'Clear Sky UVI', 'value': 'Clear Sky UVI'},
-                {'label': 'Cloud Transmission', 'value': 'Cloud Transmission'},
-                {'label': 'Solar Zenith Angle', 'value': 'Solar Zenith Angle'},
-                {'label': 'Aerosol Transmission', 'value': 'Aerosol Transmission'},
-                {'label': 'Total Column Ozone', 'value': 'Total Column Ozone'}
-            ],
-            multi=True,
-            value=['Clear Sky UVI'],
-            style={"width": "400px", "margin": "10px auto"}
-        )
-    ], style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Select Date:"),
-        dcc.DatePickerSingle(
-            id='date-picker',
-            min_date_allowed=data['Date'].min().date(),
-            max_date_allowed=data['Date'].max().date(),
-            initial_visible_month=data['Date'].min().date(),
-            date=data['Date'].min().date(),
-            style={"margin": "10px auto"}
-        )
-    ], style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Adjust Parameters (if applicable):"),
-        dcc.Input(
-            id='num-clusters-input',
-            type='number',
-            value=3,
-            placeholder="Number of Clusters",
-            style={"width": "200px", "margin": "10px"}
-        )
-    ], style={"text-align": "center", "display": "none"}, id="clustering-parameters"),
-
-    html.Div([
-        dcc.Graph(id="ml-output-graph", style={"height": "500px", "border": "2px solid black", "margin": "auto"})
-    ], style={"text-align": "center"}),
-
-    html.Div([
-        html.Label("Actual and Predicted Values:"),
-        html.Div(id="actual-predicted-values", style={"text-align": "center", "margin": "10px"})
+import data_store
+import figure_cache
+import shared_cache
+from metrics import phase
+
+
+def make_layout():
+    manifest = data_store.manifest()
+    return html.Div([
+        html.H1("Machine Learning Analysis - Regression Model", style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Select Your State:"),
+            dcc.Dropdown(
+                id='state-dropdown',
+                options=[{'label': state, 'value': state} for state in manifest['states']],
+                value=manifest['states'][0],
+                clearable=False,
+                style={"width": "400px", "margin": "10px auto"}
+            )
+        ], style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Select Analysis Type:"),
+            dcc.Dropdown(
+                id='analysis-type-dropdown',
+                options=[
+                    {'label': 'Predict Cloudy Sky UVI', 'value': 'regression'},
+                ],
+                value='regression',
+                clearable=False,
+                style={"width": "400px", "margin": "10px auto"}
+            )
+        ], style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Select Factors:"),
+            dcc.Dropdown(
+                id='factors-dropdown',
+                options=[
+                    {'label': 'Clear Sky UVI', 'value': 'Clear Sky UVI'},
+                    {'label': 'Cloud Transmission', 'value': 'Cloud Transmission'},
+                    {'label': 'Solar Zenith Angle', 'value': 'Solar Zenith Angle'},
+                    {'label': 'Aerosol Transmission', 'value': 'Aerosol Transmission'},
+                    {'label': 'Total Column Ozone', 'value': 'Total Column Ozone'}
+                ],
+                multi=True,
+                value=['Clear Sky UVI'],
+                style={"width": "400px", "margin": "10px auto"}
+            )
+        ], style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Select Date:"),
+            dcc.DatePickerSingle(
+                id='date-picker',
+                min_date_allowed=manifest['date_min'].date(),
+                max_date_allowed=manifest['date_max'].date(),
+                initial_visible_month=manifest['date_min'].date(),
+                date=manifest['date_min'].date(),
+                style={"margin": "10px auto"}
+            )
+        ], style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Adjust Parameters (if applicable):"),
+            dcc.Input(
+                id='num-clusters-input',
+                type='number',
+                value=3,
+                placeholder="Number of Clusters",
+                style={"width": "200px", "margin": "10px"}
+            )
+        ], style={"text-align": "center", "display": "none"}, id="clustering-parameters"),
+
+        html.Div([
+            dcc.Graph(id="ml-output-graph", style={"height": "500px", "border": "2px solid black", "margin": "auto"})
+        ], style={"text-align": "center"}),
+
+        html.Div([
+            html.Label("Actual and Predicted Values:"),
+            html.Div(id="actual-predicted-values", style={"text-align": "center", "margin": "10px"})
+        ])
     ])
-])
 
 @callback(
     Output("clustering-parameters", "style"),
@@ -106,6 +95,46 @@ def toggle_clustering_parameters(analysis_type):
         return {"text-align": "center"}
     return {"text-align": "center", "display": "none"}
 
+@shared_cache.memoize("regression", scope=data_store.state_scope)
+def fit_regression(selected_state, selected_factors):
+    # scikit-learn is only needed once a regression is requested.
+    from sklearn.linear_model import LinearRegression
+    from sklearn.model_selection import train_test_split
+
+    with phase("filter"):
+        filtered_data = data_store.select(list(selected_factors) + ["Cloudy Sky UVI"], state=selected_state)
+    if filtered_data.empty:
+        return None, None
+
+    X = filtered_data[list(selected_factors)]
+    y = filtered_data["Cloudy Sky UVI"]
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    model = LinearRegression()
+    with phase("fit"):
+        model.fit(X_train, y_train)
+
+    with phase("predict"):
+        y_pred = model.predict(X_test)
+
+    results_df = pd.DataFrame({
+        "Actual": y_test,
+        "Predicted": y_pred
+    }).reset_index()
+    return model, results_df
+
+
+@figure_cache.memoize(scope=data_store.state_scope)
+def regression_figure(selected_state, selected_factors):
+    _, results_df = fit_regression(selected_state, selected_factors)
+    with phase("figure"):
+        return px.scatter(results_df, x="Actual", y="Predicted",
+                          title=f"Regression Results for {selected_state}: Predicted vs Actual",
+                          labels={"Actual": "Actual Cloudy Sky UVI", "Predicted": "Predicted Cloudy Sky UVI"},
+                          trendline="ols")
+
+
 @callback(
     [Output("ml-output-graph", "figure"),
      Output("actual-predicted-values", "children")],
@@ -121,33 +150,15 @@ def perform_regression(selected_state, analysis_type, selected_factors, selected
     if not selected_factors or "Cloudy Sky UVI" in selected_factors:
         return px.scatter(title="Please select valid factors (excluding Cloudy Sky UVI)."), ""
 
-    state_data = data[data['NAME'] == selected_state]
-
-    filtered_data = state_data.dropna(subset=selected_factors + ["Cloudy Sky UVI"])
-    if filtered_data.empty:
+    model, _ = fit_regression(selected_state, tuple(selected_factors))
+    if model is None:
         return px.scatter(title="No data available for the selected state and factors."), "No data available for the selected date."
 
-    X = filtered_data[selected_factors]
-    y = filtered_data["Cloudy Sky UVI"]
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-
-    y_pred = model.predict(X_test)
-
-    results_df = pd.DataFrame({
-        "Actual": y_test,
-        "Predicted": y_pred
-    }).reset_index()
-
-    fig = px.scatter(results_df, x="Actual", y="Predicted",
-                     title=f"Regression Results for {selected_state}: Predicted vs Actual",
-                     labels={"Actual": "Actual Cloudy Sky UVI", "Predicted": "Predicted Cloudy Sky UVI"},
-                     trendline="ols")
+    fig = regression_figure(selected_state, tuple(selected_factors))
 
-    date_data = filtered_data[filtered_data['Date'] == pd.to_datetime(selected_date)]
+    date_data = data_store.select(
+        selected_factors + ["Cloudy Sky UVI"], state=selected_state, date=pd.to_datetime(selected_date)
+    )
     if not date_data.empty:
         actual_value = date_data["Cloudy Sky UVI"].iloc[0]
         predicted_value = model.predict(date_data[selected_factors])[0]
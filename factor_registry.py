@@ -0,0 +1,180 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+
+# Short names used inside factor expressions for the raw dataset columns.
+INPUT_COLUMNS = {
+    "clear": "Clear Sky UVI",
+    "cloudy": "Cloudy Sky UVI",
+    "cloud_t": "Cloud Transmission",
+    "aerosol_t": "Aerosol Transmission",
+    "ozone": "Total Column Ozone",
+    "zenith": "Solar Zenith Angle",
+}
+
+# Intermediate terms that several factors build on. A term used by more than one
+# requested output is computed once; a term used only once is inlined so the
+# whole expression is evaluated in a single pass.
+SHARED_TERMS = {
+    "cloud_frac": "cloud_t / 100",
+    "aerosol_frac": "aerosol_t / 100",
+    "transmission": "cloud_frac * aerosol_frac",
+    "direct_uv": "clear * aerosol_frac * cos(zenith * deg_to_rad)",
+}
+
+CONSTANTS = {"deg_to_rad": np.pi / 180}
+
+# Order here is the order traces are drawn in.
+DERIVED_FACTORS = {
+    "direct_diffuse": {
+        "label": "Direct and Diffuse UV Components",
+        "inputs": ["clear", "aerosol_t", "zenith"],
+        "params": {},
+        "outputs": {
+            "Direct UV": "direct_uv",
+            "Diffuse UV": "clear - direct_uv",
+        },
+    },
+    "uv_attenuation": {
+        "label": "UV Attenuation Factor",
+        "inputs": ["clear", "cloudy"],
+        "params": {},
+        # Nothing to attenuate under a clear sky with no UV (winter, high latitudes).
+        "outputs": {"UV Attenuation": "where(clear > 0, 1 - cloudy / clear, 0)"},
+    },
+    "cloud_impact": {
+        "label": "Cloud Impact Factor",
+        "inputs": ["cloud_t"],
+        "params": {},
+        "outputs": {"Cloud Impact Factor": "1 - cloud_frac"},
+    },
+    "ozone_protection": {
+        "label": "Ozone Protection Factor",
+        "inputs": ["ozone"],
+        "params": {"kappa": 0.02},
+        "outputs": {"Ozone Protection Factor": "1 - exp(-kappa * ozone)"},
+    },
+    "transmission_efficiency": {
+        "label": "Transmission Efficiency",
+        "inputs": ["cloud_t", "aerosol_t"],
+        "params": {},
+        "outputs": {"Transmission Efficiency": "transmission"},
+    },
+    "solar_energy_potential": {
+        "label": "Solar Energy Potential Adjustment",
+        "inputs": ["cloud_t", "aerosol_t"],
+        "params": {"base_irradiance": 1000},
+        "outputs": {"Solar Energy Potential": "base_irradiance * transmission"},
+    },
+    "weighted_uv": {
+        "label": "Weighted UV Exposure",
+        "inputs": ["clear"],
+        "params": {"action_spectrum_weight": 0.7},
+        "outputs": {"Weighted UV": "clear * action_spectrum_weight"},
+    },
+}
+
+_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+_NUMPY_FUNCTIONS = {"cos": np.cos, "sin": np.sin, "exp": np.exp, "log": np.log, "sqrt": np.sqrt, "abs": np.abs,
+                    "where": np.where}
+
+
+def _names(expression):
+    return [name for name in _NAME_PATTERN.findall(expression) if name not in _NUMPY_FUNCTIONS]
+
+
+def _inline(expression, terms):
+    return _NAME_PATTERN.sub(lambda m: f"({terms[m.group(0)]})" if m.group(0) in terms else m.group(0), expression)
+
+
+def _check_registry():
+    for key, factor in DERIVED_FACTORS.items():
+        allowed = set(factor["inputs"]) | set(factor["params"]) | set(SHARED_TERMS) | set(CONSTANTS)
+        for expression in factor["outputs"].values():
+            unknown = [name for name in _names(expression) if name not in allowed]
+            if unknown:
+                raise ValueError(f"Derived factor '{key}' uses undeclared names: {unknown}")
+
+
+_check_registry()
+
+
+def factor_options():
+    return [{"label": factor["label"], "value": key} for key, factor in DERIVED_FACTORS.items()]
+
+
+def factor_outputs(factor_keys):
+    return [label for key, factor in DERIVED_FACTORS.items() if key in (factor_keys or ()) for label in factor["outputs"]]
+
+
+@lru_cache(maxsize=128)
+def _plan(factor_keys):
+    outputs = {}
+    params = {}
+    for key in DERIVED_FACTORS:
+        if key in factor_keys:
+            outputs.update(DERIVED_FACTORS[key]["outputs"])
+            params.update(DERIVED_FACTORS[key]["params"])
+
+    # Count how often each shared term is reached from the requested outputs.
+    uses = {}
+
+    def visit(expression):
+        for name in _names(expression):
+            if name in SHARED_TERMS:
+                uses[name] = uses.get(name, 0) + 1
+                if uses[name] == 1:
+                    visit(SHARED_TERMS[name])
+
+    for expression in outputs.values():
+        visit(expression)
+
+    inlined = {name: expr for name, expr in SHARED_TERMS.items() if uses.get(name) == 1}
+    for name in inlined:
+        inlined[name] = _inline(inlined[name], inlined)
+
+    steps = []
+    for name in SHARED_TERMS:
+        if uses.get(name, 0) > 1:
+            steps.append((name, _inline(SHARED_TERMS[name], inlined)))
+    for label, expression in outputs.items():
+        steps.append((label, _inline(expression, inlined)))
+
+    needed = set()
+    for _, expression in steps:
+        needed.update(_names(expression))
+    inputs = tuple(alias for alias in INPUT_COLUMNS if alias in needed)
+    return inputs, params, tuple(steps), tuple(outputs)
+
+
+@lru_cache(maxsize=256)
+def _compile(expression):
+    return compile(expression, "<derived factor>", "eval")
+
+
+def _evaluate(expression, env):
+    if numexpr is not None:
+        return numexpr.evaluate(expression, local_dict=env)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return eval(_compile(expression), {"__builtins__": {}, **_NUMPY_FUNCTIONS}, env)
+
+
+def evaluate_factors(frame, factor_keys):
+    inputs, params, steps, outputs = _plan(tuple(sorted(factor_keys or ())))
+
+    env = {alias: frame[INPUT_COLUMNS[alias]].to_numpy(dtype=np.float64) for alias in inputs}
+    env.update(CONSTANTS)
+    env.update(params)
+    for name, expression in steps:
+        env[name] = _evaluate(expression, env)
+
+    return pd.DataFrame({label: env[label] for label in outputs}, index=frame.index)
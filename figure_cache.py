@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import data_store
+import metrics
+from response_encoding import to_json
+from shared_cache import shared_cache
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+# In-process budget for serialized figures, least recently used evicted first;
+# misses fall through to the shared store before anything is recomputed.
+MAX_BYTES = int(float(os.environ.get("UV_FIGURE_CACHE_MB", 64)) * 1024 * 1024)
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES, shared=shared_cache):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.shared_hits = self.misses = 0
+
+    def get(self, key, version=None):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.count_cache("figure", payload is not None)
+        if payload is not None:
+            return payload
+        payload = self.shared.get("figure", key, version)
+        if payload is not None:
+            self._remember(key, payload)
+            with self._lock:
+                self.shared_hits += 1
+            return payload
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, payload, version=None):
+        self._remember(key, payload)
+        self.shared.put("figure", key, payload, version=version)
+
+    def _remember(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+figure_cache = FigureCache()
+
+
+def cache_key(name, args, version=None):
+    # Inputs are normalized through JSON, so tuples and lists, or a Timestamp
+    # and its string form, share an entry.
+    normalized = json.dumps(args, sort_keys=True, default=str)
+    return hashlib.sha1(f"{name}|{version or data_store.dataset_version()}|{normalized}".encode()).hexdigest()
+
+
+def memoize(func=None, scope=None):
+    # Caches the serialized result of a pure function of its arguments and the
+    # dataset; hits are returned as plain JSON structures that Dash re-encodes cheaply.
+    # scope(*args) returns the data_store.scope_version() arguments naming the
+    # rows a result depends on, so ingesting other rows keeps it; without it any
+    # new version invalidates the entry.
+    if func is None:
+        return lambda func: memoize(func, scope)
+
+    @wraps(func)
+    def wrapper(*args):
+        version = data_store.scope_version(**scope(*args)) if scope else data_store.dataset_version()
+        key = cache_key(func.__qualname__, args, version)
+        payload = figure_cache.get(key, version)
+        if payload is None:
+            payload = to_json(func(*args)).encode()
+            figure_cache.put(key, payload, version)
+        return loads(payload)
+    return wrapper
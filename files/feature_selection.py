@@ -4,18 +4,6 @@ from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from itertools import combinations
 
-uv_data_path = 'todaysdata.csv'
-geojson_path = 'us-states.json'
-
-data = pd.read_csv(uv_data_path)
-with open(geojson_path) as f:
-    geojson = json.load(f)
-
-data['Year'] = data['Year'].astype(int)
-data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
-data['Month'] = data['Date'].dt.month
-data['Day'] = data['Date'].dt.day
-
 def forward_selection(data, target, factors):
     best_r2 = 0
     best_combination = None
@@ -39,5 +27,19 @@ def forward_selection(data, target, factors):
 
 factors = ['Clear Sky UVI', 'Cloud Transmission', 'Solar Zenith Angle', 'Aerosol Transmission', 'Total Column Ozone']
 target = 'Cloudy Sky UVI'
-best_factors, best_r2 = forward_selection(data, target, factors)
-print(f"Best Combination: {best_factors}, R^2: {best_r2}")
+
+if __name__ == "__main__":
+    uv_data_path = 'todaysdata.csv'
+    geojson_path = 'us-states.json'
+
+    data = pd.read_csv(uv_data_path)
+    with open(geojson_path) as f:
+        geojson = json.load(f)
+
+    data['Year'] = data['Year'].astype(int)
+    data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
+    data['Month'] = data['Date'].dt.month
+    data['Day'] = data['Date'].dt.day
+
+    best_factors, best_r2 = forward_selection(data, target, factors)
+    print(f"Best Combination: {best_factors}, R^2: {best_r2}")
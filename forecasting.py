@@ -1,311 +1,373 @@
-from dash import dcc, html, Input, Output, State, callback, dash_table
-from prophet import Prophet
+from dash import dcc, html, Input, Output, State, callback, dash_table, ctx, no_update
+from dash.exceptions import PreventUpdate
+from collections import OrderedDict
+import os
+import threading
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
-
-uv_data_path = 'todaysdata.csv'
-data = pd.read_csv(uv_data_path)
-
-data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
-data['Year'] = data['Date'].dt.year
-data['Month'] = data['Date'].dt.month
-data['Day'] = data['Date'].dt.day
-
-
-layout = html.Div(
-    style={"backgroundColor": "#f7f9fc", "padding": "20px", "fontFamily": "Arial"},
-    children=[
-        html.H1(
-            "Forecast Cloudy Sky UVI Using Prophet",
-            style={"textAlign": "center", "color": "#2c3e50", "fontWeight": "bold", "marginBottom": "20px"}
-        ),
-
-        # Arrange boxes side by side in one row
-        dbc.Row(
-            justify="center",
-            children=[
-                dbc.Col(
-                    width=3,
-                    children=dbc.Card(
-                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #2980b9", "borderRadius": "10px"},
-                        children=[
-                            html.Label("Select Your State:", style={"fontWeight": "bold", "color": "#34495e"}),
-                            dcc.Dropdown(
-                                id='state-dropdown',
-                                options=[{'label': state, 'value': state} for state in data['NAME'].unique()],
-                                value=data['NAME'].unique()[0],
-                                clearable=False,
-                                style={"width": "100%", "margin": "auto"}
-                            )
-                        ]
-                    ),
-                ),
-                dbc.Col(
-                    width=3,
-                    children=dbc.Card(
-                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #27ae60", "borderRadius": "10px"},
-                        children=[
-                            html.Label("Select Features (Optional):", style={"fontWeight": "bold", "color": "#34495e"}),
-                            dcc.Checklist(
-                                id='regressor-checklist',
-                                options=[
-                                    {'label': 'Clear Sky UVI', 'value': 'Clear Sky UVI'},
-                                    {'label': 'Total Column Ozone', 'value': 'Total Column Ozone'}
-                                ],
-                                value=[],
-                                style={"padding": "10px", "color": "#34495e"}
-                            )
-                        ]
-                    ),
-                ),
-                dbc.Col(
-                    width=3,
-                    children=dbc.Card(
-                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #e67e22", "borderRadius": "10px"},
-                        children=[
-                            html.Label("Forecast for Future Dates:", style={"fontWeight": "bold", "color": "#34495e"}),
-                            dcc.Input(
-                                id='forecast-days-input',
-                                type='number',
-                                value=30,
-                                placeholder="Enter number of days to forecast",
-                                style={"width": "100%", "margin": "10px auto", "display": "block"}
-                            )
-                        ]
-                    ),
-                ),
-                dbc.Col(
-                    width=3,
-                    children=dbc.Card(
-                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #8e44ad", "borderRadius": "10px"},
-                        children=[
-                            html.Label("Select a Specific Future Date:", style={"fontWeight": "bold", "color": "#34495e"}),
-                            dcc.DatePickerSingle(
-                                id='future-date-picker',
-                                min_date_allowed=data['Date'].max().date(),
-                                max_date_allowed=pd.to_datetime("2025-12-31").date(),
-                                initial_visible_month=data['Date'].max().date(),
-                                placeholder="Select a future date",
-                                style={"margin": "10px auto", "display": "block"}
-                            )
-                        ]
-                    ),
-                ),
-            ],
-        ),
-
-
-        # Forecast Graph
-        dbc.Card(
-            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #16a085", "borderRadius": "10px"},
-            children=[
-                dcc.Graph(id="forecast-graph", style={"height": "500px", "borderRadius": "10px"})
-            ]
-        ),
-
-        # Forecast Value Display (narrow and centered)
-        dbc.Row(
-            justify="center",
-            children=[
-                dbc.Col(
-                    width=6,  # Narrow the box by limiting the column width
-                    children=dbc.Card(
-                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #c0392b", "borderRadius": "10px"},
-                        children=[
-                            html.Label("Forecasted UVI for Selected Date:", style={"fontWeight": "bold", "color": "#34495e"}),
-                            html.Div(
-                                id="forecast-value",
-                                style={"textAlign": "center", "margin": "10px", "color": "#34495e"}
-                            )
-                        ]
-                    ),
-                )
-            ],
-        ),
-
-
-        # Interactive Insights Section
-        html.Div(
-            style={"marginBottom": "20px"},
-            children=[
-                html.H3("Interactive Insights", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
-                dbc.Button("Show/Hide Insights", id="toggle-insights-btn", color="primary", style={"margin": "10px auto", "display": "block"}),
-                dbc.Collapse(
-                    id="insights-collapse",
-                    is_open=False,
-                    children=[
-                        dbc.Card(
-                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #1abc9c", "borderRadius": "10px"},
+import data_store
+from shared_cache import memoize
+from metrics import phase
+from downsampling import downsample_frame, visible_range, window_frame
+from time_aggregation import use_webgl
+
+
+def make_layout():
+    manifest = data_store.manifest()
+    return html.Div(
+        style={"backgroundColor": "#f7f9fc", "padding": "20px", "fontFamily": "Arial"},
+        children=[
+            html.H1(
+                "Forecast Cloudy Sky UVI Using Prophet",
+                style={"textAlign": "center", "color": "#2c3e50", "fontWeight": "bold", "marginBottom": "20px"}
+            ),
+
+            # Arrange boxes side by side in one row
+            dbc.Row(
+                justify="center",
+                children=[
+                    dbc.Col(
+                        width=3,
+                        children=dbc.Card(
+                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #2980b9", "borderRadius": "10px"},
                             children=[
-                                dcc.Graph(id="future-factors-analysis", style={"height": "500px", "borderRadius": "10px"})
+                                html.Label("Select Your State:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                dcc.Dropdown(
+                                    id='state-dropdown',
+                                    options=[{'label': state, 'value': state} for state in manifest['states']],
+                                    value=manifest['states'][0],
+                                    clearable=False,
+                                    style={"width": "100%", "margin": "auto"}
+                                )
                             ]
                         ),
-                        dbc.Row(
-                            justify="center",
-                            children=[
-                                dbc.Col(
-                                    width=10,  # Adjust the width to control the space it takes
-                                    children=dbc.Card(
-                                        style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #f39c12", "borderRadius": "10px"},
-                                        children=[
-                                            dcc.Graph(id="seasonal-trends", style={"height": "400px", "width": "100%"}),
-                                            dcc.Graph(id="distribution-plot", style={"height": "300px", "width": "100%"})
-                                        ]
-                                    ),
-                                )
-                            ],
-                        )
-                    ]
-                )
-            ]
-        ),
-
-        # Skin Damage Risk Analysis Section
-        html.Div(
-            style={"marginBottom": "20px"},
-            children=[
-                html.H3("Skin Damage Risk Analysis", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
-                dbc.Button("Show/Hide Skin Damage Risk Analysis", id="toggle-skin-risk-btn", color="warning", style={"margin": "10px auto", "display": "block"}),
-                dbc.Collapse(
-                    id="skin-risk-collapse",
-                    is_open=False,
-                    children=[
-                        dbc.Card(
-                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #e74c3c", "borderRadius": "10px"},
+                    ),
+                    dbc.Col(
+                        width=3,
+                        children=dbc.Card(
+                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #27ae60", "borderRadius": "10px"},
                             children=[
-                                html.Label("Select a Specific Date:", style={"fontWeight": "bold", "color": "#34495e"}),
-                                dcc.DatePickerSingle(
-                                    id='skin-risk-date-picker',
-                                    min_date_allowed=data['Date'].min().date(),
-                                    max_date_allowed=(data['Date'].max() + pd.Timedelta(days=365)).date(),
-                                    initial_visible_month=data['Date'].max().date(),
-                                    placeholder="Select a date",
-                                    style={"margin": "10px auto", "display": "block"}
-                                ),
-                                html.Label("Select Location:", style={"fontWeight": "bold", "color": "#34495e"}),
-                                dcc.Dropdown(
-                                    id='skin-risk-location',
-                                    options=[{'label': state, 'value': state} for state in data['NAME'].unique()],
-                                    value=data['NAME'].unique()[0],
-                                    clearable=False,
-                                    style={"width": "400px", "margin": "10px auto"}
+                                html.Label("Select Features (Optional):", style={"fontWeight": "bold", "color": "#34495e"}),
+                                dcc.Checklist(
+                                    id='regressor-checklist',
+                                    options=[
+                                        {'label': 'Clear Sky UVI', 'value': 'Clear Sky UVI'},
+                                        {'label': 'Total Column Ozone', 'value': 'Total Column Ozone'}
+                                    ],
+                                    value=[],
+                                    style={"padding": "10px", "color": "#34495e"}
                                 )
                             ]
                         ),
-                        dcc.Graph(id="skin-risk-gauge", style={"height": "400px", "borderRadius": "10px"}),
-                        dbc.Card(
-                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #34495e", "borderRadius": "10px"},
+                    ),
+                    dbc.Col(
+                        width=3,
+                        children=dbc.Card(
+                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #e67e22", "borderRadius": "10px"},
                             children=[
-                                html.Label("Recommendations:", style={"fontWeight": "bold", "color": "#34495e"}),
-                                html.Div(id="skin-risk-recommendations", style={"textAlign": "center", "margin": "10px", "color": "#34495e"})
+                                html.Label("Forecast for Future Dates:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                dcc.Input(
+                                    id='forecast-days-input',
+                                    type='number',
+                                    value=30,
+                                    placeholder="Enter number of days to forecast",
+                                    style={"width": "100%", "margin": "10px auto", "display": "block"}
+                                )
                             ]
-                        )
-                    ]
-                )
-            ]
-        ),
-
-        # Minimal Erythemal Dose Section
-        html.Div(
-            style={"marginBottom": "20px"},
-            children=[
-                html.H3("Minimal Erythemal Dose (MED) Analysis", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
-                dbc.Button("Show/Hide MED Analysis", id="toggle-med-btn", color="danger", style={"margin": "10px auto", "display": "block"}),
-                dbc.Collapse(
-                    id="med-collapse",
-                    is_open=False,
-                    children=[
-                        dbc.Card(
+                        ),
+                    ),
+                    dbc.Col(
+                        width=3,
+                        children=dbc.Card(
                             style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #8e44ad", "borderRadius": "10px"},
                             children=[
-                                html.Label("Select State:", style={"fontWeight": "bold", "color": "#34495e"}),
-                                dcc.Dropdown(
-                                    id='med-state-dropdown',
-                                    options=[{'label': state, 'value': state} for state in data['NAME'].unique()],
-                                    value=data['NAME'].unique()[0],
-                                    clearable=False,
-                                    style={"width": "400px", "margin": "10px auto"}
-                                ),
-                                html.Label("Select Skin Type:", style={"fontWeight": "bold", "color": "#34495e"}),
-                                dcc.Dropdown(
-                                    id='skin-type-dropdown',
-                                    options=[
-                                        {'label': 'Type I - Very Fair', 'value': 200},
-                                        {'label': 'Type II - Fair', 'value': 300},
-                                        {'label': 'Type III - Medium', 'value': 400},
-                                        {'label': 'Type IV - Olive', 'value': 600},
-                                        {'label': 'Type V - Brown', 'value': 800},
-                                        {'label': 'Type VI - Dark Brown/Black', 'value': 1000}
-                                    ],
-                                    value=200,
-                                    clearable=False,
-                                    style={"width": "400px", "margin": "10px auto"}
-                                ),
-                                html.Label("Select Date for MED Calculation:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                html.Label("Select a Specific Future Date:", style={"fontWeight": "bold", "color": "#34495e"}),
                                 dcc.DatePickerSingle(
-                                    id='med-date-picker',
-                                    min_date_allowed=data['Date'].min().date(),
-                                    max_date_allowed=(data['Date'].max() + pd.Timedelta(days=365)).date(),
-                                    initial_visible_month=data['Date'].max().date(),
-                                    placeholder="Select a date",
-                                    style={"margin": "10px auto"}
+                                    id='future-date-picker',
+                                    min_date_allowed=manifest['date_max'].date(),
+                                    max_date_allowed=pd.to_datetime("2025-12-31").date(),
+                                    initial_visible_month=manifest['date_max'].date(),
+                                    placeholder="Select a future date",
+                                    style={"margin": "10px auto", "display": "block"}
                                 )
                             ]
                         ),
-                        html.Div(
-                            style={"padding": "20px"},
+                    ),
+                ],
+            ),
+
+
+            # Forecast Graph
+            dbc.Card(
+                style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #16a085", "borderRadius": "10px"},
+                children=[
+                    dcc.Graph(id="forecast-graph", style={"height": "500px", "borderRadius": "10px"})
+                ]
+            ),
+
+            # Forecast Value Display (narrow and centered)
+            dbc.Row(
+                justify="center",
+                children=[
+                    dbc.Col(
+                        width=6,  # Narrow the box by limiting the column width
+                        children=dbc.Card(
+                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #c0392b", "borderRadius": "10px"},
                             children=[
-                                html.Label("Time to Erythema (minutes):", style={"fontWeight": "bold", "color": "#34495e"}),
-                                html.Div(id="med-result", style={"textAlign": "center", "margin": "10px", "color": "#34495e"})
+                                html.Label("Forecasted UVI for Selected Date:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                html.Div(
+                                    id="forecast-value",
+                                    style={"textAlign": "center", "margin": "10px", "color": "#34495e"}
+                                )
                             ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
-)
+                        ),
+                    )
+                ],
+            ),
+
+
+            # Interactive Insights Section
+            html.Div(
+                style={"marginBottom": "20px"},
+                children=[
+                    html.H3("Interactive Insights", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
+                    dbc.Button("Show/Hide Insights", id="toggle-insights-btn", color="primary", style={"margin": "10px auto", "display": "block"}),
+                    dbc.Collapse(
+                        id="insights-collapse",
+                        is_open=False,
+                        children=[
+                            dbc.Card(
+                                style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #1abc9c", "borderRadius": "10px"},
+                                children=[
+                                    dcc.Graph(id="future-factors-analysis", style={"height": "500px", "borderRadius": "10px"})
+                                ]
+                            ),
+                            dbc.Row(
+                                justify="center",
+                                children=[
+                                    dbc.Col(
+                                        width=10,  # Adjust the width to control the space it takes
+                                        children=dbc.Card(
+                                            style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #f39c12", "borderRadius": "10px"},
+                                            children=[
+                                                dcc.Graph(id="seasonal-trends", style={"height": "400px", "width": "100%"}),
+                                                dcc.Graph(id="distribution-plot", style={"height": "300px", "width": "100%"})
+                                            ]
+                                        ),
+                                    )
+                                ],
+                            )
+                        ]
+                    )
+                ]
+            ),
+
+            # Skin Damage Risk Analysis Section
+            html.Div(
+                style={"marginBottom": "20px"},
+                children=[
+                    html.H3("Skin Damage Risk Analysis", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
+                    dbc.Button("Show/Hide Skin Damage Risk Analysis", id="toggle-skin-risk-btn", color="warning", style={"margin": "10px auto", "display": "block"}),
+                    dbc.Collapse(
+                        id="skin-risk-collapse",
+                        is_open=False,
+                        children=[
+                            dbc.Card(
+                                style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #e74c3c", "borderRadius": "10px"},
+                                children=[
+                                    html.Label("Select a Specific Date:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    dcc.DatePickerSingle(
+                                        id='skin-risk-date-picker',
+                                        min_date_allowed=manifest['date_min'].date(),
+                                        max_date_allowed=(manifest['date_max'] + pd.Timedelta(days=365)).date(),
+                                        initial_visible_month=manifest['date_max'].date(),
+                                        placeholder="Select a date",
+                                        style={"margin": "10px auto", "display": "block"}
+                                    ),
+                                    html.Label("Select Location:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    dcc.Dropdown(
+                                        id='skin-risk-location',
+                                        options=[{'label': state, 'value': state} for state in manifest['states']],
+                                        value=manifest['states'][0],
+                                        clearable=False,
+                                        style={"width": "400px", "margin": "10px auto"}
+                                    )
+                                ]
+                            ),
+                            dcc.Graph(id="skin-risk-gauge", style={"height": "400px", "borderRadius": "10px"}),
+                            dbc.Card(
+                                style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #34495e", "borderRadius": "10px"},
+                                children=[
+                                    html.Label("Recommendations:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    html.Div(id="skin-risk-recommendations", style={"textAlign": "center", "margin": "10px", "color": "#34495e"})
+                                ]
+                            )
+                        ]
+                    )
+                ]
+            ),
+
+            # Minimal Erythemal Dose Section
+            html.Div(
+                style={"marginBottom": "20px"},
+                children=[
+                    html.H3("Minimal Erythemal Dose (MED) Analysis", style={"textAlign": "center", "color": "#2c3e50", "marginBottom": "10px"}),
+                    dbc.Button("Show/Hide MED Analysis", id="toggle-med-btn", color="danger", style={"margin": "10px auto", "display": "block"}),
+                    dbc.Collapse(
+                        id="med-collapse",
+                        is_open=False,
+                        children=[
+                            dbc.Card(
+                                style={"padding": "20px", "marginBottom": "20px", "border": "2px solid #8e44ad", "borderRadius": "10px"},
+                                children=[
+                                    html.Label("Select State:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    dcc.Dropdown(
+                                        id='med-state-dropdown',
+                                        options=[{'label': state, 'value': state} for state in manifest['states']],
+                                        value=manifest['states'][0],
+                                        clearable=False,
+                                        style={"width": "400px", "margin": "10px auto"}
+                                    ),
+                                    html.Label("Select Skin Type:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    dcc.Dropdown(
+                                        id='skin-type-dropdown',
+                                        options=[
+                                            {'label': 'Type I - Very Fair', 'value': 200},
+                                            {'label': 'Type II - Fair', 'value': 300},
+                                            {'label': 'Type III - Medium', 'value': 400},
+                                            {'label': 'Type IV - Olive', 'value': 600},
+                                            {'label': 'Type V - Brown', 'value': 800},
+                                            {'label': 'Type VI - Dark Brown/Black', 'value': 1000}
+                                        ],
+                                        value=200,
+                                        clearable=False,
+                                        style={"width": "400px", "margin": "10px auto"}
+                                    ),
+                                    html.Label("Select Date for MED Calculation:", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    dcc.DatePickerSingle(
+                                        id='med-date-picker',
+                                        min_date_allowed=manifest['date_min'].date(),
+                                        max_date_allowed=(manifest['date_max'] + pd.Timedelta(days=365)).date(),
+                                        initial_visible_month=manifest['date_max'].date(),
+                                        placeholder="Select a date",
+                                        style={"margin": "10px auto"}
+                                    )
+                                ]
+                            ),
+                            html.Div(
+                                style={"padding": "20px"},
+                                children=[
+                                    html.Label("Time to Erythema (minutes):", style={"fontWeight": "bold", "color": "#34495e"}),
+                                    html.Div(id="med-result", style={"textAlign": "center", "margin": "10px", "color": "#34495e"})
+                                ]
+                            )
+                        ]
+                    )
+                ]
+            )
+        ]
+    )
 
 
 
-@callback(
-    [Output("forecast-graph", "figure"),
-     Output("forecast-value", "children")],
-    [Input("state-dropdown", "value"),
-     Input("regressor-checklist", "value"),
-     Input("forecast-days-input", "value"),
-     Input("future-date-picker", "date")]
-)
-def forecast_uv_index(selected_state, selected_regressors, forecast_days, future_date):
-    state_data = data[data['NAME'] == selected_state]
+# Zooming the forecast graph re-requests the visible window, so recent fits are
+# kept in-process, least recently used evicted first; every worker shares the
+# fits through the shared cache. Callers must not modify the returned frames.
+FIT_CACHE_SIZE = int(os.environ.get("UV_FIT_CACHE_SIZE", 32))
+fitted_forecasts = OrderedDict()
+_fitted_lock = threading.Lock()
+
+
+def fit_forecast(selected_state, selected_regressors, forecast_days, target='Cloudy Sky UVI'):
+    key = (selected_state, tuple(selected_regressors), forecast_days, target)
+    with _fitted_lock:
+        if key in fitted_forecasts:
+            fitted_forecasts.move_to_end(key)
+            return fitted_forecasts[key]
+    version = data_store.scope_version(state=selected_state)
+    result = fit_prophet(*key)
+    with _fitted_lock:
+        # Not kept if the state's data was swapped while fitting.
+        if data_store.scope_version(state=selected_state) == version:
+            fitted_forecasts[key] = result
+        while len(fitted_forecasts) > FIT_CACHE_SIZE:
+            fitted_forecasts.popitem(last=False)
+    return result
+
+
+@data_store.on_swap
+def drop_fits(states):
+    with _fitted_lock:
+        for key in [key for key in fitted_forecasts if states is None or key[0] in states]:
+            del fitted_forecasts[key]
+
+
+@memoize("forecast", scope=data_store.state_scope)
+def fit_prophet(selected_state, selected_regressors, forecast_days, target):
+    # Imported here: prophet and its Stan backend take longer to load than the rest of the app.
+    from prophet import Prophet
+
+    with phase("filter"):
+        state_data = data_store.select(['Date', target, *selected_regressors], state=selected_state)
+        prophet_data = state_data[['Date', target]].rename(columns={'Date': 'ds', target: 'y'})
 
-    prophet_data = state_data[['Date', 'Cloudy Sky UVI']].rename(columns={'Date': 'ds', 'Cloudy Sky UVI': 'y'})
     prophet_model = Prophet()
 
     for regressor in selected_regressors:
         prophet_data[regressor] = state_data[regressor]
         prophet_model.add_regressor(regressor)
 
-    prophet_model.fit(prophet_data)
+    with phase("fit"):
+        prophet_model.fit(prophet_data)
 
     future = prophet_model.make_future_dataframe(periods=forecast_days)
     for regressor in selected_regressors:
         future[regressor] = state_data[regressor].mean()
 
 
-    forecast = prophet_model.predict(future)
+    with phase("predict"):
+        forecast = prophet_model.predict(future)
+    return prophet_data, forecast
 
-    fig = px.line(
-        forecast, x='ds', y='yhat',
-        title=f"Forecast for {selected_state}",
-        labels={'ds': 'Date', 'yhat': 'Cloudy Sky UVI'},
-        line_shape='linear',
-    )
-    fig.add_scatter(x=prophet_data['ds'], y=prophet_data['y'], mode='markers', name='Actual')
-    fig.add_scatter(x=forecast['ds'], y=forecast['yhat'], mode='lines', name='Forecast', line=dict(color='blue'))
-    fig.update_layout(title_font_size=20, legend_title_text='Legend')
+
+@callback(
+    [Output("forecast-graph", "figure"),
+     Output("forecast-value", "children")],
+    [Input("state-dropdown", "value"),
+     Input("regressor-checklist", "value"),
+     Input("forecast-days-input", "value"),
+     Input("future-date-picker", "date"),
+     Input("forecast-graph", "relayoutData")]
+)
+def forecast_uv_index(selected_state, selected_regressors, forecast_days, future_date, relayout_data=None):
+    zoomed = relayout_data is not None and ctx.triggered_id == "forecast-graph"
+    window = visible_range(relayout_data) if zoomed else None
+    if window is False:
+        raise PreventUpdate
+
+    prophet_data, forecast = fit_forecast(selected_state, tuple(selected_regressors), forecast_days)
+
+    with phase("filter"):
+        actual = downsample_frame(window_frame(prophet_data, 'ds', window), 'ds', 'y')
+        predicted = downsample_frame(window_frame(forecast, 'ds', window), 'ds', 'yhat')
+
+    with phase("figure"):
+        fig = px.line(
+            predicted, x='ds', y='yhat',
+            title=f"Forecast for {selected_state}",
+            labels={'ds': 'Date', 'yhat': 'Cloudy Sky UVI'},
+            line_shape='linear',
+        )
+        fig.add_scatter(x=actual['ds'], y=actual['y'], mode='markers', name='Actual')
+        fig.add_scatter(x=predicted['ds'], y=predicted['yhat'], mode='lines', name='Forecast', line=dict(color='blue'))
+        fig.update_layout(title_font_size=20, legend_title_text='Legend',
+                          uirevision=f"{selected_state}|{sorted(selected_regressors)}|{forecast_days}")
+        fig = use_webgl(fig)
+
+    if zoomed:
+        return fig, no_update
 
     if future_date:
         future_date = pd.to_datetime(future_date)
@@ -326,23 +388,17 @@ def forecast_uv_index(selected_state, selected_regressors, forecast_days, future
      Input("forecast-days-input", "value")]
 )
 def analyze_future_factors(selected_state, forecast_days):
-    state_data = data[data['NAME'] == selected_state]
-    prophet_data = state_data[['Date', 'Cloudy Sky UVI']].rename(columns={'Date': 'ds', 'Cloudy Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    forecast = prophet_model.predict(future)
-
-    forecast['Day'] = forecast['ds'].dt.day
-    analysis_fig = px.line(
-        forecast, x='ds', y=['yhat', 'yhat_lower', 'yhat_upper'],
-        title="Upper and Lower Bound variations of Forecast Cloudy Sky UVI for the selected State",
-        labels={"value": "UVI", "variable": "Type", "ds": "Date"},
-        line_group="variable",
-    )
-    analysis_fig.update_layout(title_font_size=20, legend_title_text='Type')
-    return analysis_fig
+    _, forecast = fit_forecast(selected_state, (), forecast_days)
+
+    with phase("figure"):
+        analysis_fig = px.line(
+            forecast, x='ds', y=['yhat', 'yhat_lower', 'yhat_upper'],
+            title="Upper and Lower Bound variations of Forecast Cloudy Sky UVI for the selected State",
+            labels={"value": "UVI", "variable": "Type", "ds": "Date"},
+            line_group="variable",
+        )
+        analysis_fig.update_layout(title_font_size=20, legend_title_text='Type')
+    return use_webgl(analysis_fig)
 
 
 
@@ -352,25 +408,20 @@ def analyze_future_factors(selected_state, forecast_days):
      Input("forecast-days-input", "value")]
 )
 def plot_seasonal_trends(selected_state, forecast_days):
-    state_data = data[data['NAME'] == selected_state]
-    prophet_data = state_data[['Date', 'Cloudy Sky UVI']].rename(columns={'Date': 'ds', 'Cloudy Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    forecast = prophet_model.predict(future)
-
-    forecast['Month'] = forecast['ds'].dt.month
-    monthly_avg = forecast.groupby('Month')['yhat'].mean()
-
-    fig = px.bar(
-        x=monthly_avg.index,
-        y=monthly_avg.values,
-        title="Monthly Trends in Forecasted Cloudy Sky UVI",
-        labels={'x': 'Month', 'y': 'Average UVI'},
-        color=monthly_avg.index,
-        color_continuous_scale=px.colors.sequential.Viridis
-    )
-    fig.update_layout(title_font_size=20, xaxis_title="Month", yaxis_title="Average UVI", coloraxis_showscale=False)
+    _, forecast = fit_forecast(selected_state, (), forecast_days)
+
+    monthly_avg = forecast.groupby(forecast['ds'].dt.month.rename('Month'))['yhat'].mean()
+
+    with phase("figure"):
+        fig = px.bar(
+            x=monthly_avg.index,
+            y=monthly_avg.values,
+            title="Monthly Trends in Forecasted Cloudy Sky UVI",
+            labels={'x': 'Month', 'y': 'Average UVI'},
+            color=monthly_avg.index,
+            color_continuous_scale=px.colors.sequential.Viridis
+        )
+        fig.update_layout(title_font_size=20, xaxis_title="Month", yaxis_title="Average UVI", coloraxis_showscale=False)
     return fig
 
 @callback(
@@ -379,21 +430,17 @@ def plot_seasonal_trends(selected_state, forecast_days):
      Input("forecast-days-input", "value")]
 )
 def plot_distribution(selected_state, forecast_days):
-    state_data = data[data['NAME'] == selected_state]
-    prophet_data = state_data[['Date', 'Cloudy Sky UVI']].rename(columns={'Date': 'ds', 'Cloudy Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    forecast = prophet_model.predict(future)
-
-    fig = px.histogram(
-        forecast, x='yhat',
-        title="Forecast Distribution",
-        labels={'yhat': 'Forecasted UVI'},
-        nbins=20,
-        color_discrete_sequence=px.colors.qualitative.Bold
-    )
-    fig.update_layout(title_font_size=20, xaxis_title="Forecasted UVI", yaxis_title="Frequency")
+    _, forecast = fit_forecast(selected_state, (), forecast_days)
+
+    with phase("figure"):
+        fig = px.histogram(
+            forecast, x='yhat',
+            title="Forecast Distribution",
+            labels={'yhat': 'Forecasted UVI'},
+            nbins=20,
+            color_discrete_sequence=px.colors.qualitative.Bold
+        )
+        fig.update_layout(title_font_size=20, xaxis_title="Forecasted UVI", yaxis_title="Frequency")
     return fig
 
 @callback(
@@ -409,16 +456,11 @@ def calculate_skin_risk(selected_date, selected_location, forecast_days):
 
     selected_date = pd.to_datetime(selected_date)
 
-    state_data = data[data['NAME'] == selected_location]
+    state_data = data_store.select(['Aerosol Transmission'], state=selected_location)
     if state_data.empty:
         return go.Figure(), "No data available for the selected location."
 
-    prophet_data = state_data[['Date', 'Clear Sky UVI']].rename(columns={'Date': 'ds', 'Clear Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    forecast = prophet_model.predict(future)
+    _, forecast = fit_forecast(selected_location, (), forecast_days, 'Clear Sky UVI')
 
     forecast_row = forecast[forecast['ds'] == selected_date]
     if forecast_row.empty:
@@ -479,16 +521,10 @@ def calculate_med(selected_state, skin_type_med, med_date, forecast_days):
 
     med_date = pd.to_datetime(med_date)
 
-    state_data = data[data['NAME'] == selected_state]
-    if state_data.empty:
+    if not data_store.has_state(selected_state):
         return "No data available for the selected state."
 
-    prophet_data = state_data[['Date', 'Clear Sky UVI']].rename(columns={'Date': 'ds', 'Clear Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    forecast = prophet_model.predict(future)
+    _, forecast = fit_forecast(selected_state, (), forecast_days, 'Clear Sky UVI')
 
     forecast_row = forecast[forecast['ds'] == med_date]
     if forecast_row.empty:
@@ -543,18 +579,10 @@ def generate_ten_day_forecast(location, forecast_days, start_date):
 
     start_date = pd.to_datetime(start_date)
 
-    state_data = data[data['NAME'] == location]
-    if state_data.empty:
+    if not data_store.has_state(location):
         return []
 
-    prophet_data = state_data[['Date', 'Clear Sky UVI']].rename(columns={'Date': 'ds', 'Clear Sky UVI': 'y'})
-    prophet_model = Prophet()
-    prophet_model.fit(prophet_data)
-
-    future = prophet_model.make_future_dataframe(periods=forecast_days)
-    future = future[future['ds'] >= start_date] 
-
-    forecast = prophet_model.predict(future)
+    _, forecast = fit_forecast(location, (), forecast_days, 'Clear Sky UVI')
 
     next_10_days = forecast[forecast['ds'] >= start_date].head(10)
 
@@ -0,0 +1,176 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+from flask import Response, abort, request
+
+
+GEOMETRY_FILES = {"us-states": "us-states.json"}
+
+# Simplification tolerance (degrees) and coordinate precision per detail level.
+LEVELS = {
+    "low": {"tolerance": 0.08, "digits": 2},
+    "medium": {"tolerance": 0.02, "digits": 3},
+    "high": {"tolerance": 0.0, "digits": 5},
+}
+DEFAULT_LEVEL = "low"
+# geo.projection.scale at which the next level of detail is used.
+ZOOM_THRESHOLDS = [(6.0, "high"), (2.0, "medium")]
+
+
+@lru_cache(maxsize=None)
+def load_geometry(name):
+    with open(GEOMETRY_FILES[name]) as f:
+        return json.load(f)
+
+
+def feature_names(name):
+    return [feature["properties"]["name"] for feature in load_geometry(name)["features"]]
+
+
+def level_for_zoom(scale):
+    for threshold, level in ZOOM_THRESHOLDS:
+        if scale >= threshold:
+            return level
+    return DEFAULT_LEVEL
+
+
+def _polygons(geometry):
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    return geometry["coordinates"]
+
+
+def _douglas_peucker(points, tolerance):
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def _quantize(ring, digits):
+    ring = np.round(np.asarray(ring, dtype=np.float64), digits)
+    # Drop repeated vertices created by rounding and the closing vertex.
+    distinct = np.concatenate(([True], np.any(ring[1:] != ring[:-1], axis=1)))
+    ring = ring[distinct]
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+
+def simplify(collection, tolerance, digits):
+    # Topology-preserving simplification: borders shared by neighbouring
+    # polygons are split into arcs at the vertices where the set of polygons
+    # sharing the border changes. Every arc is simplified once, in a canonical
+    # direction, so both neighbours get exactly the same border back.
+    rings = []
+    for feature in collection["features"]:
+        for polygon in _polygons(feature["geometry"]):
+            for ring in polygon:
+                rings.append(_quantize(ring, digits))
+
+    owners = {}
+    for ring_id, ring in enumerate(rings):
+        for point in map(tuple, ring):
+            owners.setdefault(point, set()).add(ring_id)
+
+    arc_cache = {}
+
+    def simplify_arc(arc):
+        key = (tuple(arc[0]), tuple(arc[-1]), len(arc))
+        reverse = key[0] > key[1]
+        if reverse:
+            arc = arc[::-1]
+            key = (key[1], key[0], key[2])
+        cache_key = key + (arc.tobytes(),)
+        if cache_key not in arc_cache:
+            arc_cache[cache_key] = _douglas_peucker(arc, tolerance) if tolerance > 0 else arc
+        result = arc_cache[cache_key]
+        return result[::-1] if reverse else result
+
+    simplified_rings = []
+    for ring in rings:
+        if len(ring) < 4:
+            simplified_rings.append(ring)
+            continue
+        ring_owners = [frozenset(owners[tuple(point)]) for point in ring]
+        fixed = [
+            i for i in range(len(ring))
+            if ring_owners[i] != ring_owners[i - 1] or ring_owners[i] != ring_owners[(i + 1) % len(ring)]
+        ]
+        if not fixed:
+            # A ring sharing no border: anchor it at its first and farthest vertex.
+            farthest = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+            fixed = [0, farthest] if farthest else [0]
+
+        ring = np.roll(ring, -fixed[0], axis=0)
+        anchors = [i - fixed[0] for i in fixed] + [len(ring)]
+        closed = np.vstack([ring, ring[:1]])
+        pieces = [simplify_arc(closed[start:stop + 1])[:-1] for start, stop in zip(anchors[:-1], anchors[1:])]
+        result = np.vstack(pieces)
+        simplified_rings.append(result if len(result) >= 3 else ring)
+
+    features = []
+    ring_iter = iter(simplified_rings)
+    for feature in collection["features"]:
+        polygons = []
+        for polygon in _polygons(feature["geometry"]):
+            polygon_rings = []
+            for _ in polygon:
+                ring = next(ring_iter)
+                polygon_rings.append(np.vstack([ring, ring[:1]]).tolist())
+            polygons.append(polygon_rings)
+        geometry = (
+            {"type": "Polygon", "coordinates": polygons[0]}
+            if feature["geometry"]["type"] == "Polygon"
+            else {"type": "MultiPolygon", "coordinates": polygons}
+        )
+        features.append({"type": "Feature", "id": feature.get("id"), "properties": feature["properties"], "geometry": geometry})
+    return {"type": "FeatureCollection", "features": features}
+
+
+@lru_cache(maxsize=None)
+def geometry_json(name, level):
+    settings = LEVELS[level]
+    collection = simplify(load_geometry(name), settings["tolerance"], settings["digits"])
+    return json.dumps(collection, separators=(",", ":"))
+
+
+def register_routes(server, prefix="/"):
+    # prefix is the app's routes_pathname_prefix, so the files are served
+    # beside the Dash routes when the app is mounted under a path.
+    @server.route(f"{prefix}geometry/<name>/<level>.json")
+    def serve_geometry(name, level):
+        if name not in GEOMETRY_FILES or level not in LEVELS:
+            abort(404)
+        response = Response(geometry_json(name, level), mimetype="application/geo+json")
+        response.set_etag(f"{name}-{level}-{int(os.path.getmtime(GEOMETRY_FILES[name]))}")
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
+
+
+if __name__ == "__main__":
+    for name in GEOMETRY_FILES:
+        original = len(json.dumps(load_geometry(name), separators=(",", ":")))
+        for level in LEVELS:
+            print(f"{name} {level:>6}: {len(geometry_json(name, level)):>8} bytes (source {original})")
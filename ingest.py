@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import climatology
+import data_quality
+import data_store
+import query_engine
+from time_aggregation import rollup
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between scans of a watched drop folder. A file is ingested once its
+# size is unchanged between two scans, so half-copied files are left alone.
+POLL_SECONDS = float(os.environ.get("UV_INGEST_POLL", 10))
+# Versions kept on disk; workers may still be reading the previous one for a moment.
+KEEP_VERSIONS = int(os.environ.get("UV_KEEP_VERSIONS", 3))
+LOCK_PATH = os.path.join(data_store.cache_dir, "ingest.lock")
+REQUIRED_COLUMNS = ["Date", "NAME", "Year"] + data_store.MEASURES
+BATCH_SUFFIXES = (".csv", ".parquet")
+
+
+def read_batch(path):
+    frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+    return frame
+
+
+def validate(frame, key_columns):
+    # data_quality.clean drops what the store cannot hold; of the same key
+    # twice in the batch, the last one wins.
+    frame, report = data_quality.clean(frame)
+    duplicated = frame.duplicated(subset=key_columns, keep="last").to_numpy()
+    report["dropped"]["duplicate in batch"] = int(duplicated.sum())
+    report["kept"] -= int(duplicated.sum())
+    return frame[~duplicated], report
+
+
+def new_rows(batch, key_columns, parent):
+    # Append-only: rows whose key is already stored are dropped.
+    filters = {
+        "NAME": sorted(batch["NAME"].unique()),
+        "Date": (batch["Date"].min(), batch["Date"].max()),
+        "Year": (int(batch["Year"].min()), int(batch["Year"].max())),
+    }
+    stored = query_engine.scan(data_store.data_path(parent), key_columns, filters, categories=())
+    if stored.empty:
+        return batch, 0
+    known = pd.MultiIndex.from_frame(stored[key_columns].astype({"NAME": str}))
+    present = pd.MultiIndex.from_frame(batch[key_columns]).isin(known)
+    return batch[~present], int(present.sum())
+
+
+def update_pyramid(batch, parent, version):
+    # Every statistic in the pyramid merges: the periods a batch touches are
+    # rolled up from their stored row and the batch's, and only the (state,
+    # year) partitions holding them are rewritten. The rest are hard links.
+    for grain, rows in data_store.pyramid_frames(batch).items():
+        source = data_store.pyramid_path(grain, parent)
+        target = data_store.pyramid_path(grain, version)
+        query_engine.link_tree(source, target)
+        filters = {"NAME": sorted(rows["NAME"].unique()), "Year": sorted(int(year) for year in rows["Year"].unique())}
+        stored = query_engine.scan(source, filters=filters, categories=())
+        for path in query_engine.files(source, filters):
+            os.remove(os.path.join(target, os.path.relpath(path, source)))
+        # A batch opening a new (state, year) has nothing stored to merge with.
+        parts = [frame for frame in (stored, rows) if not frame.empty]
+        merged = rollup(pd.concat(parts, ignore_index=True), data_store.PYRAMID_MEASURES, grain, by="NAME")
+        merged["Year"] = merged["Date"].dt.year.astype(np.int64)
+        query_engine.append(target, merged, f"ingest-{version}")
+
+
+def update_climatology(batch, parent, version):
+    # A state's normals pool all its years, so each state in the batch is
+    # recomputed from its full history; other states' rows are copied.
+    states = sorted(batch["NAME"].unique())
+    stored = data_store.read_frame(data_store.cache_path("climatology", parent))
+    columns = ["NAME", "Date", "Year"] + climatology.CLIMATOLOGY_MEASURES
+    recomputed = [
+        climatology.climatology_frame(query_engine.scan(
+            data_store.data_path(version), columns, {"NAME": state}, order=["Date"], categories=()
+        ))
+        for state in states
+    ]
+    result = pd.concat([stored[~stored["NAME"].isin(states)].astype({"NAME": str})] + recomputed, ignore_index=True)
+    result = result.sort_values("NAME", kind="stable", ignore_index=True)
+    data_store.write_frame(result, data_store.cache_path("climatology", version))
+
+
+def update_manifest(batch, parent, version):
+    with open(os.path.join(data_store.cache_dir, parent, "manifest.json")) as f:
+        manifest = json.load(f)
+    manifest["states"] = sorted(set(manifest["states"]) | set(batch["NAME"].unique()))
+    manifest["years"] = sorted(set(manifest["years"]) | {int(year) for year in batch["Year"].unique()})
+    manifest["date_min"] = min(pd.Timestamp(manifest["date_min"]), batch["Date"].min()).isoformat()
+    manifest["date_max"] = max(pd.Timestamp(manifest["date_max"]), batch["Date"].max()).isoformat()
+    data_store.write_manifest(manifest, version)
+
+
+def publish(entry):
+    # The lineage file is the switch: workers serve a version once it is listed.
+    versions = data_store.read_lineage() + [entry]
+    tmp_path = f"{data_store.LINEAGE_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"source": data_store.source_version(), "versions": versions}, f, indent=1)
+    os.replace(tmp_path, data_store.LINEAGE_PATH)
+    return versions
+
+
+def prune(versions, keep=KEEP_VERSIONS):
+    # Only directories of listed versions are removed; shared files survive
+    # through their other hard links.
+    for entry in versions[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(data_store.cache_dir, entry["version"]), ignore_errors=True)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    # An exclusive lock on path across processes. Imported here: the app
+    # imports this module for install(), and fcntl does not exist on Windows.
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            # LK_LOCK gives up after ten one-second tries; keep waiting.
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ingest(paths, keep=KEEP_VERSIONS):
+    if not query_engine.available():
+        raise RuntimeError("Ingestion needs pyarrow")
+
+    os.makedirs(data_store.cache_dir, exist_ok=True)
+    # One ingest at a time.
+    with file_lock(LOCK_PATH):
+        # A watching process published the previous batch itself.
+        data_store.refresh()
+        parent = data_store.dataset_version()
+        # Everything the new version is derived from, built if this is the
+        # first batch on top of the source file.
+        data_store.ensure_data(parent)
+        for grain in data_store.PYRAMID_GRAINS:
+            data_store.ensure_pyramid(grain)
+        climatology.get_climatology()
+        data_store.manifest()
+        data_store.quality(parent)
+        data_store.release()
+
+        raw = pd.concat([read_batch(path) for path in paths], ignore_index=True)
+        key_columns = ["NAME", "Date"] + [column for column in ["Hour"] if column in raw.columns]
+        valid, report = validate(raw, key_columns)
+        batch = data_store.prepare_data(valid, categorical=False)
+        batch, report["dropped"]["already stored"] = new_rows(batch, key_columns, parent)
+        report["kept"] = len(batch)
+        result = {"files": [os.path.basename(path) for path in paths], "rows": len(raw), "added": len(batch),
+                  "dropped": report["dropped"], "year repaired": report["year repaired"]}
+        if batch.empty:
+            result["version"] = parent
+            return result
+
+        digest = hashlib.sha1(pd.util.hash_pandas_object(batch, index=False).to_numpy().tobytes()).hexdigest()
+        version = f"{time.strftime('%Y%m%d%H%M%S')}-{digest[:8]}"
+        try:
+            query_engine.link_tree(data_store.data_path(parent), data_store.data_path(version))
+            query_engine.append(data_store.data_path(version), batch, f"ingest-{version}")
+            update_pyramid(batch, parent, version)
+            update_climatology(batch, parent, version)
+            update_manifest(batch, parent, version)
+            data_store.write_quality(data_quality.merge(data_store.quality(parent), report), version)
+        except BaseException:
+            shutil.rmtree(os.path.join(data_store.cache_dir, version), ignore_errors=True)
+            raise
+
+        entry = {
+            "version": version,
+            "parent": parent,
+            "states": sorted(batch["NAME"].unique()),
+            "start": batch["Date"].min().strftime("%Y-%m-%d"),
+            "end": batch["Date"].max().strftime("%Y-%m-%d"),
+            "rows": len(batch),
+            "files": result["files"],
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        prune(publish(entry), keep)
+    result["version"] = version
+    return result
+
+
+def _move(path, directory, note=None):
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(path))
+    os.replace(path, target)
+    if note is not None:
+        with open(f"{target}.error.txt", "w") as f:
+            f.write(note)
+
+
+def watch(directory, interval=POLL_SECONDS, keep=KEEP_VERSIONS):
+    # Ingested files move to done/, files that fail to rejected/ with the reason beside them.
+    sizes = {}
+    while True:
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.startswith(".") or not name.endswith(BATCH_SUFFIXES) or not os.path.isfile(path):
+                continue
+            size = os.path.getsize(path)
+            if sizes.get(name) != size:
+                sizes[name] = size
+                continue
+            del sizes[name]
+            try:
+                result = ingest([path], keep)
+            except Exception as exc:
+                logger.exception("Ingesting %s failed", path)
+                _move(path, os.path.join(directory, "rejected"), f"{type(exc).__name__}: {exc}\n")
+            else:
+                logger.info("Ingested %s: %s", name, json.dumps(result))
+                _move(path, os.path.join(directory, "done"))
+        time.sleep(interval)
+
+
+def install(app):
+    # Workers pick up a version published by ingest() on their next request.
+    @app.server.before_request
+    def pick_up_new_version():
+        data_store.refresh()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new UV observations to the columnar store.")
+    parser.add_argument("files", nargs="*", help="CSV or Parquet files with the todaysdata.csv columns.")
+    parser.add_argument("--watch", metavar="DIR", help="Keep ingesting files dropped into this folder.")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS, help="Seconds between folder scans.")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="Dataset versions kept on disk.")
+    args = parser.parse_args()
+    if not args.files and not args.watch:
+        parser.error("give files to ingest or --watch DIR")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.files:
+        print(json.dumps(ingest(args.files, args.keep), indent=2))
+    if args.watch:
+        watch(args.watch, args.interval, args.keep)
+
+
+if __name__ == "__main__":
+    main()
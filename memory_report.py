@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+from markupsafe import escape
+
+import climatology
+import data_store
+import geometry
+from admin import admin_only, admin_page
+from figure_cache import figure_cache
+from shared_cache import shared_cache
+
+try:
+    import resource
+except ImportError:
+    # Windows: no getrusage; psutil, where installed, gives the current RSS.
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Snapshots of the totals, one JSON line each, so growth can be followed
+# across requests and restarts; "off" disables the log.
+MEMORY_LOG = os.environ.get("UV_MEMORY_LOG", os.path.join(data_store.cache_dir, "memory.log"))
+MEMORY_LOG_BYTES = 5 * 1024 * 1024
+# Each worker records a snapshot at most this often while serving; 0 disables it.
+SNAPSHOT_INTERVAL = float(os.environ.get("UV_MEMORY_INTERVAL", 300))
+
+# Shared objects that would otherwise be counted inside every model.
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+           types.CodeType, threading.Thread)
+
+_last_snapshot = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def deep_size(obj, seen=None):
+    # Bytes reachable from obj. Frames and arrays report their buffers (and
+    # the Python objects in object columns); shared objects reached through
+    # seen are counted once.
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        if isinstance(item, pd.DataFrame):
+            total += int(item.memory_usage(deep=True, index=True).sum())
+        elif isinstance(item, (pd.Series, pd.Index)):
+            total += int(item.memory_usage(deep=True))
+        elif isinstance(item, np.ndarray):
+            total += item.nbytes if item.base is None else 0
+            if item.dtype.kind == "O":
+                stack.extend(item.ravel())
+        else:
+            total += sys.getsizeof(item)
+            if isinstance(item, dict):
+                stack.extend(item.keys())
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple, set, frozenset)):
+                stack.extend(item)
+            elif not isinstance(item, (str, bytes, bytearray, int, float, complex, bool)):
+                if hasattr(item, "__dict__"):
+                    stack.append(item.__dict__)
+                for slot in getattr(type(item), "__slots__", ()):
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return total
+
+
+def process_memory():
+    # RSS counts shared copy-on-write pages in every worker; PSS splits them
+    # between the processes sharing them and is what sizes a host.
+    result = {"peak_rss": None}
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss"] = peak if sys.platform == "darwin" else peak * 1024
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                    result[key.lower()] = int(value.split()[0]) * 1024
+        result["uss"] = result.pop("private_clean", 0) + result.pop("private_dirty", 0)
+    except OSError:
+        if psutil is not None:
+            result["rss"] = psutil.Process().memory_info().rss
+        elif result["peak_rss"] is not None:
+            result["rss"] = result["peak_rss"]
+    return result
+
+
+def _frame_entry(name, frame, columns=True):
+    entry = {"name": name, "rows": len(frame), "bytes": int(frame.memory_usage(deep=True, index=True).sum())}
+    if columns:
+        usage = frame.memory_usage(deep=True, index=True)
+        entry["columns"] = [
+            {"name": str(column), "dtype": str(frame[column].dtype) if column != "Index" else "index",
+             "bytes": int(size)}
+            for column, size in usage.sort_values(ascending=False).items()
+        ]
+    return entry
+
+
+def datasets(columns=True):
+    # Frames are reported once this process has loaded them. The geometry
+    # caches cannot be listed, so once any level is loaded all are sized.
+    entries = []
+    if data_store._data is not None:
+        entries.append(_frame_entry("data", data_store._data, columns))
+    for grain in data_store.PYRAMID_GRAINS:
+        if grain in data_store._pyramid:
+            entries.append(_frame_entry(f"pyramid {grain}", data_store._pyramid[grain], columns))
+    if climatology._climatology is not None:
+        entries.append(_frame_entry("climatology", climatology._climatology, columns))
+    if geometry.load_geometry.cache_info().currsize:
+        for name in geometry.GEOMETRY_FILES:
+            entries.append({"name": f"geometry {name}", "bytes": deep_size(geometry.load_geometry(name))})
+    if geometry.geometry_json.cache_info().currsize:
+        entries.append({
+            "name": "geometry json",
+            "entries": geometry.geometry_json.cache_info().currsize,
+            "bytes": sum(sys.getsizeof(geometry.geometry_json(name, level))
+                         for name in geometry.GEOMETRY_FILES for level in geometry.LEVELS),
+        })
+    return entries
+
+
+def caches():
+    figure = figure_cache.stats()
+    shared = shared_cache.stats()
+    return [
+        {"name": "figure cache", "entries": figure["entries"], "bytes": figure["bytes"],
+         "limit": figure_cache.max_bytes},
+        # On disk and shared by every worker, so not part of the process total.
+        {"name": "shared cache (disk)", "entries": shared["entries"], "bytes": shared["bytes"],
+         "limit": shared_cache.max_bytes, "disk": True},
+    ]
+
+
+def models():
+    # forecasting is imported lazily in some entry points; an unimported
+    # module holds no models.
+    forecasting = sys.modules.get("forecasting")
+    if forecasting is None:
+        return []
+    with forecasting._fitted_lock:
+        fits = list(forecasting.fitted_forecasts.items())
+    return [
+        {"name": f"forecast {state} {'+'.join(regressors) or 'no regressors'} {days}d {target}",
+         "bytes": deep_size(fit)}
+        for (state, regressors, days, target), fit in fits
+    ]
+
+
+def report(columns=True):
+    sections = {"datasets": datasets(columns), "caches": caches(), "models": models()}
+    totals = {
+        name: sum(entry["bytes"] for entry in entries if not entry.get("disk"))
+        for name, entries in sections.items()
+    }
+    return {
+        "time": time.time(),
+        "pid": os.getpid(),
+        "dataset_version": data_store.dataset_version(),
+        "query_backend": data_store.backend(),
+        "process": process_memory(),
+        "totals": totals,
+        **sections,
+    }
+
+
+def record_snapshot(current=None):
+    current = current or report(columns=False)
+    if MEMORY_LOG in ("", "off"):
+        return current
+    snapshot = {key: current[key] for key in ("time", "pid", "dataset_version", "process", "totals")}
+    os.makedirs(os.path.dirname(os.path.abspath(MEMORY_LOG)), exist_ok=True)
+    if os.path.exists(MEMORY_LOG) and os.path.getsize(MEMORY_LOG) > MEMORY_LOG_BYTES:
+        os.replace(MEMORY_LOG, f"{MEMORY_LOG}.1")
+    with open(MEMORY_LOG, "a") as f:
+        f.write(json.dumps(snapshot) + "\n")
+    return current
+
+
+def history(limit=50):
+    if MEMORY_LOG in ("", "off") or not os.path.exists(MEMORY_LOG):
+        return []
+    with open(MEMORY_LOG) as f:
+        lines = f.readlines()[-limit:]
+    snapshots = []
+    for line in lines:
+        try:
+            snapshots.append(json.loads(line))
+        except ValueError:
+            continue
+    return snapshots
+
+
+def format_bytes(size):
+    if size is None:
+        return "unavailable"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_text(current):
+    process = current["process"]
+    lines = [
+        f"pid {current['pid']}, dataset {current['dataset_version']}",
+        "process: " + ", ".join(f"{key} {format_bytes(value)}" for key, value in process.items()),
+    ]
+    for section in ("datasets", "caches", "models"):
+        lines.append(f"\n{section} ({format_bytes(current['totals'][section])} in memory)")
+        for entry in current[section]:
+            detail = f"{entry['rows']} rows" if "rows" in entry else f"{entry['entries']} entries" if "entries" in entry else ""
+            limit = f" of {format_bytes(entry['limit'])}" if "limit" in entry else ""
+            lines.append(f"  {entry['name']:<40} {format_bytes(entry['bytes']):>10}{limit}  {detail}")
+            for column in entry.get("columns", []):
+                lines.append(f"      {column['name']:<36} {format_bytes(column['bytes']):>10}  {column['dtype']}")
+    return "\n".join(lines)
+
+
+def _html(current, snapshots):
+    def table(section):
+        rows = []
+        for entry in current[section]:
+            limit = format_bytes(entry["limit"]) if "limit" in entry else ""
+            count = entry.get("rows", entry.get("entries", ""))
+            rows.append(f"<tr><td>{escape(entry['name'])}</td><td>{format_bytes(entry['bytes'])}</td>"
+                        f"<td>{limit}</td><td>{count}</td></tr>")
+            rows += [
+                f"<tr><td>&nbsp;&nbsp;{escape(column['name'])}</td><td>{format_bytes(column['bytes'])}</td>"
+                f"<td></td><td>{escape(column['dtype'])}</td></tr>"
+                for column in entry.get("columns", [])
+            ]
+        return (f"<h3>{section.capitalize()}: {format_bytes(current['totals'][section])}</h3>"
+                f"<table><tr><th>Name</th><th>Size</th><th>Limit</th><th>Rows / entries</th></tr>{''.join(rows)}</table>")
+
+    process = "".join(
+        f"<tr><td>{key}</td><td>{format_bytes(value)}</td></tr>" for key, value in current["process"].items()
+    )
+    growth = "".join(
+        f"<tr><td>{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['time']))}</td>"
+        f"<td>{snapshot['pid']}</td><td>{format_bytes(snapshot['process'].get('rss', 0))}</td>"
+        f"<td>{format_bytes(snapshot['process'].get('pss', 0))}</td>"
+        + "".join(f"<td>{format_bytes(snapshot['totals'].get(section, 0))}</td>"
+                  for section in ("datasets", "caches", "models"))
+        + "</tr>"
+        for snapshot in reversed(snapshots)
+    )
+    return admin_page(
+        f"Memory of worker {current['pid']}",
+        f"<table>{process}</table>{table('datasets')}{table('caches')}{table('models')}"
+        "<h3>Growth</h3><table><tr><th>Time</th><th>Worker</th><th>RSS</th><th>PSS</th><th>Datasets</th>"
+        f"<th>Caches</th><th>Models</th></tr>{growth}</table>",
+    )
+
+
+def _snapshot_if_due():
+    global _last_snapshot
+    now = time.time()
+    with _snapshot_lock:
+        if now - _last_snapshot < SNAPSHOT_INTERVAL:
+            return
+        _last_snapshot = now
+    # Sizing the models walks every object they hold, so it stays off the request.
+    threading.Thread(target=record_snapshot, name="memory-snapshot", daemon=True).start()
+
+
+def install(app):
+    server = app.server
+
+    if SNAPSHOT_INTERVAL > 0 and MEMORY_LOG not in ("", "off"):
+        @server.after_request
+        def snapshot_memory(response):
+            _snapshot_if_due()
+            return response
+
+    @server.route("/admin/memory")
+    @admin_only
+    def memory_page():
+        current = record_snapshot(report())
+        if request.args.get("format") == "json":
+            return Response(json.dumps(current), mimetype="application/json")
+        return Response(_html(current, history()), mimetype="text/html")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the memory held by data, caches and models.")
+    parser.add_argument("--warm", action="store_true", help="Run the warm-up first, so caches and models are filled.")
+    parser.add_argument("--no-columns", action="store_true", help="Leave out the per-column breakdown.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--history", action="store_true", help="Print the recorded snapshots instead.")
+    args = parser.parse_args()
+
+    if args.history:
+        for snapshot in history(limit=1000):
+            print(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["time"])), snapshot["pid"],
+                "rss", format_bytes(snapshot["process"].get("rss", 0)),
+                *(f"{section} {format_bytes(size)}" for section, size in snapshot["totals"].items()),
+            )
+        return
+
+    # The same objects a serving worker loads before it forks.
+    data_store.preload()
+    climatology.get_climatology()
+    for name in geometry.GEOMETRY_FILES:
+        for level in geometry.LEVELS:
+            geometry.geometry_json(name, level)
+    if args.warm:
+        import warmup
+
+        warmup.warm()
+
+    current = record_snapshot(report(columns=not args.no_columns))
+    print(json.dumps(current, indent=2) if args.json else format_text(current))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from admin import admin_only
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+    )
+except ImportError:
+    Counter = Histogram = None
+
+
+CALLBACK_PATH = "_dash-update-component"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 5e6)
+
+_local = threading.local()
+
+
+class _Disabled:
+    # Stands in for every metric when prometheus_client is not installed.
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if Histogram is not None:
+    CALLBACK_SECONDS = Histogram(
+        "uv_callback_seconds", "Callback request latency, including serialization.",
+        ["callback"], buckets=LATENCY_BUCKETS,
+    )
+    PHASE_SECONDS = Histogram(
+        "uv_callback_phase_seconds", "Time spent per phase (filter, fit, predict, figure, serialize, compress).",
+        ["callback", "phase"], buckets=LATENCY_BUCKETS,
+    )
+    RESPONSE_BYTES = Histogram(
+        "uv_callback_response_bytes", "Uncompressed callback response size.",
+        ["callback"], buckets=SIZE_BUCKETS,
+    )
+    CACHE_REQUESTS = Counter(
+        "uv_cache_requests", "Cache lookups by cache and result (hit or miss).",
+        ["cache", "result"],
+    )
+else:
+    CALLBACK_SECONDS = PHASE_SECONDS = RESPONSE_BYTES = CACHE_REQUESTS = _Disabled()
+
+
+def current_callback():
+    return getattr(_local, "callback", None) or "none"
+
+
+def observe_phase(name, seconds):
+    PHASE_SECONDS.labels(current_callback(), name).observe(seconds)
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_phase(name, time.perf_counter() - start)
+
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def _callback_name(app):
+    body = request.get_json(silent=True) or {}
+    output = body.get("output")
+    entry = app.callback_map.get(output)
+    if entry is not None:
+        return getattr(entry["callback"], "__name__", output)
+    return output or "unknown"
+
+
+def install(app):
+    server = app.server
+
+    @server.before_request
+    def start_callback_timer():
+        _local.callback = None
+        if request.path.endswith(CALLBACK_PATH):
+            _local.callback = _callback_name(app)
+            g.metrics_start = time.perf_counter()
+
+    # Registered after response_encoding, so it runs before compression and
+    # sees the uncompressed size.
+    @server.after_request
+    def record_callback(response):
+        if _local.callback is not None and "metrics_start" in g:
+            CALLBACK_SECONDS.labels(_local.callback).observe(time.perf_counter() - g.metrics_start)
+            RESPONSE_BYTES.labels(_local.callback).observe(response.content_length or 0)
+        return response
+
+    @server.teardown_request
+    def clear_callback(exception=None):
+        _local.callback = None
+
+    @server.route("/metrics")
+    @admin_only
+    def metrics_endpoint():
+        if Histogram is None:
+            return Response("prometheus_client is not installed\n", status=501, mimetype="text/plain")
+        registry = REGISTRY
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            # Pre-forked workers each write their samples to files; aggregate them all.
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
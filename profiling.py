@@ -0,0 +1,386 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import parse_qs, urlparse
+
+from flask import Response, abort, g, request, send_file
+from markupsafe import escape
+
+import data_store
+import metrics
+from admin import admin_only, admin_page, query_suffix
+
+
+# Profiling is opt-in: with UV_PROFILE=on the ?profile= and X-Profile flags
+# below are honoured and slow callbacks are captured; otherwise nothing is
+# sampled and the flags are ignored.
+PROFILE_ENABLED = os.environ.get("UV_PROFILE", "off").lower() in ("1", "on", "true", "yes")
+# Captured profiles and their callback inputs; "off" disables profiling entirely.
+PROFILE_DIR = os.environ.get("UV_PROFILE_DIR", os.path.join(data_store.cache_dir, "profiles"))
+# Every callback is sampled, and the profile kept when it runs longer than
+# this many seconds; 0 keeps only explicitly requested profiles.
+SLOW_SECONDS = float(os.environ.get("UV_PROFILE_SLOW", 5))
+SAMPLE_INTERVAL = float(os.environ.get("UV_PROFILE_INTERVAL_MS", 5)) / 1000
+# Beyond this many captures the fastest are deleted.
+KEEP_PROFILES = int(os.environ.get("UV_PROFILE_KEEP", 200))
+
+CALLBACK_PATH = "_dash-update-component"
+PROFILE_HEADER = "X-Profile"
+SAMPLE_MODES = {"1", "true", "yes", "sample", "sampling"}
+DETERMINISTIC_MODES = {"deterministic", "cprofile", "trace"}
+
+_ROOTS = sorted(
+    {os.path.dirname(os.path.abspath(__file__))}
+    | {os.path.abspath(path) for path in sys.path if path and os.path.isdir(path)},
+    key=len,
+    reverse=True,
+)
+
+
+def _short_path(filename):
+    # site-packages/pandas/core/frame.py -> pandas/core/frame.py
+    for root in _ROOTS:
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return os.path.basename(filename)
+
+
+def package_of(path):
+    # pandas/core/frame.py -> pandas, <frozen importlib._bootstrap> -> importlib
+    if path.startswith("<frozen "):
+        return path[len("<frozen "):].split(".")[0]
+    if path.startswith("<") or path.startswith("~"):
+        return "builtins"
+    head = path.split(os.sep)[0]
+    return head[:-3] if head.endswith(".py") else head
+
+
+def _label_path(label):
+    # "fit (prophet/forecaster.py:1180)" -> "prophet/forecaster.py"
+    return label[label.rfind("(") + 1:label.rfind(":")]
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    # One background thread periodically records the Python stack of every
+    # thread that is being profiled; the cost is paid per sample, not per call.
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._thread is None or self._pid != os.getpid():
+                # Threads do not survive fork(), so each worker starts its own.
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._samples.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            if not self._samples:
+                self._wake.clear()
+                self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        samples[";".join(reversed(stack))] += 1
+
+
+sampler = StackSampler()
+# cProfile hooks the whole interpreter's profiler slot, so only one request
+# is traced deterministically at a time; others fall back to sampling.
+_deterministic = threading.Lock()
+
+
+def requested_mode():
+    # A header, a query flag on the request, or a query flag on the page the
+    # request came from (Dash posts callbacks from /forecasting?profile=1).
+    values = [request.headers.get(PROFILE_HEADER, ""), request.args.get("profile", "")]
+    referrer = request.headers.get("Referer")
+    if referrer:
+        values += parse_qs(urlparse(referrer).query).get("profile", [])
+    for value in values:
+        value = value.strip().lower()
+        if value in DETERMINISTIC_MODES:
+            return "deterministic"
+        if value in SAMPLE_MODES:
+            return "sample"
+    return None
+
+
+def _callback_inputs():
+    body = request.get_json(silent=True) or {}
+    return {
+        "output": body.get("output"),
+        "changed": body.get("changedPropIds", []),
+        "inputs": {
+            f"{item.get('id')}.{item.get('property')}": item.get("value")
+            for item in body.get("inputs", []) + body.get("state", [])
+            if isinstance(item, dict)
+        },
+    }
+
+
+def _begin():
+    mode = requested_mode()
+    requested = mode is not None
+    if not requested:
+        if SLOW_SECONDS <= 0:
+            return None
+        mode = "sample"
+    profiler = None
+    if mode == "deterministic":
+        if _deterministic.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            mode = "sample"
+    if mode == "sample":
+        sampler.start(threading.get_ident())
+    return {"mode": mode, "requested": requested, "profiler": profiler, "start": time.perf_counter()}
+
+
+def _end(state):
+    duration = time.perf_counter() - state["start"]
+    samples = None
+    if state["profiler"] is not None:
+        state["profiler"].disable()
+        _deterministic.release()
+    else:
+        samples = sampler.stop(threading.get_ident())
+    return duration, samples
+
+
+def save_profile(state, duration, samples, status):
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if samples is not None:
+        profile_file = f"{profile_id}.folded"
+        with open(os.path.join(PROFILE_DIR, profile_file), "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+    else:
+        profile_file = f"{profile_id}.prof"
+        state["profiler"].dump_stats(os.path.join(PROFILE_DIR, profile_file))
+    record = {
+        "id": profile_id,
+        "time": time.time(),
+        "pid": os.getpid(),
+        "callback": metrics.current_callback(),
+        "duration": duration,
+        "mode": state["mode"],
+        "trigger": "request" if state["requested"] else "slow",
+        "status": status,
+        "file": profile_file,
+        **_callback_inputs(),
+    }
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), "w") as f:
+        json.dump(record, f, default=str)
+    prune()
+    return record
+
+
+def captured(limit=None):
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    records = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name)) as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    records.sort(key=lambda record: record["duration"], reverse=True)
+    return records[:limit]
+
+
+def prune(keep=KEEP_PROFILES):
+    for record in captured()[keep:]:
+        for name in (f"{record['id']}.json", record["file"]):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name))
+            except OSError:
+                pass
+
+
+def load_record(profile_id):
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def time_by_package(record):
+    # Seconds per top-level package: prophet, pandas, plotly, orjson, the
+    # dashboard's own modules and so on.
+    path = os.path.join(PROFILE_DIR, record["file"])
+    totals = defaultdict(float)
+    if record["file"].endswith(".folded"):
+        samples = _read_folded(path)
+        count = sum(samples.values()) or 1
+        for stack, hits in samples.items():
+            totals[package_of(_label_path(stack.rsplit(";", 1)[-1]))] += record["duration"] * hits / count
+    else:
+        for (filename, _, _), (_, _, tottime, _, _) in pstats.Stats(path).stats.items():
+            totals[package_of(_short_path(filename))] += tottime
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def _read_folded(path):
+    samples = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            samples[stack] += int(count)
+    return samples
+
+
+def _flame_graph(samples, min_share=0.005):
+    # An icicle chart (root on top) as nested flex boxes, widths proportional
+    # to samples; frames under min_share of the total are dropped.
+    tree = {"children": {}, "count": 0}
+    for stack, count in samples.items():
+        node = tree
+        node["count"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"children": {}, "count": 0})
+            node["count"] += count
+    total = tree["count"] or 1
+
+    def render(children, parent_count):
+        parts = []
+        for label, node in sorted(children.items(), key=lambda item: -item[1]["count"]):
+            if node["count"] / total < min_share:
+                continue
+            width = 100 * node["count"] / parent_count
+            hue = sum(map(ord, package_of(_label_path(label)))) % 60
+            parts.append(
+                f'<div class="frame" style="width:{width:.3f}%">'
+                f'<div class="label" style="background:hsl({hue},80%,70%)" '
+                f'title="{escape(label)} {100 * node["count"] / total:.1f}%">{escape(label)}</div>'
+                f'<div class="row">{render(node["children"], node["count"])}</div></div>'
+            )
+        return "".join(parts)
+
+    return f'<div class="row">{render(tree["children"], total)}</div>'
+
+
+def _list_page():
+    rows = "".join(
+        f"<tr><td>{record['duration']:.2f} s</td><td>{escape(record['callback'])}</td>"
+        f"<td>{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record['time']))}</td>"
+        f"<td>{escape(record['mode'])} ({escape(record['trigger'])})</td><td>{record['status']}</td>"
+        f"<td><code>{escape(json.dumps(record['inputs'], default=str)[:200])}</code></td>"
+        f"<td><a href=\"profiles/{record['id']}{query_suffix()}\">view</a> "
+        f"<a href=\"profiles/{record['id']}/download{query_suffix()}\">download</a></td></tr>"
+        for record in captured(limit=100)
+    )
+    return admin_page(
+        "Slowest captured requests",
+        "<p>Add <code>?profile=1</code> (sampling) or <code>?profile=deterministic</code> to a page URL, "
+        f"or send an <code>{PROFILE_HEADER}</code> header, to profile its callbacks. "
+        f"Callbacks slower than {SLOW_SECONDS:g} s are captured automatically.</p>"
+        "<table><tr><th>Duration</th><th>Callback</th><th>Time</th><th>Mode</th><th>Status</th>"
+        f"<th>Inputs</th><th></th></tr>{rows}</table>",
+    )
+
+
+def _detail_page(record):
+    path = os.path.join(PROFILE_DIR, record["file"])
+    packages = "".join(
+        f"<tr><td>{escape(package)}</td><td>{seconds:.3f} s</td></tr>" for package, seconds in time_by_package(record)
+    )
+    if record["file"].endswith(".folded"):
+        profile = f"<h3>Flame graph</h3>{_flame_graph(_read_folded(path))}"
+    else:
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(40)
+        profile = f"<h3>Top functions by cumulative time</h3><pre>{escape(output.getvalue())}</pre>"
+    return admin_page(
+        f"{record['callback']}: {record['duration']:.2f} s",
+        f"<p><a href=\"../profiles{query_suffix()}\">All profiles</a> | "
+        f"<a href=\"{record['id']}/download{query_suffix()}\">Download</a> "
+        f"({escape(record['file'])})</p>"
+        f"<h3>Inputs</h3><pre>{escape(json.dumps(record['inputs'], indent=2, default=str))}</pre>"
+        f"<h3>Time by package</h3><table>{packages}</table>{profile}",
+    )
+
+
+def install(app):
+    if not PROFILE_ENABLED or PROFILE_DIR in ("", "off"):
+        return
+    server = app.server
+
+    @server.before_request
+    def start_profile():
+        if request.path.endswith(CALLBACK_PATH):
+            g.profile = _begin()
+
+    # Registered last, so it stops before the other after_request hooks and
+    # covers the callback and its serialization only.
+    @server.after_request
+    def finish_profile(response):
+        state = g.pop("profile", None)
+        if state is not None:
+            duration, samples = _end(state)
+            if state["requested"] or duration >= SLOW_SECONDS:
+                save_profile(state, duration, samples, response.status_code)
+        return response
+
+    @server.teardown_request
+    def abandon_profile(exception=None):
+        # Requests that failed before after_request still release the profiler.
+        state = g.pop("profile", None)
+        if state is not None:
+            _end(state)
+
+    @server.route("/admin/profiles")
+    @admin_only
+    def list_profiles():
+        return Response(_list_page(), mimetype="text/html")
+
+    @server.route("/admin/profiles/<profile_id>")
+    @admin_only
+    def show_profile(profile_id):
+        record = load_record(profile_id)
+        if record is None:
+            abort(404)
+        return Response(_detail_page(record), mimetype="text/html")
+
+    @server.route("/admin/profiles/<profile_id>/download")
+    @admin_only
+    def download_profile(profile_id):
+        record = load_record(profile_id)
+        if record is None:
+            abort(404)
+        return send_file(os.path.join(os.path.abspath(PROFILE_DIR), record["file"]), as_attachment=True)
@@ -0,0 +1,267 @@
+import os
+import shutil
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+
+# Rows per Parquet row group. Every group stores min/max statistics per column,
+# so a filter on a column the file is sorted by skips the groups it cannot match.
+ROW_GROUP_ROWS = int(os.environ.get("UV_ROW_GROUP_ROWS", 64 * 1024))
+# CSV rows converted at a time; conversion memory is bounded by this, not the file size.
+CSV_CHUNK_ROWS = int(os.environ.get("UV_CSV_CHUNK_ROWS", 1_000_000))
+# A partitioned dataset is a directory tree of column=value levels (Hive
+# style), plus a _common_metadata file holding the full schema and which
+# columns the levels are.
+COMMON_METADATA = "_common_metadata"
+PARTITION_KEY = b"partition_by"
+
+
+def available():
+    return pyarrow is not None
+
+
+# Filters map a column to a value, a list of values, or an inclusive
+# (low, high) range where either end may be None. scan() pushes them down to
+# Parquet; mask() applies the same conditions to a frame already in memory.
+
+def expression(filters):
+    result = None
+    for column, value in filters.items():
+        field = pc.field(column)
+        if isinstance(value, tuple):
+            low, high = value
+            parts = ([field >= low] if low is not None else []) + ([field <= high] if high is not None else [])
+        elif isinstance(value, list):
+            parts = [field.isin(value)]
+        else:
+            parts = [field == value]
+        for part in parts:
+            result = part if result is None else result & part
+    return result
+
+
+def mask(frame, filters):
+    result = np.ones(len(frame), dtype=bool)
+    for column, value in filters.items():
+        values = frame[column]
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                result &= (values >= low).to_numpy()
+            if high is not None:
+                result &= (values <= high).to_numpy()
+        elif isinstance(value, list):
+            result &= values.isin(value).to_numpy()
+        else:
+            result &= (values == value).to_numpy()
+    return result
+
+
+def plain(table):
+    # Dictionary columns (how pandas categoricals are stored) as their values;
+    # Arrow cannot sort them, and frames written in chunks may each carry
+    # different dictionaries.
+    return table.cast(pyarrow.schema([
+        field.with_type(field.type.value_type) if pyarrow.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]))
+
+
+@lru_cache(maxsize=32)
+def _dataset(path, mtime_ns):
+    if not os.path.isdir(path):
+        return ds.dataset(path, format="parquet")
+    schema = pq.read_schema(os.path.join(path, COMMON_METADATA))
+    keys = schema.metadata[PARTITION_KEY].decode().split(",")
+    partitioning = ds.partitioning(pyarrow.schema([schema.field(key) for key in keys]), flavor="hive")
+    return ds.dataset(path, schema=schema, format="parquet", partitioning=partitioning)
+
+
+def open_dataset(path):
+    # Opening lists the files (and reads the footer of a single file); keyed on
+    # mtime so a rewritten dataset is reopened.
+    return _dataset(path, os.stat(path).st_mtime_ns)
+
+
+def disk_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def files(path, filters=None):
+    return [fragment.path for fragment in open_dataset(path).get_fragments(
+        filter=expression(filters) if filters else None
+    )]
+
+
+def footprint(path, filters=None):
+    # Files and bytes a scan with these filters opens. Partition levels are
+    # pruned from the directory names alone; row groups within the files that
+    # remain are skipped later, from their statistics.
+    paths = files(path, filters)
+    return len(paths), sum(os.path.getsize(file) for file in paths)
+
+
+def scan(path, columns=None, filters=None, order=None, categories=("NAME",)):
+    # Only the requested columns are read, and only from row groups whose
+    # statistics can satisfy the filters.
+    dataset = open_dataset(path)
+    names = None if columns is None else list(dict.fromkeys(list(columns) + list(order or [])))
+    table = dataset.to_table(columns=names, filter=expression(filters) if filters else None)
+    if order:
+        keys = plain(table.select(list(order)))
+        table = table.take(pc.sort_indices(keys, [(column, "ascending") for column in order]))
+    if columns is not None:
+        table = table.select(list(columns))
+    return table.to_pandas(categories=[column for column in categories if column in table.column_names])
+
+
+def count_rows(path, filters=None):
+    return open_dataset(path).count_rows(filter=expression(filters) if filters else None)
+
+
+def distinct(path, column):
+    dataset = open_dataset(path)
+    partitioning = dataset.partitioning if os.path.isdir(path) else None
+    if partitioning is not None and column in partitioning.schema.names:
+        # A partition column's values are in the directory names.
+        values = {ds.get_partition_keys(fragment.partition_expression).get(column)
+                  for fragment in dataset.get_fragments()}
+    else:
+        values = set()
+        for batch in dataset.to_batches(columns=[column]):
+            values.update(pc.unique(batch.column(0)).to_pylist())
+    values.discard(None)
+    return sorted(values)
+
+
+def bounds(path, column):
+    low = high = None
+    for batch in open_dataset(path).to_batches(columns=[column]):
+        if batch.num_rows == 0:
+            continue
+        result = pc.min_max(batch.column(0))
+        batch_low, batch_high = result["min"].as_py(), result["max"].as_py()
+        if batch_low is None:
+            continue
+        low = batch_low if low is None else min(low, batch_low)
+        high = batch_high if high is None else max(high, batch_high)
+    return low, high
+
+
+def _write_partitions(table, path, partition_by, prefix):
+    ds.write_dataset(
+        table, path, format="parquet",
+        partitioning=ds.partitioning(pyarrow.schema([table.schema.field(key) for key in partition_by]), flavor="hive"),
+        basename_template=f"{prefix}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=ROW_GROUP_ROWS, max_partitions=1 << 20,
+    )
+
+
+def append(path, frame, prefix):
+    # Adds a frame's rows to an existing partitioned directory as new files
+    # named prefix-*; the files already there are left alone.
+    schema = pq.read_schema(os.path.join(path, COMMON_METADATA))
+    partition_by = schema.metadata[PARTITION_KEY].decode().split(",")
+    table = plain(pyarrow.Table.from_pandas(frame, preserve_index=False))
+    _write_partitions(table.select(schema.names).cast(schema.remove_metadata()), path, partition_by, prefix)
+    return len(frame)
+
+
+def link_tree(source, destination):
+    # A copy of a dataset that shares its files through hard links; replacing a
+    # file in the copy leaves the source untouched.
+    def link(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    shutil.copytree(source, destination, copy_function=link)
+
+
+class FrameWriter:
+    # Appends frames with the same columns to one Parquet file, or with
+    # partition_by to a partitioned directory, written under a temporary name
+    # and moved into place only once every frame is written.
+
+    def __init__(self, path, partition_by=None):
+        self.path = path
+        self.partition_by = list(partition_by or [])
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.schema = None
+        self.writer = None
+        self.parts = 0
+        self.rows = 0
+
+    def write(self, frame):
+        table = plain(pyarrow.Table.from_pandas(frame, preserve_index=False))
+        if self.schema is None:
+            self.schema = table.schema.remove_metadata()
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if not self.partition_by:
+                self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        table = table.cast(self.schema)
+
+        if self.partition_by:
+            # Each call adds a file per partition it touches, so a partition
+            # split across frames has several files.
+            _write_partitions(table, self.tmp_path, self.partition_by, f"part-{self.parts}")
+        else:
+            self.writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+        self.parts += 1
+        self.rows += len(frame)
+
+    def _discard(self):
+        if os.path.isdir(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.writer is not None:
+            self.writer.close()
+        if exc_type is not None or self.schema is None:
+            self._discard()
+            if exc_type is None:
+                raise ValueError(f"No rows to write to {self.path}")
+            return False
+
+        if not self.partition_by:
+            os.replace(self.tmp_path, self.path)
+            return False
+        pq.write_metadata(
+            self.schema.with_metadata({PARTITION_KEY: ",".join(self.partition_by).encode()}),
+            os.path.join(self.tmp_path, COMMON_METADATA),
+        )
+        try:
+            os.rename(self.tmp_path, self.path)
+        except OSError:
+            # Another process finished the same dataset first; a directory
+            # cannot be replaced atomically, so keep theirs.
+            if not os.path.isdir(self.path):
+                raise
+            self._discard()
+        return False
+
+
+def convert_csv(csv_path, path, prepare, partition_by=None, chunk_rows=CSV_CHUNK_ROWS):
+    # Streams the CSV into Parquet a chunk at a time.
+    with FrameWriter(path, partition_by) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            writer.write(prepare(chunk))
+    return writer.rows
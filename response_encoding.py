@@ -0,0 +1,132 @@
+import datetime
+import gzip
+import logging
+import os
+import time
+
+import dash._callback
+import numpy as np
+import pandas as pd
+from flask import g, has_request_context, request
+from plotly.io.json import to_json_plotly
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent as they are; compressing them costs more than it saves.
+COMPRESS_MIN_BYTES = int(os.environ.get("UV_COMPRESS_MIN_BYTES", 1400))
+GZIP_LEVEL = int(os.environ.get("UV_GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.environ.get("UV_BROTLI_QUALITY", 4))
+CALLBACK_PATH = "_dash-update-component"
+
+# Same escaping plotly applies, so the output can be embedded in HTML safely.
+_UNSAFE = (
+    (b"<", b"\\u003c"),
+    (b">", b"\\u003e"),
+    (b"/", b"\\u002f"),
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+def _default(value):
+    # Called by orjson for anything it cannot encode natively.
+    if hasattr(value, "to_plotly_json"):
+        return value.to_plotly_json()
+    if isinstance(value, (pd.Series, pd.Index)):
+        value = value.to_numpy()
+    if isinstance(value, np.ndarray):
+        # Plotly stores date axes as object arrays of Timestamps; as datetime64
+        # they are encoded natively instead of element by element.
+        if value.dtype.kind == "O" and len(value) and isinstance(value.flat[0], (datetime.date, np.datetime64)):
+            try:
+                return pd.DatetimeIndex(value.ravel()).tz_localize(None).to_numpy().reshape(value.shape)
+            except (TypeError, ValueError):
+                pass
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def to_json(value):
+    start = time.perf_counter()
+    try:
+        if orjson is None:
+            raise TypeError
+        encoded = orjson.dumps(
+            value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+        for unsafe, safe in _UNSAFE:
+            if unsafe in encoded:
+                encoded = encoded.replace(unsafe, safe)
+        encoded = encoded.decode()
+    except TypeError:
+        encoded = to_json_plotly(value)
+    elapsed = time.perf_counter() - start
+    metrics.observe_phase("serialize", elapsed)
+    if has_request_context():
+        g.encode_seconds = g.get("encode_seconds", 0.0) + elapsed
+    return encoded
+
+
+def _compress(data, accept_encoding):
+    if brotli is not None and "br" in accept_encoding:
+        return "br", brotli.compress(data, quality=BROTLI_QUALITY)
+    if "gzip" in accept_encoding:
+        return "gzip", gzip.compress(data, compresslevel=GZIP_LEVEL)
+    return None, data
+
+
+def install(app):
+    # Dash encodes callback outputs with a module-level to_json; swap in the fast path.
+    dash._callback.to_json = to_json
+    server = app.server
+
+    @server.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @server.after_request
+    def encode_response(response):
+        if not request.path.endswith(CALLBACK_PATH) or response.direct_passthrough:
+            return response
+
+        size = response.content_length or 0
+        compress_seconds = 0.0
+        if size >= COMPRESS_MIN_BYTES and "Content-Encoding" not in response.headers:
+            start = time.perf_counter()
+            encoding, data = _compress(response.get_data(), request.headers.get("Accept-Encoding", ""))
+            compress_seconds = time.perf_counter() - start
+            metrics.observe_phase("compress", compress_seconds)
+            if encoding:
+                response.set_data(data)
+                response.headers["Content-Encoding"] = encoding
+                response.vary.add("Accept-Encoding")
+
+        total = time.perf_counter() - g.get("request_start", time.perf_counter())
+        encode = g.get("encode_seconds", 0.0)
+        response.headers.add(
+            "Server-Timing",
+            f"encode;dur={encode * 1000:.1f}, compress;dur={compress_seconds * 1000:.1f}, total;dur={total * 1000:.1f}",
+        )
+        logger.info(
+            "%s %s: %d -> %d bytes, encode %.1f ms, compress %.1f ms, total %.1f ms",
+            request.method, request.path, size, response.content_length or 0,
+            encode * 1000, compress_seconds * 1000, total * 1000,
+        )
+        return response
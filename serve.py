@@ -0,0 +1,112 @@
+import argparse
+import gc
+import logging
+import os
+import shutil
+
+import climatology
+import data_store
+import geometry
+import warmup
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("UV_WORKERS", os.cpu_count() or 1))
+DEFAULT_THREADS = int(os.environ.get("UV_THREADS", 4))
+METRICS_DIR = os.path.join(data_store.cache_dir, "metrics")
+
+
+def prepare_metrics_dir():
+    # Each worker keeps its own Prometheus samples; /metrics sums the files in
+    # this directory. It has to be set before the metrics are created, and
+    # files left by a previous run would be counted again.
+    path = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", METRICS_DIR)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def preload():
+    # Everything loaded here is shared copy-on-write by the forked workers.
+    import app
+
+    data_store.preload()
+    climatology.get_climatology()
+    for name in geometry.GEOMETRY_FILES:
+        for level in geometry.LEVELS:
+            geometry.geometry_json(name, level)
+    if warmup.WARMUP_MODE == "blocking":
+        warmup.warm()
+
+    # Move everything allocated so far out of the collector's reach; otherwise
+    # the first collection in each worker writes to every shared object.
+    gc.collect()
+    gc.freeze()
+    return app.server
+
+
+def _warm_first_worker(worker):
+    # Threads do not survive fork(), so background warm-up runs in the first
+    # worker; the others pick the results up from the shared cache.
+    if warmup.WARMUP_MODE == "background" and worker.age == 1:
+        warmup.start()
+
+
+def _worker_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def serve_forked(server, host, port, workers, threads, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", timeout)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("post_worker_init", _warm_first_worker)
+            self.cfg.set("child_exit", _worker_exit)
+
+        def load(self):
+            return server
+
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the UV Index Dashboard with pre-forked workers.")
+    parser.add_argument("--host", default=os.environ.get("UV_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("UV_PORT", 8050)))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--timeout", type=int, default=120, help="Seconds before a stuck worker is restarted.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        # gunicorn needs fork(); on Windows fall back to one threaded process.
+        from werkzeug.serving import run_simple
+
+        server = preload()
+
+        logger.warning("gunicorn is not installed (it does not run on Windows); serving from a single "
+                       "threaded process without pre-forked workers")
+        if warmup.WARMUP_MODE == "background":
+            warmup.start()
+        run_simple(args.host, args.port, server, threaded=True)
+    else:
+        prepare_metrics_dir()
+        server = preload()
+        serve_forked(server, args.host, args.port, args.workers, args.threads, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+import data_store
+import metrics
+
+
+# SQLite file shared by every worker and kept across restarts; "off" disables the tier.
+CACHE_PATH = os.environ.get("UV_SHARED_CACHE", os.path.join(data_store.cache_dir, "shared.sqlite"))
+MAX_BYTES = int(float(os.environ.get("UV_SHARED_CACHE_MB", 512)) * 1024 * 1024)
+DEFAULT_TTL = float(os.environ.get("UV_SHARED_CACHE_TTL", 7 * 24 * 3600))
+# A sweep scans the whole table, so it runs every this many puts or seconds,
+# or sooner once this process's writes may have taken the store over its limit.
+SWEEP_PUTS = 100
+SWEEP_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    version TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+"""
+
+
+class SharedCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = None if path in ("", "off") else path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        # Callbacks run on several threads, and += on an attribute is not atomic.
+        self._stats_lock = threading.Lock()
+        self.hits = self.misses = 0
+        # The store's size at the last sweep plus what this process has
+        # written since; other workers' writes show up at the next sweep.
+        self._sweep_lock = threading.Lock()
+        self._swept_bytes = None
+        self._written = self._puts = 0
+        self._swept_at = 0.0
+
+    def _connection(self):
+        # One connection per thread, and never one inherited across fork().
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, namespace, key, version=None):
+        # version defaults to the current dataset's; see data_store.scope_version.
+        if not self.path:
+            return None
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value FROM entries WHERE key = ? AND version = ? AND expires > ?",
+            (f"{namespace}:{key}", version or data_store.dataset_version(), now),
+        ).fetchone()
+        metrics.count_cache(f"shared_{namespace}", row is not None)
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, f"{namespace}:{key}"))
+        return row[0]
+
+    def put(self, namespace, key, value, ttl=None, version=None):
+        if not self.path or len(value) > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (f"{namespace}:{key}", namespace, version or data_store.dataset_version(), value, len(value),
+             now + (self.default_ttl if ttl is None else ttl), now),
+        )
+        with self._sweep_lock:
+            self._written += len(value)
+            self._puts += 1
+            due = (
+                self._swept_bytes is None
+                or self._swept_bytes + self._written > self.max_bytes
+                or self._puts >= SWEEP_PUTS
+                or now - self._swept_at >= SWEEP_SECONDS
+            )
+        if due:
+            self.evict()
+
+    def evict(self):
+        # Expired entries and entries of versions outside the current lineage
+        # (a replaced source file) go first, then the least recently used until
+        # the store is back under its limit.
+        connection = self._connection()
+        versions = json.dumps([entry["version"] for entry in data_store.lineage()])
+        connection.execute(
+            "DELETE FROM entries WHERE expires <= ? OR version NOT IN (SELECT value FROM json_each(?))",
+            (time.time(), versions),
+        )
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            target = total - int(self.max_bytes * 0.9)
+            freed = 0
+            stale = []
+            for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                stale.append((key,))
+                freed += size
+                if freed >= target:
+                    break
+            connection.executemany("DELETE FROM entries WHERE key = ?", stale)
+            total -= freed
+        with self._sweep_lock:
+            self._swept_bytes, self._written, self._puts, self._swept_at = total, 0, 0, time.time()
+
+    def clear(self, namespace=None):
+        if not self.path:
+            return
+        if namespace is None:
+            self._connection().execute("DELETE FROM entries")
+        else:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def stats(self):
+        with self._stats_lock:
+            result = {"hits": self.hits, "misses": self.misses, "entries": 0, "bytes": 0}
+        if self.path:
+            result["entries"], result["bytes"] = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return result
+
+
+shared_cache = SharedCache()
+
+
+def make_key(name, args):
+    normalized = json.dumps(args, sort_keys=True, default=str)
+    return hashlib.sha1(f"{name}|{normalized}".encode()).hexdigest()
+
+
+def memoize(namespace, ttl=None, scope=None):
+    # Pickles the result of a pure function of its arguments and the dataset
+    # into the shared store, so every worker and restart reuses it. scope is as
+    # for figure_cache.memoize.
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = make_key(func.__qualname__, args)
+            version = data_store.scope_version(**scope(*args)) if scope else None
+            payload = shared_cache.get(namespace, key, version)
+            if payload is not None:
+                return pickle.loads(payload)
+            result = func(*args)
+            shared_cache.put(
+                namespace, key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), ttl, version
+            )
+            return result
+        return wrapper
+    return decorator
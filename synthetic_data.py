@@ -0,0 +1,180 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import geometry
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+STATE_GEOMETRY = "us-states"
+# Rows generated and written at a time; memory use is bounded by this, not the output size.
+CHUNK_ROWS = 1_000_000
+# Grid cells cover the contiguous states.
+GRID_BOUNDS = {"lat": (24.5, 49.5), "lon": (-125.0, -66.5)}
+
+
+def _bounds(coordinates):
+    points = np.array([point for ring in _rings(coordinates) for point in ring])
+    return points[:, 1].min(), points[:, 1].max(), points[:, 0].min(), points[:, 0].max()
+
+
+def _rings(coordinates):
+    # Polygons are lists of rings, multipolygons lists of polygons.
+    if isinstance(coordinates[0][0], (int, float)):
+        yield coordinates
+    else:
+        for part in coordinates:
+            yield from _rings(part)
+
+
+def state_regions(per_state=1, seed=0):
+    # One region per state at its bounding-box centre, or per_state regions
+    # ("Ohio 003") spread across the state's latitude band, like counties.
+    rng = np.random.default_rng(seed)
+    names, latitudes = [], []
+    for feature in geometry.load_geometry(STATE_GEOMETRY)["features"]:
+        lat_min, lat_max, _, _ = _bounds(feature["geometry"]["coordinates"])
+        name = feature["properties"]["name"]
+        if per_state == 1:
+            names.append(name)
+            latitudes.append((lat_min + lat_max) / 2)
+        else:
+            names += [f"{name} {index:03d}" for index in range(1, per_state + 1)]
+            latitudes += list(rng.uniform(lat_min, lat_max, per_state))
+    return names, np.array(latitudes)
+
+
+def grid_regions(step):
+    lats = np.arange(GRID_BOUNDS["lat"][0], GRID_BOUNDS["lat"][1], step) + step / 2
+    lons = np.arange(GRID_BOUNDS["lon"][0], GRID_BOUNDS["lon"][1], step) + step / 2
+    lat, lon = (grid.ravel() for grid in np.meshgrid(lats, lons, indexing="ij"))
+    return [f"cell {a:.2f}N {-o:.2f}W" for a, o in zip(lat, lon)], lat
+
+
+def timestamps(start, end, hourly=False):
+    return pd.date_range(start, end + (pd.Timedelta(hours=23) if hourly else pd.Timedelta(0)),
+                         freq="h" if hourly else "D")
+
+
+def simulate(latitudes, times, rng, hourly=False):
+    # Arrays of shape (regions, times). Noon solar zenith angle from latitude
+    # and declination (the hour angle for hourly rows), ozone with a spring
+    # peak growing with latitude, clear-sky UVI from the empirical
+    # 12.5 * cos(SZA)^2.42 * (ozone / 300)^-1.23, and clouds and aerosols as
+    # day-to-day transmission losses.
+    lat = np.radians(latitudes)[:, None]
+    day = times.dayofyear.to_numpy()[None, :]
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day) / 365)
+    hour_angle = np.radians(15.0 * (times.hour.to_numpy()[None, :] - 12)) if hourly else 0.0
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+
+    shape = (len(latitudes), len(times))
+    spring = np.cos(2 * np.pi * (day - 90) / 365)
+    ozone = (290 + 0.6 * np.abs(latitudes)[:, None] + 0.5 * np.abs(latitudes)[:, None] * spring
+             + rng.normal(0, 12, shape))
+    clear = 12.5 * np.clip(cos_zenith, 0, None) ** 2.42 * (ozone / 300) ** -1.23
+
+    cloudiness = rng.beta(1.2, 2.0, shape)
+    cloud_transmission = np.clip(100 * (1 - 0.75 * cloudiness), 0, 100)
+    aerosol_transmission = np.clip(rng.normal(90, 4, shape), 50, 100)
+    cloudy = clear * cloud_transmission / 100
+
+    return {
+        "Clear Sky UVI": clear.round(3),
+        "Cloudy Sky UVI": cloudy.round(3),
+        "Cloud Transmission": cloud_transmission.round(2),
+        "Aerosol Transmission": aerosol_transmission.round(2),
+        "Total Column Ozone": ozone.round(1),
+        "Solar Zenith Angle": zenith.round(2),
+    }
+
+
+def chunks(names, latitudes, times, hourly=False, chunk_rows=CHUNK_ROWS, seed=0):
+    # Frames of whole regions, ordered by region then time like the source
+    # data. Each region draws from its own seeded generator, so the output
+    # does not depend on the chunk size.
+    per_chunk = max(1, chunk_rows // len(times))
+    dates = times.strftime("%Y%m%d").astype(int).to_numpy()
+    years = times.year.to_numpy()
+    for start in range(0, len(names), per_chunk):
+        stop = min(start + per_chunk, len(names))
+        columns = {measure: [] for measure in data_store.MEASURES}
+        for index in range(start, stop):
+            rng = np.random.default_rng([seed, index])
+            for measure, values in simulate(latitudes[index:index + 1], times, rng, hourly).items():
+                columns[measure].append(values.ravel())
+        count = stop - start
+        frame = pd.DataFrame({
+            "Date": np.tile(dates, count),
+            "NAME": np.repeat(names[start:stop], len(times)),
+            "Year": np.tile(years, count),
+            **{measure: np.concatenate(values) for measure, values in columns.items()},
+        })
+        if hourly:
+            frame.insert(1, "Hour", np.tile(times.hour.to_numpy(), count))
+        yield frame
+
+
+def generate(path, start, end, per_state=1, grid=None, hourly=False, chunk_rows=CHUNK_ROWS, seed=0):
+    names, latitudes = grid_regions(grid) if grid else state_regions(per_state, seed)
+    times = timestamps(pd.Timestamp(start), pd.Timestamp(end), hourly)
+    parquet = path.endswith(".parquet")
+    if parquet and pyarrow is None:
+        raise RuntimeError("Writing Parquet needs pyarrow; write a .csv instead")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    rows = 0
+    writer = None
+    try:
+        for frame in chunks(names, latitudes, times, hourly, chunk_rows, seed):
+            if parquet:
+                table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+            else:
+                frame.to_csv(tmp_path, mode="a" if rows else "w", header=not rows, index=False)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return rows, len(names), len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate UV data with the todaysdata.csv schema at any scale.")
+    parser.add_argument("output", help="A .csv or .parquet file.")
+    parser.add_argument("--start", default="2021-01-01")
+    parser.add_argument("--end", help="Last day (default: --years after --start).")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--regions-per-state", type=int, default=1,
+                        help="Regions per state, named like 'Ohio 003'; 1 keeps the state names the map expects.")
+    parser.add_argument("--grid", type=float, help="Use grid cells of this many degrees instead of states.")
+    parser.add_argument("--hourly", action="store_true", help="One row per hour, with an extra Hour column.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    end = args.end or pd.Timestamp(args.start) + pd.DateOffset(years=args.years) - pd.Timedelta(days=1)
+    start_time = time.perf_counter()
+    rows, regions, steps = generate(
+        args.output, args.start, end, args.regions_per_state, args.grid, args.hourly, args.chunk_rows, args.seed
+    )
+    print(f"Wrote {rows} rows ({regions} regions x {steps} {'hours' if args.hourly else 'days'}) "
+          f"to {args.output} in {time.perf_counter() - start_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
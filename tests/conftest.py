@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+# The modules read their settings from the environment when imported, so the
+# source file and caches point into a scratch directory before any of them is.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix="uv-tests-")
+os.environ["UV_DATA_PATH"] = os.path.join(SCRATCH, "source.csv")
+os.environ["UV_CACHE_DIR"] = os.path.join(SCRATCH, "cache")
+os.environ["UV_SHARED_CACHE"] = "off"
+sys.path.insert(0, ROOT)
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import climatology
+import data_store
+import query_engine
+import synthetic_data
+
+
+def observations(names, start, end, seed=0):
+    times = synthetic_data.timestamps(pd.Timestamp(start), pd.Timestamp(end))
+    latitudes = np.linspace(30, 45, len(names))
+    return pd.concat(synthetic_data.chunks(names, latitudes, times, seed=seed), ignore_index=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A fresh source file and cache, and no state left from an earlier test.
+    shutil.rmtree(data_store.cache_dir, ignore_errors=True)
+    observations(["Ohio", "Texas", "Utah"], "2024-11-01", "2024-12-31").to_csv(data_store.uv_data_path, index=False)
+    data_store.release()
+    data_store._lineage = data_store._lineage_mtime = data_store._manifest = data_store._backend = None
+    climatology._climatology = None
+    query_engine._dataset.cache_clear()
+    return tmp_path
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climatology import (
+    CLIMATOLOGY_MEASURES, DAYS_IN_YEAR, PERCENTILES, WINDOW_DAYS, climatology_frame, leap_day_of_year,
+)
+
+
+def observations(seed=0):
+    # Three years including a leap year, with days missing at random.
+    rng = np.random.default_rng(seed)
+    frames = []
+    for name in ["Ohio", "Utah"]:
+        dates = pd.date_range("2022-01-01", "2024-12-31", freq="D")
+        dates = dates[rng.random(len(dates)) > 0.2]
+        frame = pd.DataFrame({"NAME": name, "Date": dates, "Year": dates.year})
+        for measure in CLIMATOLOGY_MEASURES:
+            frame[measure] = rng.gamma(2.0, 3.0, len(dates))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def pooled(data, state, day):
+    # Every value within WINDOW_DAYS calendar days of day, wrapping at year end.
+    rows = data[data["NAME"] == state]
+    distance = (leap_day_of_year(rows["Date"]) - day) % DAYS_IN_YEAR
+    near = (distance <= WINDOW_DAYS) | (distance >= DAYS_IN_YEAR - WINDOW_DAYS)
+    return rows[near]
+
+
+def test_leap_day_of_year_aligns_calendar_days():
+    dates = pd.to_datetime(["2023-02-28", "2024-02-29", "2023-03-01", "2024-03-01", "2023-12-31", "2024-12-31"])
+    assert leap_day_of_year(dates).tolist() == [59, 60, 61, 61, 366, 366]
+
+
+def test_normals_and_percentiles_pool_the_window():
+    data = observations()
+    climatology = climatology_frame(data)
+    assert len(climatology) == 2 * DAYS_IN_YEAR
+    assert climatology["DayOfYear"].tolist() == list(range(1, DAYS_IN_YEAR + 1)) * 2
+
+    # Near both ends of the year, across the leap day, and mid-year.
+    for state, day in [("Ohio", 1), ("Ohio", 3), ("Ohio", 60), ("Utah", 61), ("Utah", 200), ("Utah", 366)]:
+        row = climatology[(climatology["NAME"] == state) & (climatology["DayOfYear"] == day)].iloc[0]
+        window = pooled(data, state, day)
+        for measure in CLIMATOLOGY_MEASURES:
+            values = window[measure].to_numpy()
+            assert row[f"{measure} normal"] == pytest.approx(values.mean())
+            for name, percentile in PERCENTILES.items():
+                assert row[f"{measure} {name}"] == pytest.approx(np.percentile(values, percentile))
+
+
+def test_missing_values_are_left_out_of_the_pool():
+    data = observations(seed=1)
+    data.loc[data["Date"].dt.month == 6, "Clear Sky UVI"] = np.nan
+    climatology = climatology_frame(data).set_index(["NAME", "DayOfYear"])
+    # 24 June: the window reaches into July, so only those days count.
+    day = leap_day_of_year(pd.to_datetime(["2023-06-24"]))[0]
+    window = pooled(data, "Ohio", day)
+    assert climatology.loc[("Ohio", day), "Clear Sky UVI normal"] == pytest.approx(window["Clear Sky UVI"].mean())
+    # 10 June: nothing left within a week either side.
+    day = leap_day_of_year(pd.to_datetime(["2023-06-10"]))[0]
+    assert np.isnan(climatology.loc[("Ohio", day), "Clear Sky UVI normal"])
+
+
+def test_each_state_has_its_own_normals():
+    data = observations(seed=2)
+    data.loc[data["NAME"] == "Utah", CLIMATOLOGY_MEASURES] += 100
+    climatology = climatology_frame(data)
+    ohio = climatology[climatology["NAME"] == "Ohio"]
+    alone = climatology_frame(data[data["NAME"] == "Ohio"])
+    pd.testing.assert_frame_equal(ohio.reset_index(drop=True), alone)
@@ -0,0 +1,102 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_quality
+from factor_registry import evaluate_factors
+
+
+def rows(columns=(), count=4):
+    frame = pd.DataFrame({
+        "Date": [20240101 + day for day in range(count)],
+        "NAME": ["Ohio"] * count,
+        "Year": [2024] * count,
+        "Clear Sky UVI": [5.0] * count,
+        "Cloudy Sky UVI": [4.0] * count,
+        "Cloud Transmission": [80.0] * count,
+        "Aerosol Transmission": [90.0] * count,
+        "Total Column Ozone": [300.0] * count,
+        "Solar Zenith Angle": [40.0] * count,
+    })
+    for column, values in dict(columns).items():
+        frame[column] = values
+    return frame
+
+
+def test_clean_rows_pass_unchanged():
+    frame = rows()
+    clean, report = data_quality.clean(frame)
+    assert report["kept"] == report["rows"] == 4
+    assert clean["Date"].tolist() == list(pd.date_range("2024-01-01", periods=4))
+    pd.testing.assert_frame_equal(
+        clean[list(data_quality.RANGES)].reset_index(drop=True), frame[list(data_quality.RANGES)]
+    )
+
+
+def test_values_just_outside_a_range_are_clipped_and_further_out_dropped():
+    clean, report = data_quality.clean(rows({"Cloud Transmission": [100.4, 250.0, -0.5, 80.0]}))
+    assert clean["Cloud Transmission"].tolist() == [100.0, 0.0, 80.0]
+    assert report["dropped"]["out of range"] == 1
+    assert report["columns"]["Cloud Transmission"] == {
+        "missing": 0, "out of range": 1, "repaired": 2, "flagged": 0, "min": 0.0, "max": 100.0,
+    }
+
+
+def test_missing_and_non_numeric_measures_drop_the_row():
+    clean, report = data_quality.clean(rows({"Total Column Ozone": ["300", "x", None, 310.0]}))
+    assert len(clean) == 2
+    assert report["dropped"]["missing value"] == 2
+    assert report["columns"]["Total Column Ozone"]["missing"] == 2
+
+
+def test_cloudy_sky_above_clear_sky_is_clipped():
+    clean, report = data_quality.clean(rows({"Cloudy Sky UVI": [4.0, 6.0, 5.0, 4.0]}))
+    assert clean["Cloudy Sky UVI"].tolist() == [4.0, 5.0, 5.0, 4.0]
+    assert report["columns"]["Cloudy Sky UVI"]["repaired"] == 1
+
+
+def test_year_is_repaired_from_the_date():
+    clean, report = data_quality.clean(rows({"Year": [2024, 1999, 2024, 2023]}))
+    assert clean["Year"].tolist() == [2024] * 4
+    assert clean["Year"].dtype == np.int64
+    assert report["year repaired"] == 2
+
+
+def test_zero_clear_sky_uvi_is_flagged_and_kept():
+    clean, report = data_quality.clean(rows({"Clear Sky UVI": [0.0, 5.0, 5.0, 5.0],
+                                               "Cloudy Sky UVI": [0.0, 4.0, 4.0, 4.0]}))
+    assert len(clean) == 4
+    assert report["columns"]["Clear Sky UVI"]["flagged"] == 1
+    attenuation = evaluate_factors(clean, ["uv_attenuation"])["UV Attenuation"]
+    assert np.isfinite(attenuation).all()
+    assert attenuation.tolist() == pytest.approx([0.0, 0.2, 0.2, 0.2])
+
+
+def test_bad_dates_and_names_are_dropped():
+    clean, report = data_quality.clean(rows({"Date": ["20240101", "2024-13-45", "20240230", "20240104"],
+                                             "NAME": ["Ohio", "Ohio", "Ohio", " "]}))
+    assert clean["Date"].tolist() == [pd.Timestamp("2024-01-01")]
+    assert report["dropped"]["bad date"] == 2
+    assert report["dropped"]["no name"] == 1
+
+
+def test_a_blank_date_drops_only_its_row():
+    # One blank cell makes pandas read the whole Date column as float.
+    csv = rows(count=3).to_csv(index=False).replace("20240102", "")
+    frame = pd.read_csv(io.StringIO(csv))
+    assert frame["Date"].dtype == np.float64
+    clean, report = data_quality.clean(frame)
+    assert clean["Date"].tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-03")]
+    assert report["dropped"]["bad date"] == 1
+
+
+def test_merge_adds_counts_and_widens_bounds():
+    first = data_quality.clean(rows({"Clear Sky UVI": [1.0, 5.0], "Cloudy Sky UVI": [1.0, 4.0]}, count=2))[1]
+    second = data_quality.clean(rows({"Clear Sky UVI": [0.0, 8.0], "Cloudy Sky UVI": [0.0, 4.0]}, count=2))[1]
+    report = data_quality.merge(data_quality.empty_report(), first)
+    data_quality.merge(report, second)
+    assert report["rows"] == report["kept"] == 4
+    assert report["columns"]["Clear Sky UVI"]["flagged"] == 1
+    assert (report["columns"]["Clear Sky UVI"]["min"], report["columns"]["Clear Sky UVI"]["max"]) == (0.0, 8.0)
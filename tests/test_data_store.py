@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+import data_quality
+import data_store
+import query_engine
+from conftest import observations
+from factor_registry import DERIVED_FACTORS, evaluate_factors
+from time_aggregation import aggregate
+
+COLUMNS = ["Clear Sky UVI", "Total Column Ozone", "UV Attenuation", "Transmission Efficiency"]
+# Ranges starting and ending mid-period, on period boundaries, inside one
+# period, and across the source's year boundaries.
+RANGES = [
+    ("2022-11-20", "2024-02-10"),
+    ("2022-12-07", "2023-11-15"),
+    ("2023-01-02", "2023-12-31"),
+    ("2023-05-10", "2023-05-12"),
+    ("2023-12-27", "2024-01-09"),
+]
+
+
+@pytest.fixture(params=["memory", "arrow"])
+def source(request, store):
+    if request.param == "arrow" and not query_engine.available():
+        pytest.skip("the arrow backend needs pyarrow")
+    raw = observations(["Ohio", "Texas", "Utah"], "2022-11-20", "2024-02-10")
+    raw.to_csv(data_store.uv_data_path, index=False)
+    data_store._backend = request.param
+    rows, _ = data_quality.clean(raw)
+    return pd.concat([rows, evaluate_factors(rows, list(DERIVED_FACTORS))], axis=1)
+
+
+def expected_range(rows, state, columns, grain, start, end):
+    # Straight from the daily rows, without the pyramid.
+    rows = rows[(rows["NAME"] == state) & (rows["Date"] >= start) & (rows["Date"] <= end)]
+    return aggregate(rows[["Date"] + columns], columns, grain)
+
+
+@pytest.mark.parametrize("grain", ["week", "month", "year"])
+@pytest.mark.parametrize("start, end", RANGES)
+def test_aggregate_range_matches_the_daily_rows(source, grain, start, end):
+    for state in ["Ohio", "Utah"]:
+        result = data_store.aggregate_range(state, COLUMNS, grain, start, end)
+        expected = expected_range(source, state, COLUMNS, grain, pd.Timestamp(start), pd.Timestamp(end))
+        pd.testing.assert_frame_equal(
+            result.reset_index(drop=True)[expected.columns], expected,
+            check_dtype=False, check_freq=False, rtol=1e-9, obj=f"{state} {grain} {start}..{end}",
+        )
+
+
+def test_counts_add_up_to_the_days_in_range(source):
+    result = data_store.aggregate_range("Texas", ["Clear Sky UVI"], "month", "2023-02-15", "2023-06-14")
+    assert result["Date"].tolist() == list(pd.date_range("2023-02-01", "2023-06-01", freq="MS"))
+    assert result["Clear Sky UVI count"].tolist() == [14, 31, 30, 31, 14]
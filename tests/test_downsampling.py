@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsampling import downsample_frame, downsample_indices, lttb_indices, visible_range, window_frame
+
+
+def daily_series(days=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2015-01-01", periods=days, freq="D")
+    seasonal = 6 + 5 * np.sin(2 * np.pi * np.arange(days) / 365.25)
+    return dates.to_numpy(), seasonal + rng.normal(0, 1.5, days)
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 250, 1500])
+def test_lttb_keeps_the_endpoints_in_order(threshold):
+    x, y = daily_series()
+    indices = lttb_indices(x, y, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_returns_everything_under_the_threshold():
+    x, y = daily_series(days=100)
+    assert (lttb_indices(x, y, 100) == np.arange(100)).all()
+    assert (lttb_indices(x, y, 2) == np.arange(100)).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_downsampling_keeps_the_global_extremes(seed):
+    x, y = daily_series(seed=seed)
+    # One-day spikes as the global extremes; LTTB alone does not guarantee them.
+    y[1234], y[2345] = 40.0, -20.0
+    indices = downsample_indices(x, y, 50)
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert {int(np.argmax(y)), int(np.argmin(y))} <= set(indices.tolist())
+    assert (np.diff(indices) > 0).all()
+
+
+def test_downsampling_ignores_missing_values():
+    x, y = daily_series()
+    y[::7] = np.nan
+    indices = downsample_indices(x, y, 100)
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert int(np.nanargmax(y)) in indices and int(np.nanargmin(y)) in indices
+
+
+def test_downsample_frame_keeps_rows_whole():
+    x, y = daily_series()
+    frame = pd.DataFrame({"Date": x, "Clear Sky UVI": y, "NAME": "Ohio"})
+    sampled = downsample_frame(frame, "Date", "Clear Sky UVI", threshold=200)
+    assert 200 <= len(sampled) <= 202
+    pd.testing.assert_frame_equal(sampled, frame.loc[sampled.index])
+    assert downsample_frame(frame, "Date", "Clear Sky UVI", threshold=len(frame)) is frame
+
+
+def test_visible_range_and_window():
+    assert visible_range(None) is False
+    assert visible_range({"xaxis.autorange": True}) is None
+    assert visible_range({"yaxis.range[0]": 0, "yaxis.range[1]": 1}) is False
+    window = visible_range({"xaxis.range[0]": "2016-03-01", "xaxis.range[1]": "2016-03-31 12:00"})
+    assert window == (pd.Timestamp("2016-03-01"), pd.Timestamp("2016-03-31 12:00"))
+    assert visible_range({"xaxis.range": ["2016-03-01", "2016-03-31 12:00"]}) == window
+
+    x, y = daily_series()
+    frame = pd.DataFrame({"Date": x, "value": y})
+    assert len(window_frame(frame, "Date", window)) == 31
+    assert window_frame(frame, "Date", None) is frame
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import factor_registry
+from factor_registry import DERIVED_FACTORS, evaluate_factors, factor_outputs
+
+
+def observations():
+    # The last row has a clear sky with no UV, where attenuation is defined as 0.
+    return pd.DataFrame({
+        "Clear Sky UVI": [8.2, 5.0, 0.4, 11.7, 0.0],
+        "Cloudy Sky UVI": [6.1, 5.0, 0.1, 2.3, 0.0],
+        "Cloud Transmission": [74.0, 100.0, 12.5, 19.6, 55.0],
+        "Aerosol Transmission": [91.0, 88.0, 97.5, 80.0, 99.0],
+        "Total Column Ozone": [301.0, 280.5, 412.0, 250.0, 330.0],
+        "Solar Zenith Angle": [24.0, 48.5, 89.0, 12.0, 95.0],
+    }, index=[10, 11, 12, 13, 14])
+
+
+def baseline(data):
+    # The formulas derived_factors.py evaluated column by column before the registry.
+    results = {}
+    results['Direct UV'] = data['Clear Sky UVI'] * (data['Aerosol Transmission'] / 100) * \
+        np.cos(np.radians(data['Solar Zenith Angle']))
+    results['Diffuse UV'] = data['Clear Sky UVI'] - results['Direct UV']
+    with np.errstate(divide="ignore", invalid="ignore"):
+        results['UV Attenuation'] = 1 - (data['Cloudy Sky UVI'] / data['Clear Sky UVI'])
+    results['Cloud Impact Factor'] = 1 - (data['Cloud Transmission'] / 100)
+    results['Ozone Protection Factor'] = 1 - np.exp(-0.02 * data['Total Column Ozone'])
+    results['Transmission Efficiency'] = (data['Cloud Transmission'] / 100) * (data['Aerosol Transmission'] / 100)
+    results['Solar Energy Potential'] = 1000 * (data['Cloud Transmission'] / 100) * (data['Aerosol Transmission'] / 100)
+    results['Weighted UV'] = data['Clear Sky UVI'] * 0.7
+    return pd.DataFrame(results)
+
+
+@pytest.mark.parametrize("key", list(DERIVED_FACTORS))
+def test_each_factor_matches_the_baseline_formula(key):
+    data = observations()
+    results = evaluate_factors(data, [key])
+    expected = baseline(data)[factor_outputs([key])]
+    if key == "uv_attenuation":
+        clear_sky = data["Clear Sky UVI"] > 0
+        pd.testing.assert_frame_equal(results[clear_sky], expected[clear_sky])
+        assert (results.loc[~clear_sky, "UV Attenuation"] == 0).all()
+    else:
+        pd.testing.assert_frame_equal(results, expected)
+
+
+def test_all_factors_at_once_match_one_at_a_time():
+    data = observations()
+    together = evaluate_factors(data, list(DERIVED_FACTORS))
+    assert list(together.columns) == factor_outputs(list(DERIVED_FACTORS))
+    for key in DERIVED_FACTORS:
+        pd.testing.assert_frame_equal(together[factor_outputs([key])], evaluate_factors(data, [key]))
+
+
+def test_attenuation_is_zero_without_clear_sky_uv():
+    data = observations()
+    values = evaluate_factors(data, ["uv_attenuation"])["UV Attenuation"]
+    assert np.isfinite(values).all()
+    assert values.iloc[-1] == 0
+    assert values.iloc[1] == 0
+    assert values.iloc[0] == pytest.approx(1 - 6.1 / 8.2)
+
+
+def test_no_factors_gives_an_empty_frame_on_the_same_index():
+    data = observations()
+    results = evaluate_factors(data, [])
+    assert results.empty and list(results.index) == list(data.index)
+
+
+def test_undeclared_names_are_rejected(monkeypatch):
+    factor = {"label": "Broken", "inputs": ["clear"], "params": {}, "outputs": {"Broken": "clear * ozone"}}
+    monkeypatch.setitem(DERIVED_FACTORS, "broken", factor)
+    with pytest.raises(ValueError, match="ozone"):
+        factor_registry._check_registry()
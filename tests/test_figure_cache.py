@@ -0,0 +1,61 @@
+import pytest
+
+from figure_cache import FigureCache
+from shared_cache import SharedCache
+
+
+def payload(size, fill=b"x"):
+    return fill * size
+
+
+@pytest.fixture
+def cache():
+    # Only the in-process tier; the shared store is off.
+    return FigureCache(max_bytes=1000, shared=SharedCache(path="off"))
+
+
+def test_entries_stay_within_the_byte_budget(cache):
+    for index in range(20):
+        cache.put(f"key{index}", payload(300))
+        assert cache.stats()["bytes"] <= 1000
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["bytes"] == 900
+    assert [cache.get(f"key{index}") is not None for index in range(16, 20)] == [False, True, True, True]
+
+
+def test_least_recently_used_goes_first(cache):
+    for key in ["a", "b", "c"]:
+        cache.put(key, payload(300))
+    assert cache.get("a") is not None
+    cache.put("d", payload(300))
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ["a", "c", "d"])
+
+
+def test_a_large_entry_evicts_as_many_as_it_needs(cache):
+    for key in ["a", "b", "c"]:
+        cache.put(key, payload(300))
+    cache.put("big", payload(700))
+    assert cache.get("big") is not None
+    assert cache.get("c") is not None
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.stats()["bytes"] == 1000
+
+
+def test_entries_over_the_budget_are_not_kept(cache):
+    cache.put("small", payload(100))
+    cache.put("huge", payload(1001))
+    assert cache.get("huge") is None
+    assert cache.get("small") is not None
+    assert cache.stats()["bytes"] == 100
+
+
+def test_replacing_an_entry_counts_its_bytes_once(cache):
+    cache.put("a", payload(600))
+    cache.put("a", payload(200, b"y"))
+    cache.put("b", payload(700))
+    assert cache.get("a") == payload(200, b"y")
+    assert cache.stats() == {"hits": 1, "shared_hits": 0, "misses": 0, "entries": 2, "bytes": 900}
+    cache.clear()
+    assert cache.stats()["bytes"] == 0 and cache.get("a") is None
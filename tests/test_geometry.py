@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pytest
+
+import geometry
+from conftest import ROOT
+
+NAME = "us-states"
+
+
+@pytest.fixture(autouse=True)
+def source_directory(monkeypatch):
+    # GEOMETRY_FILES are relative to the app's directory.
+    monkeypatch.chdir(ROOT)
+
+
+def rings_of(collection):
+    return [
+        ring
+        for feature in collection["features"]
+        for polygon in geometry._polygons(feature["geometry"])
+        for ring in polygon
+    ]
+
+
+def two_states(wiggle=0.01, points=200):
+    # Two squares sharing a jagged border, listed in opposite directions.
+    y = np.linspace(0, 1, points)
+    x = 1 + wiggle * np.sin(np.arange(points) * 1.3)
+    border = [[round(float(a), 5), round(float(b), 5)] for a, b in zip(x, y)]
+    west = [[0.0, 0.0]] + border + [[0.0, 1.0], [0.0, 0.0]]
+    east = [[2.0, 0.0], [2.0, 1.0]] + border[::-1] + [[2.0, 0.0]]
+    features = [
+        {"type": "Feature", "id": name, "properties": {"name": name}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+        for name, ring in [("West", west), ("East", east)]
+    ]
+    return {"type": "FeatureCollection", "features": features}, {tuple(point) for point in border}
+
+
+@pytest.mark.parametrize("level", list(geometry.LEVELS))
+def test_rings_stay_closed_and_features_keep_their_names(level):
+    collection = json.loads(geometry.geometry_json(NAME, level))
+    assert [feature["properties"]["name"] for feature in collection["features"]] == geometry.feature_names(NAME)
+    for ring in rings_of(collection):
+        assert len(ring) >= 4
+        assert ring[0] == ring[-1]
+
+
+def test_lower_levels_have_fewer_vertices():
+    counts = [sum(len(ring) for ring in rings_of(json.loads(geometry.geometry_json(NAME, level))))
+              for level in ["low", "medium", "high"]]
+    assert counts[0] < counts[1] < counts[2]
+
+
+@pytest.mark.parametrize("level", ["low", "medium"])
+def test_neighbours_keep_identical_borders(level):
+    # A vertex one state keeps on a border it shares with another, the other
+    # keeps too, so simplification opens no gaps or overlaps between them.
+    settings = geometry.LEVELS[level]
+    original = [set(map(tuple, geometry._quantize(ring, settings["digits"]).tolist()))
+                for ring in rings_of(geometry.load_geometry(NAME))]
+    simplified = [set(map(tuple, ring)) for ring in rings_of(json.loads(geometry.geometry_json(NAME, level)))]
+    shared_pairs = 0
+    for i in range(len(original)):
+        for j in range(i + 1, len(original)):
+            shared = original[i] & original[j]
+            if len(shared) < 2:
+                continue
+            shared_pairs += 1
+            assert simplified[i] & shared == simplified[j] & shared
+    assert shared_pairs > 50
+
+
+def test_a_shared_border_is_simplified_once():
+    collection, border = two_states()
+    west, east = rings_of(geometry.simplify(collection, tolerance=0.02, digits=5))
+    west_border = [tuple(point) for point in west if tuple(point) in border]
+    east_border = [tuple(point) for point in east if tuple(point) in border]
+    assert 2 <= len(west_border) < len(border)
+    assert west_border == east_border[::-1]
+    assert west[0] == west[-1] and east[0] == east[-1]
+
+
+def test_zoom_levels():
+    assert geometry.level_for_zoom(1.0) == geometry.DEFAULT_LEVEL
+    assert geometry.level_for_zoom(2.0) == "medium"
+    assert geometry.level_for_zoom(8.0) == "high"
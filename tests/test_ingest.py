@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+import climatology
+import data_store
+import ingest
+import query_engine
+from conftest import observations
+
+
+pytestmark = pytest.mark.skipif(not query_engine.available(), reason="ingestion needs pyarrow")
+
+
+def write_batch(path, frame):
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def assert_matches_rebuild(version):
+    data = data_store.load_data(version)
+    rebuilt = data_store.pyramid_frames(data)
+    for grain in data_store.PYRAMID_GRAINS:
+        expected = rebuilt[grain].astype({"NAME": str}).sort_values(["NAME", "Date"], ignore_index=True)
+        stored = data_store.read_pyramid(grain, version).reset_index()
+        stored = stored.astype({"NAME": str}).sort_values(["NAME", "Date"], ignore_index=True)[expected.columns]
+        pd.testing.assert_frame_equal(stored, expected, check_dtype=False, atol=1e-9, obj=f"{grain} pyramid")
+
+    expected = climatology.climatology_frame(data).astype({"NAME": str})
+    stored = data_store.read_frame(data_store.cache_path("climatology", version)).astype({"NAME": str})
+    pd.testing.assert_frame_equal(
+        stored.sort_values(["NAME", "DayOfYear"], ignore_index=True)[expected.columns],
+        expected.sort_values(["NAME", "DayOfYear"], ignore_index=True),
+        check_dtype=False,
+    )
+
+
+def test_ingest_matches_a_full_rebuild(store):
+    # 2024-12-30 is a Monday, so that week is stored under 2024 and the batch
+    # adds its 2025 days to it; Vermont is a state the store has not seen.
+    batch = pd.concat([
+        observations(["Ohio", "Utah"], "2025-01-01", "2025-01-05", seed=1),
+        observations(["Vermont"], "2024-12-25", "2025-01-02", seed=2),
+    ])
+    result = ingest.ingest([write_batch(store / "batch.csv", batch)])
+    assert result["added"] == len(batch)
+
+    version = result["version"]
+    assert data_store.read_lineage()[-1]["version"] == version
+    assert query_engine.count_rows(data_store.data_path(version)) == 3 * 61 + len(batch)
+    week = data_store.read_pyramid("week", version).reset_index()
+    crossing = week[(week["NAME"] == "Ohio") & (week["Date"] == pd.Timestamp("2024-12-30"))]
+    assert crossing["Clear Sky UVI count"].tolist() == [7]
+    assert_matches_rebuild(version)
+
+    # What a worker sees on its next request.
+    assert data_store.refresh()
+    assert data_store.dataset_version() == version
+    manifest = data_store.manifest()
+    assert manifest["states"] == ["Ohio", "Texas", "Utah", "Vermont"]
+    assert manifest["date_max"] == pd.Timestamp("2025-01-05")
+
+
+def test_reingesting_the_same_rows_adds_nothing(store):
+    path = write_batch(store / "batch.csv", observations(["Ohio"], "2025-01-01", "2025-01-03", seed=1))
+    first = ingest.ingest([path])
+    second = ingest.ingest([path])
+    assert first["added"] == 3
+    assert second["added"] == 0
+    assert second["dropped"]["already stored"] == 3
+    assert second["version"] == first["version"]
+    assert len(data_store.read_lineage()) == 2
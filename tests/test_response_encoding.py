@@ -0,0 +1,88 @@
+import gzip
+import json
+import types
+
+import dash._callback
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from flask import Flask
+from plotly.io.json import to_json_plotly
+
+import response_encoding
+
+
+def figure():
+    dates = pd.date_range("2023-01-01", periods=50, freq="D")
+    values = np.linspace(0, 12, 50)
+    values[7] = np.nan
+    fig = go.Figure(go.Scatter(x=dates, y=values, name="Clear Sky UVI </script>", mode="lines"))
+    fig.add_trace(go.Bar(x=["Ohio", "Utah"], y=np.array([3, 4], dtype=np.int64)))
+    fig.update_layout(title="UV\u2028index")
+    return fig
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_to_json_round_trips_like_plotly(monkeypatch, fast):
+    if not fast:
+        monkeypatch.setattr(response_encoding, "orjson", None)
+    elif response_encoding.orjson is None:
+        pytest.skip("the fast path needs orjson")
+    value = {"figure": figure().to_dict(), "n": np.int64(3), "day": pd.Timestamp("2023-05-01")}
+    encoded = response_encoding.to_json(value)
+    assert json.loads(encoded) == json.loads(to_json_plotly(value))
+    # Safe to embed in a page, as plotly's own output is.
+    assert "</script>" not in encoded and "\u2028" not in encoded
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(dash._callback, "to_json", dash._callback.to_json)
+    server = Flask(__name__)
+
+    @server.route("/_dash-update-component", methods=["POST"])
+    def update_component():
+        return "x" * int(server.config["SIZE"])
+
+    @server.route("/page")
+    def page():
+        return "x" * int(server.config["SIZE"])
+
+    response_encoding.install(types.SimpleNamespace(server=server))
+    return server
+
+
+def post(server, size, accept="gzip, deflate"):
+    server.config["SIZE"] = size
+    return server.test_client().post("/_dash-update-component", headers={"Accept-Encoding": accept})
+
+
+@pytest.mark.parametrize("size", [0, 100, response_encoding.COMPRESS_MIN_BYTES - 1])
+def test_small_responses_are_sent_as_they_are(client, size):
+    response = post(client, size)
+    assert "Content-Encoding" not in response.headers
+    assert response.data == b"x" * size
+    assert "Server-Timing" in response.headers
+
+
+@pytest.mark.parametrize("size", [response_encoding.COMPRESS_MIN_BYTES, 50000])
+def test_larger_responses_are_gzipped(client, size):
+    response = post(client, size)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(response.data) < size
+    assert gzip.decompress(response.data) == b"x" * size
+
+
+def test_nothing_is_compressed_for_clients_that_do_not_ask(client):
+    response = post(client, 50000, accept="identity")
+    assert "Content-Encoding" not in response.headers
+    assert len(response.data) == 50000
+
+
+def test_other_routes_are_left_alone(client):
+    client.config["SIZE"] = 50000
+    response = client.test_client().get("/page", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert "Server-Timing" not in response.headers
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from time_aggregation import aggregate, choose_resolution, rollup
+
+# Weeks start on Monday, months and years on their first day.
+RULES = {"week": "W-MON", "month": "MS", "year": "YS"}
+COLUMNS = ["Clear Sky UVI", "Total Column Ozone"]
+
+
+def observations(seed=0):
+    # Two states over uneven spans, with gaps and missing values.
+    rng = np.random.default_rng(seed)
+    frames = []
+    for name, start, days in [("Ohio", "2021-02-17", 800), ("Utah", "2021-06-03", 430)]:
+        dates = pd.date_range(start, periods=days, freq="D")
+        frame = pd.DataFrame({
+            "NAME": name,
+            "Date": dates,
+            "Clear Sky UVI": rng.uniform(0, 12, days),
+            "Total Column Ozone": rng.uniform(250, 420, days),
+        })
+        frame.loc[rng.random(days) < 0.05, "Clear Sky UVI"] = np.nan
+        frames.append(frame[rng.random(days) > 0.1])
+    # Shuffled, so aggregate has to sort.
+    return pd.concat(frames, ignore_index=True).sample(frac=1, random_state=seed)
+
+
+def resampled(frame, resolution):
+    rule = RULES.get(resolution, "D")
+    kwargs = {"label": "left", "closed": "left"} if resolution == "week" else {}
+    parts = []
+    for name, rows in frame.groupby("NAME"):
+        sampled = rows.set_index("Date")[COLUMNS].resample(rule, **kwargs)
+        part = pd.concat(
+            [sampled.mean().add_suffix(" mean"), sampled.min().add_suffix(" min"),
+             sampled.max().add_suffix(" max"), sampled.count().add_suffix(" count")],
+            axis=1,
+        )
+        # resample also emits the empty periods between observations.
+        part = part[sampled.size() > 0].reset_index()
+        part.insert(0, "NAME", name)
+        parts.append(part)
+    expected = pd.concat(parts, ignore_index=True)
+    return expected[["NAME", "Date"] + [f"{column} {stat}" for column in COLUMNS
+                                        for stat in ("mean", "min", "max", "count")]]
+
+
+def assert_same(result, expected):
+    result = result.reset_index(drop=True)
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_freq=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("resolution", ["day", "week", "month", "year"])
+def test_aggregate_matches_pandas_resample(resolution):
+    frame = observations()
+    assert_same(aggregate(frame, COLUMNS, resolution, by="NAME"), resampled(frame, resolution))
+
+
+@pytest.mark.parametrize("resolution", ["week", "month", "year"])
+def test_rollup_of_days_matches_pandas_resample(resolution):
+    frame = observations(seed=1)
+    days = aggregate(frame, COLUMNS, "day", by="NAME")
+    assert_same(rollup(days, COLUMNS, resolution, by="NAME"), resampled(frame, resolution))
+
+
+def test_aggregate_without_groups():
+    frame = observations(seed=3)
+    ohio = frame[frame["NAME"] == "Ohio"].drop(columns="NAME")
+    expected = resampled(frame[frame["NAME"] == "Ohio"], "month").drop(columns="NAME")
+    assert_same(aggregate(ohio, COLUMNS, "month"), expected)
+
+
+def test_empty_frames():
+    empty = observations().iloc[:0]
+    assert aggregate(empty, COLUMNS, "week", by="NAME").empty
+    assert rollup(aggregate(empty, COLUMNS, "day", by="NAME"), COLUMNS, "week", by="NAME").empty
+
+
+def test_choose_resolution_keeps_traces_under_the_budget():
+    dates = pd.Series(pd.date_range("2020-01-01", "2020-12-31", freq="D"))
+    assert choose_resolution(dates, "auto", point_budget=400) == "day"
+    assert choose_resolution(dates, "auto", point_budget=100) == "week"
+    assert choose_resolution(dates, "auto", point_budget=20) == "month"
+    assert choose_resolution(dates, "week") == "week"
+    assert choose_resolution(dates.iloc[:0]) == "day"
@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+# Maximum number of points per trace before "auto" switches to a coarser grain.
+POINT_BUDGET = 800
+# Figures with more scatter points than this are drawn with WebGL instead of SVG.
+WEBGL_THRESHOLD = int(os.environ.get("UV_WEBGL_THRESHOLD", 2000))
+
+RESOLUTION_OPTIONS = [
+    {"label": "Auto", "value": "auto"},
+    {"label": "Daily", "value": "day"},
+    {"label": "Weekly", "value": "week"},
+    {"label": "Monthly", "value": "month"},
+]
+
+RESOLUTION_TITLES = {"day": "Daily", "week": "Weekly", "month": "Monthly"}
+
+_APPROX_DAYS = {"day": 1, "week": 7, "month": 30.44}
+
+
+def choose_resolution(dates, resolution="auto", point_budget=POINT_BUDGET):
+    if resolution in _APPROX_DAYS:
+        return resolution
+    if len(dates) == 0:
+        return "day"
+    span_days = (dates.max() - dates.min()).days + 1
+    for grain, days in _APPROX_DAYS.items():
+        if span_days / days <= point_budget:
+            return grain
+    return "month"
+
+
+def period_keys(dates, resolution):
+    days = np.asarray(dates, dtype="datetime64[D]")
+    if resolution == "week":
+        # Day 0 of the epoch is a Thursday; shift so weeks start on Monday (ISO).
+        offsets = (days.astype(np.int64) + 3) % 7
+        return days - offsets.astype("timedelta64[D]")
+    if resolution == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if resolution == "year":
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+    return days
+
+
+def next_period_start(key, resolution):
+    key = np.datetime64(key, "D")
+    if resolution == "week":
+        return key + np.timedelta64(7, "D")
+    if resolution == "month":
+        return (key.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    if resolution == "year":
+        return (key.astype("datetime64[Y]") + 1).astype("datetime64[D]")
+    return key + np.timedelta64(1, "D")
+
+
+def _segment_starts(keys, groups=None):
+    changes = keys[1:] != keys[:-1]
+    if groups is not None:
+        changes |= groups[1:] != groups[:-1]
+    return np.concatenate(([0], np.flatnonzero(changes) + 1))
+
+
+def _sorted(frame, date_column, by):
+    order = [by, date_column] if by else [date_column]
+    if by or not frame[date_column].is_monotonic_increasing:
+        frame = frame.sort_values(order, kind="stable")
+    return frame
+
+
+def aggregate(frame, value_columns, resolution, date_column="Date", by=None):
+    frame = _sorted(frame, date_column, by)
+    if frame.empty:
+        return pd.DataFrame(columns=([by] if by else []) + [date_column])
+
+    keys = period_keys(frame[date_column].to_numpy(), resolution)
+    starts = _segment_starts(keys, frame[by].to_numpy() if by else None)
+
+    result = {by: frame[by].to_numpy()[starts]} if by else {}
+    result[date_column] = pd.to_datetime(keys[starts])
+    for column in value_columns:
+        values = frame[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[f"{column} mean"] = sums / counts
+        result[f"{column} min"] = np.fmin.reduceat(values, starts)
+        result[f"{column} max"] = np.fmax.reduceat(values, starts)
+        result[f"{column} count"] = counts
+    return pd.DataFrame(result)
+
+
+def rollup(aggregated, value_columns, resolution, date_column="Date", by=None):
+    # Combine already aggregated rows (mean/min/max/count) into a coarser grain.
+    aggregated = _sorted(aggregated, date_column, by)
+    if aggregated.empty:
+        return aggregated
+
+    keys = period_keys(aggregated[date_column].to_numpy(), resolution)
+    starts = _segment_starts(keys, aggregated[by].to_numpy() if by else None)
+
+    result = {by: aggregated[by].to_numpy()[starts]} if by else {}
+    result[date_column] = pd.to_datetime(keys[starts])
+    for column in value_columns:
+        counts = aggregated[f"{column} count"].to_numpy()
+        weighted = np.where(counts > 0, aggregated[f"{column} mean"].to_numpy(dtype=np.float64) * counts, 0.0)
+        total = np.add.reduceat(counts, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[f"{column} mean"] = np.add.reduceat(weighted, starts) / total
+        result[f"{column} min"] = np.fmin.reduceat(aggregated[f"{column} min"].to_numpy(dtype=np.float64), starts)
+        result[f"{column} max"] = np.fmax.reduceat(aggregated[f"{column} max"].to_numpy(dtype=np.float64), starts)
+        result[f"{column} count"] = total
+    return pd.DataFrame(result)
+
+
+def add_aggregated_traces(fig, aggregated, column, name=None, date_column="Date", color=None):
+    name = name or column
+    x = aggregated[date_column]
+    fig.add_trace(go.Scatter(
+        x=x, y=aggregated[f"{column} max"], mode="lines", line=dict(width=0),
+        legendgroup=name, showlegend=False, hoverinfo="skip",
+    ))
+    fig.add_trace(go.Scatter(
+        x=x, y=aggregated[f"{column} min"], mode="lines", line=dict(width=0),
+        fill="tonexty", fillcolor="rgba(128, 128, 128, 0.2)",
+        legendgroup=name, showlegend=False, hoverinfo="skip",
+    ))
+    fig.add_trace(go.Scatter(
+        x=x, y=aggregated[f"{column} mean"], mode="lines", name=name,
+        legendgroup=name, line=dict(color=color) if color else None,
+    ))
+    return fig
+
+
+def use_webgl(fig, threshold=WEBGL_THRESHOLD):
+    # SVG cost grows with every point on the page, so the decision is made on
+    # the figure as a whole; styling and hover settings carry over unchanged.
+    scatters = [trace for trace in fig.data if trace.type == "scatter"]
+    points = sum(len(trace.x) if trace.x is not None else 0 for trace in scatters)
+    if points <= threshold:
+        return fig
+    traces = [
+        go.Scattergl({key: value for key, value in trace.to_plotly_json().items() if key != "type"})
+        if trace.type == "scatter" else trace
+        for trace in fig.data
+    ]
+    return go.Figure(data=traces, layout=fig.layout)
@@ -1,276 +1,580 @@
-from dash import dcc, html, Input, Output, State, callback
+from dash import dcc, html, Input, Output, State, Patch, ClientsideFunction, callback, ctx, no_update
+from dash.exceptions import PreventUpdate
+import base64
+import numpy as np
 import pandas as pd
 import plotly.express as px
-import json
+import plotly.graph_objects as go
+import plotly.io as pio
 import dash_bootstrap_components as dbc
+import climatology
+import data_store
+import geometry
+from downsampling import downsample_frame, visible_range, window_frame
+from figure_cache import memoize
+from metrics import phase
+from time_aggregation import RESOLUTION_OPTIONS, RESOLUTION_TITLES, aggregate, add_aggregated_traces, choose_resolution
 
 
-uv_data_path = 'todaysdata.csv'
-geojson_path = 'us-states.json'
-
-data = pd.read_csv(uv_data_path)
-with open(geojson_path) as f:
-    geojson = json.load(f)
-
-data['Year'] = data['Year'].astype(int)
-data['Date'] = pd.to_datetime(data['Date'], format='%Y%m%d')
-data['Month'] = data['Date'].dt.month
-data['Day'] = data['Date'].dt.day
-
-layout = html.Div(
-    style={"backgroundColor": "#f8f9fa", "padding": "20px"},
-    children=[
-        html.H1(
-            "Interactive UV Index Map",
-            style={
-                "textAlign": "center",
-                "marginBottom": "20px",
-                "color": "#343a40",
-                "fontWeight": "bold",
-            },
-        ),
-        # Filters Section
-        html.Div(
-            style={
-                "display": "flex",
-                "justifyContent": "space-around",
-                "flexWrap": "wrap",
-                "marginBottom": "20px",
-            },
-            children=[
-                dbc.Card(
-                    style={"width": "250px", "padding": "20px", "margin": "10px"},
-                    children=[
-                        html.Label("Select Parameter:", style={"fontWeight": "bold"}),
-                        dcc.Dropdown(
-                            id="parameter-dropdown",
-                            options=[
-                                {"label": "Clear Sky UVI", "value": "Clear Sky UVI"},
-                                {"label": "Cloudy Sky UVI", "value": "Cloudy Sky UVI"},
-                                {"label": "Total Column Ozone", "value": "Total Column Ozone"},
-                            ],
-                            value="Clear Sky UVI",
-                            clearable=False,
-                        ),
-                    ],
-                ),
-                dbc.Card(
-                    style={"width": "250px", "padding": "20px", "margin": "10px"},
-                    children=[
-                        html.Label("Select Year:", style={"fontWeight": "bold"}),
-                        dcc.Dropdown(
-                            id="year-dropdown",
-                            options=[
-                                {"label": str(year), "value": year} for year in data["Year"].unique()
-                            ],
-                            value=data["Year"].max(),
-                            clearable=False,
-                        ),
-                    ],
-                ),
-                dbc.Card(
-                    style={"width": "250px", "padding": "20px", "margin": "10px"},
-                    children=[
-                        html.Label("Select Month:", style={"fontWeight": "bold"}),
-                        dcc.Dropdown(
-                            id="month-dropdown",
-                            options=[
-                                {"label": str(month), "value": month} for month in range(1, 13)
-                            ],
-                            value=1,
-                            clearable=False,
-                        ),
-                    ],
-                ),
-                dbc.Card(
-                    style={"width": "250px", "padding": "20px", "margin": "10px"},
-                    children=[
-                        html.Label("Select Day:", style={"fontWeight": "bold"}),
-                        dcc.Dropdown(
-                            id="day-dropdown",
-                            options=[
-                                {"label": str(day), "value": day} for day in range(1, 32)
-                            ],
-                            value=1,
-                            clearable=False,
-                        ),
-                    ],
-                ),
-            ],
-        ),
-        # Map Section
-        dcc.Store(id="map-relayout-data"),
-        html.Div(
-            children=[
-                dcc.Graph(
-                    id="uv-map",
-                    style={
-                        "height": "500px",
-                        "width": "90%",
-                        "margin": "auto",
-                        "border": "2px solid #dee2e6",
-                        "borderRadius": "10px",
-                    },
-                ),
-            ],
-            style={"textAlign": "center", "marginBottom": "20px"},
-        ),
-        # Date Slider
-        html.Div(
-            style={"padding": "20px", "textAlign": "center"},
-            children=[
-                html.Label("Select Date Range:", style={"fontWeight": "bold", "fontSize": "16px"}),
-                dcc.Slider(
-                    id="date-slider",
-                    min=data["Date"].min().timestamp(),
-                    max=data["Date"].max().timestamp(),
-                    value=data["Date"].min().timestamp(),
-                    marks={
-                        int(date.timestamp()): date.strftime("%Y-%m-%d")
-                        for date in pd.date_range(
-                            start=data["Date"].min(), end=data["Date"].max(), freq="YE"
-                        )
-                    },
-                    step=24 * 60 * 60,
-                ),
-            ],
-        ),
-        # State Visualization Section
-        html.Div(
-            children=[
-                html.H3(
-                    "State-Specific Data Visualization",
-                    style={"textAlign": "center", "marginBottom": "20px", "color": "#343a40"},
-                ),
-                html.Div(
-                    style={
-                        "display": "flex",
-                        "justifyContent": "space-around",
-                        "flexWrap": "wrap",
-                        "padding": "10px",
-                    },
-                    children=[
-                        dbc.Card(
-                            style={
-                                "width": "600px",
-                                "padding": "20px",
-                                "margin": "10px",
-                                "border": "2px solid #dee2e6",
-                                "borderRadius": "10px",
-                            },
-                            children=[
-                                dcc.Graph(
-                                    id="state-bar-chart",
-                                    style={"height": "300px"},
-                                ),
-                            ],
-                        ),
-                        dbc.Card(
-                            style={
-                                "width": "800px",
-                                "padding": "20px",
-                                "margin": "10px",
-                                "border": "2px solid #dee2e6",
-                                "borderRadius": "10px",
-                            },
-                            children=[
-                                dcc.Graph(
-                                    id="state-line-chart",
-                                    style={"height": "300px"},
-                                ),
-                            ],
-                        ),
-                    ],
-                ),
-            ],
-        ),
-    ],
-)
-
-
-def save_relayout_data(relayout_data, stored_relayout_data):
-    if relayout_data is None:
-        return stored_relayout_data
-    return relayout_data
-
-
-def update_map(selected_parameter, selected_year, selected_month, selected_day, selected_date, relayout_data):
+def make_layout():
+    manifest = data_store.manifest()
+    return html.Div(
+        style={"backgroundColor": "#f8f9fa", "padding": "20px"},
+        children=[
+            html.H1(
+                "Interactive UV Index Map",
+                style={
+                    "textAlign": "center",
+                    "marginBottom": "20px",
+                    "color": "#343a40",
+                    "fontWeight": "bold",
+                },
+            ),
+            # Filters Section
+            html.Div(
+                style={
+                    "display": "flex",
+                    "justifyContent": "space-around",
+                    "flexWrap": "wrap",
+                    "marginBottom": "20px",
+                },
+                children=[
+                    dbc.Card(
+                        style={"width": "250px", "padding": "20px", "margin": "10px"},
+                        children=[
+                            html.Label("Select Parameter:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="parameter-dropdown",
+                                options=[
+                                    {"label": "Clear Sky UVI", "value": "Clear Sky UVI"},
+                                    {"label": "Cloudy Sky UVI", "value": "Cloudy Sky UVI"},
+                                    {"label": "Total Column Ozone", "value": "Total Column Ozone"},
+                                ],
+                                value="Clear Sky UVI",
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                    dbc.Card(
+                        style={"width": "250px", "padding": "20px", "margin": "10px"},
+                        children=[
+                            html.Label("Select Year:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="year-dropdown",
+                                options=[
+                                    {"label": str(year), "value": year} for year in manifest["years"]
+                                ],
+                                value=manifest["years"][-1],
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                    dbc.Card(
+                        style={"width": "250px", "padding": "20px", "margin": "10px"},
+                        children=[
+                            html.Label("Select Month:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="month-dropdown",
+                                options=[
+                                    {"label": str(month), "value": month} for month in range(1, 13)
+                                ],
+                                value=1,
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                    dbc.Card(
+                        style={"width": "250px", "padding": "20px", "margin": "10px"},
+                        children=[
+                            html.Label("Select Day:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="day-dropdown",
+                                options=[
+                                    {"label": str(day), "value": day} for day in range(1, 32)
+                                ],
+                                value=1,
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                    dbc.Card(
+                        style={"width": "250px", "padding": "20px", "margin": "10px"},
+                        children=[
+                            html.Label("Display Mode:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="display-mode-dropdown",
+                                options=climatology.DISPLAY_MODE_OPTIONS,
+                                value="value",
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+            # Map Section
+            dcc.Store(id="map-geometry-key"),
+            html.Div(
+                children=[
+                    dcc.Graph(
+                        id="uv-map",
+                        style={
+                            "height": "500px",
+                            "width": "90%",
+                            "margin": "auto",
+                            "border": "2px solid #dee2e6",
+                            "borderRadius": "10px",
+                        },
+                    ),
+                ],
+                style={"textAlign": "center", "marginBottom": "20px"},
+            ),
+            # Date Slider
+            html.Div(
+                style={"padding": "20px", "textAlign": "center"},
+                children=[
+                    html.Label("Select Date Range:", style={"fontWeight": "bold", "fontSize": "16px"}),
+                    dcc.Slider(
+                        id="date-slider",
+                        min=manifest["date_min"].timestamp(),
+                        max=manifest["date_max"].timestamp(),
+                        value=manifest["date_min"].timestamp(),
+                        marks={
+                            int(date.timestamp()): date.strftime("%Y-%m-%d")
+                            for date in pd.date_range(
+                                start=manifest["date_min"], end=manifest["date_max"], freq="YE"
+                            )
+                        },
+                        step=24 * 60 * 60,
+                    ),
+                ],
+            ),
+            # Playback Section
+            dbc.Card(
+                style={"width": "90%", "padding": "20px", "margin": "auto", "marginBottom": "20px"},
+                children=[
+                    dcc.Checklist(
+                        id="map-scrub-mode",
+                        options=[{"label": " Playback mode (scrub the selected year in the browser)", "value": "on"}],
+                        value=[],
+                        style={"fontWeight": "bold"},
+                    ),
+                    html.Div(
+                        style={"display": "flex", "alignItems": "center", "gap": "20px", "marginTop": "10px"},
+                        children=[
+                            dbc.Button("Play / Pause", id="scrub-play", color="secondary", n_clicks=0),
+                            html.Div(
+                                style={"flexGrow": 1},
+                                children=dcc.Slider(id="scrub-slider", min=0, max=0, step=1, value=0, marks={}),
+                            ),
+                        ],
+                    ),
+                    dcc.Interval(id="scrub-interval", interval=250, disabled=True),
+                    dcc.Store(id="map-scrub-data"),
+                ],
+            ),
+            # State Visualization Section
+            html.Div(
+                children=[
+                    html.H3(
+                        "State-Specific Data Visualization",
+                        style={"textAlign": "center", "marginBottom": "20px", "color": "#343a40"},
+                    ),
+                    html.Div(
+                        style={"width": "250px", "margin": "auto"},
+                        children=[
+                            html.Label("Time Resolution:", style={"fontWeight": "bold"}),
+                            dcc.Dropdown(
+                                id="resolution-dropdown",
+                                options=RESOLUTION_OPTIONS,
+                                value="auto",
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                    html.Div(
+                        style={
+                            "display": "flex",
+                            "justifyContent": "space-around",
+                            "flexWrap": "wrap",
+                            "padding": "10px",
+                        },
+                        children=[
+                            dbc.Card(
+                                style={
+                                    "width": "600px",
+                                    "padding": "20px",
+                                    "margin": "10px",
+                                    "border": "2px solid #dee2e6",
+                                    "borderRadius": "10px",
+                                },
+                                children=[
+                                    dcc.Graph(
+                                        id="state-bar-chart",
+                                        style={"height": "300px"},
+                                    ),
+                                ],
+                            ),
+                            dbc.Card(
+                                style={
+                                    "width": "800px",
+                                    "padding": "20px",
+                                    "margin": "10px",
+                                    "border": "2px solid #dee2e6",
+                                    "borderRadius": "10px",
+                                },
+                                children=[
+                                    dcc.Graph(
+                                        id="state-line-chart",
+                                        style={"height": "300px"},
+                                    ),
+                                ],
+                            ),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
+
+
+# Every map figure draws the same states in the same order, so once the browser has
+# the geometry a new selection only needs fresh values, colour range and title.
+MAP_GEOMETRY = "us-states"
+MAP_STATES = geometry.feature_names(MAP_GEOMETRY)
+# Simplified geometry is served as static JSON and referenced by URL, so the
+# browser downloads (and caches) each detail level once.
+geometry_url_prefix = "/geometry/"
+MAP_TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+MAP_COLORSCALES = {
+    "value": go.layout.Coloraxis(colorscale="Viridis").colorscale,
+    "anomaly": go.layout.Coloraxis(colorscale="RdBu_r").colorscale,
+}
+
+
+def map_scope(selected_parameter, final_date, display_mode):
+    # Values come from one day's rows; anomalies also from normals that any
+    # new row may shift.
+    return {"start": final_date, "end": final_date} if display_mode == "value" else {}
+
+
+@memoize(scope=map_scope)
+def map_values(selected_parameter, final_date, display_mode):
+    with phase("filter"):
+        filtered_data = data_store.select(["NAME", selected_parameter], date=final_date)
+        values = filtered_data.groupby("NAME", observed=True)[selected_parameter].mean().reindex(MAP_STATES).to_numpy()
+    date_text = final_date.strftime("%Y-%m-%d")
+
+    if filtered_data.empty:
+        title = "No data available for the selected date."
+    elif display_mode == "anomaly":
+        title = f"{selected_parameter} anomaly vs. normal on {date_text}"
+    else:
+        title = f"{selected_parameter} on {date_text}"
+
+    if display_mode == "anomaly":
+        normals = climatology.normals_for(MAP_STATES, [final_date] * len(MAP_STATES), selected_parameter)
+        z = values - normals["normal"].to_numpy()
+        extent = np.nanmax(np.abs(z)) if np.isfinite(z).any() else 1.0
+        color_range = (-extent, extent)
+        customdata = np.column_stack([values, normals[["normal", "p10", "p90"]].to_numpy()])
+        hovertemplate = (
+            "NAME=%{location}<br>Anomaly=%{z:.2f}<br>" + selected_parameter + "=%{customdata[0]:.2f}"
+            "<br>Normal=%{customdata[1]:.2f} (p10 %{customdata[2]:.2f}, p90 %{customdata[3]:.2f})<extra></extra>"
+        )
+        colorbar_title = "Anomaly"
+    else:
+        z = values
+        color_range = (np.nanmin(z), np.nanmax(z)) if np.isfinite(z).any() else (0.0, 1.0)
+        customdata = None
+        hovertemplate = "NAME=%{location}<br>" + selected_parameter + "=%{z}<extra></extra>"
+        colorbar_title = selected_parameter
+
+    z = [None if np.isnan(value) else float(value) for value in z]
+    if customdata is not None:
+        customdata = [[None if np.isnan(value) else float(value) for value in row] for row in customdata]
+
+    return [
+        (("data", 0, "z"), z),
+        (("data", 0, "customdata"), customdata),
+        (("data", 0, "hovertemplate"), hovertemplate),
+        (("layout", "coloraxis", "cmin"), float(color_range[0])),
+        (("layout", "coloraxis", "cmax"), float(color_range[1])),
+        (("layout", "coloraxis", "colorscale"), MAP_COLORSCALES[display_mode]),
+        (("layout", "coloraxis", "colorbar", "title", "text"), colorbar_title),
+        (("layout", "title", "text"), title),
+    ]
+
+
+def _assign(target, path, value):
+    for key in path[:-1]:
+        target = target[key]
+    target[path[-1]] = value
+
+
+def map_geometry_key(level):
+    return f"{MAP_GEOMETRY}:{level}"
+
+
+def map_geometry_url(level):
+    return f"{geometry_url_prefix}{MAP_GEOMETRY}/{level}.json"
+
+
+def map_figure(values, level):
+    fig = {
+        "data": [{
+            "type": "choropleth",
+            "geojson": map_geometry_url(level),
+            "featureidkey": "properties.name",
+            "locations": MAP_STATES,
+            "coloraxis": "coloraxis",
+        }],
+        "layout": {
+            "template": MAP_TEMPLATE,
+            "coloraxis": {"colorbar": {"title": {}}},
+            "title": {},
+            "margin": {"t": 60},
+            # Keeps the user's pan/zoom across value updates.
+            "uirevision": MAP_GEOMETRY,
+        },
+    }
+    for path, value in values:
+        _assign(fig, path, value)
+    return fig
+
+
+def map_patch(values):
+    patch = Patch()
+    for path, value in values:
+        _assign(patch, path, value)
+    return patch
+
+
+def map_date(selected_year, selected_month, selected_day, selected_date):
     slider_date = pd.to_datetime(selected_date, unit="s")
     dropdown_date = pd.Timestamp(year=selected_year, month=selected_month, day=selected_day)
+    return dropdown_date if data_store.has_date(dropdown_date) else slider_date
 
-    final_date = dropdown_date if dropdown_date in data["Date"].values else slider_date
-    filtered_data = data[data["Date"] == final_date]
 
-    if filtered_data.empty:
-        return px.choropleth(title="No data available for the selected date.")
-
-    state_avg_data = filtered_data.groupby("NAME")[selected_parameter].mean().reset_index()
-
-    fig = px.choropleth(
-        state_avg_data,
-        geojson=geojson,
-        locations="NAME",
-        featureidkey="properties.name",
-        color=selected_parameter,
-        color_continuous_scale="Viridis",
-        title=f"{selected_parameter} on {final_date.strftime('%Y-%m-%d')}",
-    )
-    if relayout_data:
-        fig.update_layout(relayout_data)
+def update_map(selected_parameter, selected_year, selected_month, selected_day, selected_date, display_mode,
+               relayout_data=None, geometry_key=None):
+    current_level = geometry_key.split(":")[1] if geometry_key else geometry.DEFAULT_LEVEL
+    level = current_level
+    if relayout_data and "geo.projection.scale" in relayout_data:
+        level = geometry.level_for_zoom(relayout_data["geo.projection.scale"])
+
+    if geometry_key and relayout_data is not None and ctx.triggered_id == "uv-map":
+        # Zooming only swaps the geometry detail level; the values stay as they are.
+        if level == current_level:
+            raise PreventUpdate
+        patch = Patch()
+        patch["data"][0]["geojson"] = map_geometry_url(level)
+        return patch, map_geometry_key(level)
+
+    final_date = map_date(selected_year, selected_month, selected_day, selected_date)
+    values = map_values(selected_parameter, final_date, display_mode)
+
+    with phase("figure"):
+        if geometry_key:
+            return map_patch(values), no_update
+        return map_figure(values, level), map_geometry_key(level)
+
+
+def load_scrub_frames(scrub_mode, selected_parameter, selected_year, display_mode):
+    if "on" not in (scrub_mode or []):
+        return None, 0, {}, 0
+
+    with phase("filter"):
+        year_data = data_store.select(["NAME", "Date", selected_parameter], year=selected_year)
+        dates = np.sort(year_data["Date"].unique())
+        date_pos = np.searchsorted(dates, year_data["Date"].to_numpy())
+        state_pos = pd.Index(MAP_STATES).get_indexer(year_data["NAME"])
+        values = year_data[selected_parameter].to_numpy(dtype=np.float64)
+        if display_mode == "anomaly":
+            values = values - climatology.normals_for(year_data["NAME"], year_data["Date"], selected_parameter)["normal"].to_numpy()
 
+    # Mean per (date, state) cell, laid out row-major as dates x states.
+    known = (state_pos >= 0) & ~np.isnan(values)
+    cells = date_pos[known] * len(MAP_STATES) + state_pos[known]
+    size = len(dates) * len(MAP_STATES)
+    counts = np.bincount(cells, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = (np.bincount(cells, weights=values[known], minlength=size) / counts).astype("<f4")
+
+    if np.isfinite(matrix).any():
+        low, high = float(np.nanmin(matrix)), float(np.nanmax(matrix))
+    else:
+        low, high = 0.0, 1.0
+    if display_mode == "anomaly":
+        low, high = -max(abs(low), abs(high)), max(abs(low), abs(high))
+
+    date_labels = pd.DatetimeIndex(dates).strftime("%Y-%m-%d").tolist()
+    scrub_data = {
+        "label": f"{selected_parameter} anomaly" if display_mode == "anomaly" else selected_parameter,
+        "dates": date_labels,
+        "shape": [len(dates), len(MAP_STATES)],
+        "range": [low, high],
+        "values": base64.b64encode(matrix.tobytes()).decode("ascii"),
+    }
+    marks = {i: label[5:] for i, label in enumerate(date_labels) if label.endswith("-01")}
+    return scrub_data, max(len(dates) - 1, 0), marks, 0
+
+
+def anomaly_line_chart(state_data, selected_parameter, resolution, title):
+    anomalies = climatology.with_anomalies(state_data, selected_parameter)
+    fig = go.Figure()
+    if resolution == "day":
+        fig.add_trace(go.Scatter(
+            x=anomalies["Date"], y=anomalies["p90"] - anomalies["normal"], mode="lines", line=dict(width=0),
+            showlegend=False, hoverinfo="skip",
+        ))
+        fig.add_trace(go.Scatter(
+            x=anomalies["Date"], y=anomalies["p10"] - anomalies["normal"], mode="lines", line=dict(width=0),
+            fill="tonexty", fillcolor="rgba(128, 128, 128, 0.2)", name="p10-p90 of normal", hoverinfo="skip",
+        ))
+        fig.add_trace(go.Scatter(x=anomalies["Date"], y=anomalies["anomaly"], mode="lines", name="Anomaly"))
+    else:
+        add_aggregated_traces(fig, aggregate(anomalies, ["anomaly"], resolution), "anomaly", name="Anomaly")
+    fig.add_hline(y=0, line_dash="dot", line_color="#6c757d")
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title=f"{selected_parameter} - normal", showlegend=False)
     return fig
 
 
-def update_state_charts(click_data, selected_parameter):
-    if click_data is None:
-        return px.bar(title="No state selected"), px.line(title="No state selected")
+def state_line_chart(state_name, state_data, selected_parameter, resolution, display_mode, window=None):
+    if resolution == "day":
+        # Full resolution only for the visible window, thinned to the point budget.
+        with phase("filter"):
+            state_data = downsample_frame(window_frame(state_data, "Date", window), "Date", selected_parameter)
+
+    line_title = f"{RESOLUTION_TITLES[resolution]} {selected_parameter} for {state_name}"
+    with phase("figure"):
+        if display_mode == "anomaly":
+            line_fig = anomaly_line_chart(state_data, selected_parameter, resolution, f"{line_title} (anomaly vs. normal)")
+        elif resolution == "day":
+            line_fig = px.line(
+                state_data,
+                x="Date",
+                y=selected_parameter,
+                title=line_title,
+            )
+        else:
+            line_fig = add_aggregated_traces(
+                go.Figure(), data_store.pyramid_lookup(resolution, state_name, [selected_parameter]), selected_parameter
+            )
+            line_fig.update_layout(title=line_title, xaxis_title="Date", yaxis_title=selected_parameter, showlegend=False)
+
+        line_fig.update_layout(uirevision=f"{state_name}|{selected_parameter}|{resolution}|{display_mode}")
+    return line_fig
 
-    state_name = click_data["points"][0]["location"]
-    state_data = data[data["NAME"] == state_name]
 
+@memoize(scope=data_store.state_scope)
+def state_charts(state_name, selected_parameter, selected_resolution, display_mode):
+    with phase("filter"):
+        state_data = data_store.select(["NAME", "Date", selected_parameter], state=state_name)
+        profile = data_store.monthly_profile(state_name, selected_parameter) if not state_data.empty else None
     if state_data.empty:
         return px.bar(title="No data available"), px.line(title="No data available")
 
-    bar_fig = px.bar(
-        state_data.groupby("Month")[selected_parameter].mean().reset_index(),
-        x="Month",
-        y=selected_parameter,
-        title=f"Monthly Average {selected_parameter} for {state_name}",
-    )
+    with phase("figure"):
+        bar_fig = px.bar(
+            profile,
+            x="Month",
+            y=selected_parameter,
+            title=f"Monthly Average {selected_parameter} for {state_name}",
+        )
+    resolution = choose_resolution(state_data["Date"], selected_resolution)
+    return bar_fig, state_line_chart(state_name, state_data, selected_parameter, resolution, display_mode)
 
-    line_fig = px.line(
-        state_data,
-        x="Date",
-        y=selected_parameter,
-        title=f"Daily {selected_parameter} for {state_name}",
-    )
 
-    return bar_fig, line_fig
+def update_state_charts(click_data, selected_parameter, selected_resolution, display_mode, relayout_data=None):
+    zoomed = relayout_data is not None and ctx.triggered_id == "state-line-chart"
+    window = visible_range(relayout_data) if zoomed else None
+    if window is False:
+        raise PreventUpdate
+
+    if click_data is None:
+        return px.bar(title="No state selected"), px.line(title="No state selected")
+
+    state_name = click_data["points"][0]["location"]
+    if not zoomed:
+        return state_charts(state_name, selected_parameter, selected_resolution, display_mode)
+
+    # Zoomed windows are arbitrary, so only the full views are cached.
+    with phase("filter"):
+        state_data = data_store.select(["NAME", "Date", selected_parameter], state=state_name)
+    resolution = choose_resolution(state_data["Date"], selected_resolution)
+    if state_data.empty or resolution != "day":
+        raise PreventUpdate
+    return no_update, state_line_chart(state_name, state_data, selected_parameter, resolution, display_mode, window)
 
 
 def register_callbacks(app):
-    app.callback(
-        Output("map-relayout-data", "data"),
-        Input("uv-map", "relayoutData"),
-        State("map-relayout-data", "data"),
-    )(save_relayout_data)
+    global geometry_url_prefix
+    geometry_url_prefix = f"{app.config.requests_pathname_prefix}geometry/"
+    geometry.register_routes(app.server, app.config.routes_pathname_prefix)
 
     app.callback(
-        Output("uv-map", "figure"),
+        [Output("uv-map", "figure"), Output("map-geometry-key", "data")],
         [
             Input("parameter-dropdown", "value"),
             Input("year-dropdown", "value"),
             Input("month-dropdown", "value"),
             Input("day-dropdown", "value"),
             Input("date-slider", "value"),
+            Input("display-mode-dropdown", "value"),
+            Input("uv-map", "relayoutData"),
         ],
-        State("map-relayout-data", "data"),
+        State("map-geometry-key", "data"),
     )(update_map)
 
     app.callback(
         [Output("state-bar-chart", "figure"), Output("state-line-chart", "figure")],
-        [Input("uv-map", "clickData"), Input("parameter-dropdown", "value")],
+        [
+            Input("uv-map", "clickData"),
+            Input("parameter-dropdown", "value"),
+            Input("resolution-dropdown", "value"),
+            Input("display-mode-dropdown", "value"),
+            Input("state-line-chart", "relayoutData"),
+        ],
     )(update_state_charts)
 
+    app.callback(
+        [
+            Output("map-scrub-data", "data"),
+            Output("scrub-slider", "max"),
+            Output("scrub-slider", "marks"),
+            Output("scrub-slider", "value"),
+        ],
+        [
+            Input("map-scrub-mode", "value"),
+            Input("parameter-dropdown", "value"),
+            Input("year-dropdown", "value"),
+            Input("display-mode-dropdown", "value"),
+        ],
+    )(load_scrub_frames)
+
+    # Playback runs entirely in the browser (assets/map_scrub.js).
+    app.clientside_callback(
+        ClientsideFunction(namespace="uv_map", function_name="scrub_map"),
+        Output("uv-map", "figure", allow_duplicate=True),
+        Input("scrub-slider", "value"),
+        State("map-scrub-data", "data"),
+        State("uv-map", "figure"),
+        prevent_initial_call=True,
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="uv_map", function_name="toggle_play"),
+        Output("scrub-interval", "disabled"),
+        Input("scrub-play", "n_clicks"),
+        State("scrub-interval", "disabled"),
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="uv_map", function_name="advance"),
+        Output("scrub-slider", "value", allow_duplicate=True),
+        Input("scrub-interval", "n_intervals"),
+        State("scrub-slider", "value"),
+        State("map-scrub-data", "data"),
+        prevent_initial_call=True,
+    )
+
 
-__all__ = ["layout", "register_callbacks"]
+__all__ = ["make_layout", "register_callbacks"]
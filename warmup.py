@@ -0,0 +1,190 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import request
+
+import climatology
+import data_store
+from ingest import file_lock
+
+
+logger = logging.getLogger(__name__)
+
+# off: never warm; background: warm in a thread once serving; blocking: warm before serving.
+WARMUP_MODE = os.environ.get("UV_WARMUP", "background")
+# Number of keys harvested from the hot-key log on top of the defaults.
+WARMUP_KEYS = int(os.environ.get("UV_WARMUP_KEYS", 20))
+HOT_KEY_LOG = os.environ.get("UV_HOT_KEY_LOG", os.path.join(data_store.cache_dir, "hot_keys.log"))
+HOT_KEY_LOG_BYTES = 5 * 1024 * 1024
+# Keys are buffered per worker and appended in one locked write once this
+# many are waiting or this many seconds have passed, and at exit.
+HOT_KEY_FLUSH_LINES = 100
+HOT_KEY_FLUSH_SECONDS = 30
+# Only the tail of the log counts, so keys follow what users ask for now.
+HOT_KEY_LOG_LINES = 5000
+
+DEFAULT_FORECAST_DAYS = 30
+
+CALLBACK_PATH = "_dash-update-component"
+
+_pending = []
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _hot_key(output, inputs):
+    # Maps a callback request to the cached computation behind it.
+    value = inputs.get
+    if output == "forecast-graph":
+        return "forecast", (value("state-dropdown.value"), tuple(value("regressor-checklist.value") or ()),
+                            value("forecast-days-input.value"))
+    if output in ("future-factors-analysis", "seasonal-trends", "distribution-plot"):
+        return "forecast", (value("state-dropdown.value"), (), value("forecast-days-input.value"))
+    if output in ("skin-risk-gauge", "ten-day-forecast-table"):
+        return "forecast", (value("skin-risk-location.value"), (), value("forecast-days-input.value"), "Clear Sky UVI")
+    if output == "med-result":
+        return "forecast", (value("med-state-dropdown.value"), (), value("forecast-days-input.value"), "Clear Sky UVI")
+    if output == "ml-output-graph" and value("analysis-type-dropdown.value") == "regression":
+        factors = value("factors-dropdown.value")
+        if factors and "Cloudy Sky UVI" not in factors:
+            return "regression", (value("state-dropdown.value"), tuple(factors))
+    if output == "uv-map" and value("uv-map.relayoutData") is None:
+        return "map", (value("parameter-dropdown.value"), value("year-dropdown.value"), value("month-dropdown.value"),
+                       value("day-dropdown.value"), value("date-slider.value"), value("display-mode-dropdown.value"))
+    if output == "state-bar-chart" and value("uv-map.clickData"):
+        return "state", (value("uv-map.clickData")["points"][0]["location"], value("parameter-dropdown.value"),
+                         value("resolution-dropdown.value"), value("display-mode-dropdown.value"))
+    return None
+
+
+def record_request():
+    body = request.get_json(silent=True) or {}
+    outputs = body.get("outputs")
+    output = (outputs[0] if isinstance(outputs, list) else outputs or {}).get("id")
+    inputs = {
+        f"{item['id']}.{item['property']}": item.get("value")
+        for item in body.get("inputs", []) + body.get("state", [])
+        if isinstance(item, dict) and isinstance(item.get("id"), str)
+    }
+    try:
+        key = _hot_key(output, inputs)
+    except (KeyError, IndexError, TypeError):
+        key = None
+    if key is None:
+        return
+    with _pending_lock:
+        _pending.append(json.dumps({"time": time.time(), "kind": key[0], "args": key[1]}) + "\n")
+        due = len(_pending) >= HOT_KEY_FLUSH_LINES or time.monotonic() - _flushed_at >= HOT_KEY_FLUSH_SECONDS
+    if due:
+        flush_hot_keys()
+
+
+def flush_hot_keys():
+    # Workers share the log, so the size check, rotation and append happen
+    # under one file lock; otherwise two workers can both rotate, and the
+    # second one throws away the first one's fresh log.
+    global _flushed_at
+    with _pending_lock:
+        lines = _pending[:]
+        del _pending[:]
+        _flushed_at = time.monotonic()
+    if not lines:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(HOT_KEY_LOG)), exist_ok=True)
+    with file_lock(f"{HOT_KEY_LOG}.lock"):
+        if os.path.exists(HOT_KEY_LOG) and os.path.getsize(HOT_KEY_LOG) > HOT_KEY_LOG_BYTES:
+            os.replace(HOT_KEY_LOG, f"{HOT_KEY_LOG}.1")
+        with open(HOT_KEY_LOG, "a") as f:
+            f.write("".join(lines))
+
+
+def harvested_keys(limit=WARMUP_KEYS):
+    if not os.path.exists(HOT_KEY_LOG):
+        return []
+    with open(HOT_KEY_LOG) as f:
+        lines = f.readlines()[-HOT_KEY_LOG_LINES:]
+    counts = Counter()
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            counts[(entry["kind"], json.dumps(entry["args"]))] += 1
+        except (ValueError, KeyError):
+            continue
+    return [(kind, json.loads(args)) for (kind, args), _ in counts.most_common(limit)]
+
+
+def default_keys():
+    manifest = data_store.manifest()
+    first_state = manifest["states"][0]
+    latest = manifest["date_max"]
+    keys = [
+        ("forecast", (first_state, (), DEFAULT_FORECAST_DAYS)),
+        ("forecast", (first_state, (), DEFAULT_FORECAST_DAYS, "Clear Sky UVI")),
+        ("regression", (first_state, ("Clear Sky UVI",))),
+        # The map as first rendered, and the latest day of every parameter.
+        ("map", ("Clear Sky UVI", manifest["years"][-1], 1, 1, manifest["date_min"].timestamp(), "value")),
+    ]
+    keys += [("map", (parameter, latest.year, latest.month, latest.day, latest.timestamp(), "value"))
+             for parameter in climatology.CLIMATOLOGY_MEASURES]
+    keys.append(("state", (first_state, "Clear Sky UVI", "auto", "value")))
+    return keys
+
+
+def warm_key(kind, args):
+    if kind == "forecast":
+        import forecasting
+        state, regressors, days, *target = args
+        forecasting.fit_forecast(state, tuple(regressors), days, *target)
+    elif kind == "regression":
+        import dynamic_calculations
+        state, factors = args
+        dynamic_calculations.regression_figure(state, tuple(factors))
+    elif kind == "map":
+        import uv_visualization
+        parameter, year, month, day, slider, mode = args
+        uv_visualization.map_values(parameter, uv_visualization.map_date(year, month, day, slider), mode)
+    elif kind == "state":
+        import uv_visualization
+        uv_visualization.state_charts(*args)
+
+
+def warm(keys=None):
+    keys = keys if keys is not None else default_keys() + harvested_keys()
+    start = time.perf_counter()
+    seen = set()
+    for kind, args in keys:
+        marker = (kind, json.dumps(args, default=str))
+        if marker in seen:
+            continue
+        seen.add(marker)
+        try:
+            warm_key(kind, args)
+        except Exception:
+            logger.exception("Warm-up of %s %s failed", kind, args)
+    logger.info("Warmed %d keys in %.1f s", len(seen), time.perf_counter() - start)
+
+
+def start(mode=WARMUP_MODE):
+    if mode == "blocking":
+        warm()
+    elif mode == "background":
+        thread = threading.Thread(target=warm, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+
+def install(app):
+    if HOT_KEY_LOG in ("", "off"):
+        return
+    atexit.register(flush_hot_keys)
+
+    @app.server.after_request
+    def log_hot_key(response):
+        if request.path.endswith(CALLBACK_PATH) and response.status_code == 200:
+            record_request()
+        return response